@@ -14,10 +14,11 @@ app.config.from_object('config.{}'.format(getenv('CONFIG')))
 # allow CORS for all domains on all routes
 CORS(app)
 
-# APScheduler configuration
+# APScheduler configuration: jobs are only added from here, and run by the
+# scan worker elected leader (see app/worker.py)
 scheduler = APScheduler()
 scheduler.init_app(app)
-scheduler.start()
+scheduler.scheduler.start(paused=True)
 
 # SQLAlchemy config
 db = SQLAlchemy(app)
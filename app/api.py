@@ -1,4 +1,4 @@
-from flask import request, g
+from flask import request, g, Response
 from flask.json import jsonify
 from flask_restful import Api, Resource, reqparse, inputs
 from requests import get
@@ -6,18 +6,23 @@ import datetime
 from apscheduler.jobstores.base import ConflictingIdError
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import or_
-from .models import User, ScanJob, LinkCheck, ScheduledJob, PermissionedURL, Owner, Link, Exception
+from .models import User, ScanJob, LinkCheck, ScheduledJob, PermissionedURL, Owner, Link, \
+    Exception, PageTiming
 from . import app, scheduler, db
-from .link_check import LinkChecker, standardize_descheme_url
+from .link_check import LinkChecker, standardize_descheme_url, standardize_url, ensure_protocol
+from .async_link_check import AsyncLinkChecker
+from .distributed_link_check import DistributedLinkChecker
 from .email import send_email
 from .auth import auth
+from .metrics import prometheus_text
+from .globals import METRICS_WINDOW_HOURS
 
 
 def email_results(job):
     job_results = LinkCheck.query.filter(LinkCheck.job == job).\
         outerjoin(Exception, Exception.exception == LinkCheck.exception).\
         with_entities(
-            LinkCheck,  # For severity assessment
+            LinkCheck,
             Exception,
         )
 
@@ -28,7 +33,7 @@ def email_results(job):
         with_entities(Link.url, Link.source_url).all()
 
     # generate email message body
-    errors = [result for result in job_results.all() if result.LinkCheck.severity > 0]
+    errors = job_results.filter(LinkCheck.severity > 0).all()
     n_errors = len(errors)
     message = "<p>Hi,</p><p>I just finished scanning {}, and I found {} potential error{} I think you should review{}</p>".format(
         '<a href="{}">{}</a>'.format(job.root_url, job.root_url),
@@ -65,30 +70,53 @@ def email_results(job):
         message_content=message,
     )
 
-def scan(*args, **kwargs):
-    with app.app_context():
-        print('Scanning [{}]'.format(datetime.datetime.now().time()))
-        email = kwargs.pop('email', False)
-
-        owner_id = kwargs.pop('owner_id')
-        owner = Owner.query.filter(Owner.id == owner_id).first()
-        kwargs['owner'] = owner
+# link checker engines selectable per scan job
+engines = {
+    'recursive': LinkChecker,
+    'async': AsyncLinkChecker,
+    'distributed': DistributedLinkChecker,
+}
 
-        user_id = kwargs.pop('user_id')
-        user = User.query.filter(User.id == user_id).first()
-        kwargs['user'] = user
 
-        checker = LinkChecker(*args, **kwargs)
-        checker.check_all_links_and_follow()
-        checker.report_errors(lambda status: status == 404)
-        checker.job.status='completed'
+def scan(url, user_id, owner_id, **options):
+    """Queue a scan job of `url` for the scan workers, which run it with `options`"""
+    with app.app_context():
+        print('Queueing scan of {} [{}]'.format(url, datetime.datetime.now().time()))
+        job = ScanJob(
+            root_url=standardize_descheme_url(ensure_protocol(standardize_url(url))),
+            start_time=datetime.datetime.utcnow(),
+            user_id=int(user_id),
+            owner_id=int(owner_id),
+            status='queued',
+            options=dict(url=url, **options))
+        db.session.add(job)
         db.session.commit()
-        if email:
-            print('Sending email')
-            email_results(checker.job)
+        return job.id
+
+
+def run_scan(job, worker_id=None):
+    """Run queued scan job `job`, or join it if distributed"""
+    print('Scanning {} [{}]'.format(job.root_url, datetime.datetime.now().time()))
+    options = dict(job.options or {})
+    email = options.pop('email', False)
+    engine = options.pop('engine', 'recursive')
+    url = options.pop('url', job.root_url)
+    if engine == 'distributed':
+        options['worker_id'] = worker_id
+    checker = engines[engine](url, job.user, job.owner, job=job, **options)
+    checker.check_all_links_and_follow()
+    if engine == 'distributed' and not checker.completed:
+        # completed by another worker
+        return
+    checker.report_errors(lambda status: status == 404)
+    checker.job.status='completed'
+    db.session.commit()
+    if email:
+        print('Sending email')
+        email_results(checker.job)
 
 
-def async_scan(url, user, owner=None):
+def async_scan(url, user, owner=None, **options):
     scan_record = ScheduledJob(root_url=url, owner=owner, user=user)
     db.session.add(scan_record)
     db.session.commit()
@@ -99,6 +127,7 @@ def async_scan(url, user, owner=None):
             url=url,
             user_id=str(user.id),
             owner_id=str(owner.id),
+            **options
         ),
         'trigger': 'date',
     }
@@ -106,7 +135,10 @@ def async_scan(url, user, owner=None):
     return scan_record, scheduler.add_job(**job_params)
 
 
-def scheduled_scan(url, user, cron_params, owner=None):
+def scheduled_scan(url, user, cron_params, owner=None, **options):
+    if options.get('incremental') is None:
+        # recurring scans rescan unchanged pages incrementally unless told not to
+        options['incremental'] = True
     scan_record = ScheduledJob(root_url=url, owner=owner, user=user)
     db.session.add(scan_record)
     db.session.commit()
@@ -118,6 +150,7 @@ def scheduled_scan(url, user, cron_params, owner=None):
             user_id=str(user.id),
             owner_id=str(owner.id),
             email=True,
+            **options
         ),
         'trigger': 'cron',
     }
@@ -157,6 +190,42 @@ def get_last_job(owner, url):
     return ScanJob.query.filter(ScanJob.id == last_job_id.scalar()).all()[-1]
 
 
+def add_checker_arguments(parser):
+    """ Add the link checker options accepted by the scan endpoints to `parser`.
+    """
+    parser.add_argument(
+        'engine', type=str, default='recursive', choices=tuple(engines),
+        help='Link checker engine')
+    parser.add_argument(
+        'max_depth', type=int, help='Maximum link depth followed from the root URL')
+    parser.add_argument(
+        'use_link_cache', type=inputs.boolean, default=True,
+        help='Reuse recent external link check results')
+    parser.add_argument(
+        'use_sitemaps', type=inputs.boolean, default=False,
+        help='Queue the pages listed in the sitemaps of the site before crawling')
+    parser.add_argument(
+        'suppress_near_duplicates', type=inputs.boolean, default=True,
+        help='Do not follow the links of pages nearly identical to a page followed before')
+    parser.add_argument(
+        'incremental', type=inputs.boolean,
+        help='Skip parsing the pages unchanged since the last incremental scan, '
+             'the default for recurring scans')
+
+
+def get_checker_options(args):
+    """ Get the link checker options parsed by `add_checker_arguments`.
+    """
+    return dict(
+        engine=args.engine,
+        max_depth=args.max_depth,
+        use_link_cache=args.use_link_cache,
+        use_sitemaps=args.use_sitemaps,
+        suppress_near_duplicates=args.suppress_near_duplicates,
+        incremental=args.incremental,
+    )
+
+
 def admin_required(f):
     """ Decorator to confirm the current API user is an admin; returns a 403 otherwise.
     """
@@ -209,12 +278,13 @@ class HistoricalResults(Resource):
         last_job_results = last_job_results.\
             offset(args.offset).\
             with_entities(
-                LinkCheck,  # For severity assessment
+                LinkCheck.severity,
                 LinkCheck.id,
                 LinkCheck.job_id,
                 LinkCheck.note,
                 LinkCheck.response,
                 LinkCheck.url,
+                LinkCheck.cached,
                 Exception.exception_description,
             )
 
@@ -232,12 +302,7 @@ class HistoricalResults(Resource):
             source_report[url] = source_report.get(url, []) + [source_url]
 
         # format results for consumption
-        results = [
-            dict(
-                severity=result[0].severity,
-                **{key: result[i + 1] for i, key in enumerate(result.keys()[1:])}
-            )
-            for result in last_job_results.all()]
+        results = [dict(zip(result.keys(), result)) for result in last_job_results.all()]
         # override note with clean exception description
         for result in results:
             result['note'] = result.get('exception_description', result['note'])
@@ -249,6 +314,46 @@ class HistoricalResults(Resource):
         )
 
 
+class SlowResults(Resource):
+    def get(self):
+        """Return the slowest links checked and pages fetched by the last job for
+        a given user and root URL, slowest first, by total time elapsed or time
+        to first byte. Optionally, specify an owner to filter results
+        """
+        parser = reqparse.RequestParser()
+        parser.add_argument('url', required=True, type=str, location='args', help='URL to check')
+        parser.add_argument('owner_id', type=str, location='args', help='Scan job owner ID')
+        parser.add_argument(
+            'limit', type=int, default=20, location='args',
+            help='Number of links and pages to fetch')
+        parser.add_argument(
+            'by', type=str, default='elapsed', choices=('elapsed', 'ttfb'), location='args',
+            help='Time to rank links and pages by')
+        args = parser.parse_args()
+        owner = get_owner(args.owner_id)
+
+        try:
+            last_job = get_last_job(owner, args.url)
+        except IndexError:
+            response = jsonify(message='Job not found')
+            response.status_code = 404
+            return response
+
+        # scans of the (job_id, elapsed) and (job_id, ttfb) indexes
+        slowest = {}
+        for name, model in (('links', LinkCheck), ('pages', PageTiming)):
+            column = getattr(model, args.by)
+            rows = model.query.\
+                filter(model.job_id == last_job.id).\
+                filter(column != None).\
+                order_by(column.desc()).\
+                limit(args.limit).\
+                all()
+            slowest[name] = [row.to_json() for row in rows]
+
+        return jsonify(job=last_job.to_json(), **slowest)
+
+
 class HistoricalJobs(Resource):
     def get(self):
         """List all historical jobs for a given user.
@@ -280,6 +385,7 @@ class LinkScan(Resource):
         parser = reqparse.RequestParser()
         parser.add_argument('url', required=True, type=str, help='URL to check')
         parser.add_argument('owner_id', type=str, help='Scan job owner')
+        add_checker_arguments(parser)
         args = parser.parse_args()
         owner = get_owner(args.owner_id)
 
@@ -293,7 +399,8 @@ class LinkScan(Resource):
                 message='User-owner is not permissioned for this website')
             response.status_code = 403
             return response
-        job, _ = async_scan(standardize_descheme_url(args.url), g.user, owner)
+        job, _ = async_scan(
+            standardize_descheme_url(args.url), g.user, owner, **get_checker_options(args))
         return jsonify(job.to_json())
 
 class LinkScanJob(Resource):
@@ -302,6 +409,7 @@ class LinkScanJob(Resource):
         parser = reqparse.RequestParser()
         parser.add_argument('url', required=True, type=str, help='URL to check')
         parser.add_argument('owner_id', type=str, help='Scan job owner')
+        add_checker_arguments(parser)
         args = parser.parse_args()
         owner = get_owner(args.owner_id)
 
@@ -317,7 +425,9 @@ class LinkScanJob(Resource):
             response.status_code = 403
             return response
         try:
-            job = scheduled_scan(standardize_descheme_url(args.url), g.user, cron_params, owner)
+            job = scheduled_scan(
+                standardize_descheme_url(args.url), g.user, cron_params, owner,
+                **get_checker_options(args))
             return jsonify(job_id=job.id)
         except ConflictingIdError:
             response = jsonify(message='This user already has a scheduled job for the root URL provided.')
@@ -553,10 +663,27 @@ class Owners(Resource):
             return response
 
 
+@app.route('/metrics', endpoint='metrics')
+@auth.login_required
+@admin_required
+def metrics():
+    """Export the time spent in each phase of the scans started recently in the
+    Prometheus text format (requires admin rights)"""
+    since = datetime.datetime.utcnow() - datetime.timedelta(hours=METRICS_WINDOW_HOURS)
+    jobs = ScanJob.query.\
+        filter(ScanJob.start_time >= since).\
+        filter(ScanJob.phase_metrics != None).\
+        with_entities(ScanJob.id, ScanJob.status, ScanJob.phase_metrics).\
+        all()
+    return Response(
+        prometheus_text(jobs, METRICS_WINDOW_HOURS), mimetype='text/plain; version=0.0.4')
+
+
 api = Api(app)
 api.add_resource(LinkScan, "/link-scan")
 api.add_resource(HistoricalJobs, "/jobs/historical")
 api.add_resource(HistoricalResults, "/results/historical")
+api.add_resource(SlowResults, "/results/slow")
 api.add_resource(LinkScanJob, "/link-scan/schedule")
 api.add_resource(UrlPermissions, "/permissions")
 api.add_resource(Owners, "/owners")
@@ -0,0 +1,191 @@
+"""Asyncio link checker: fetches pages and checks links concurrently"""
+import asyncio
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from .globals import PAGE_LIMIT, ASYNC_CONCURRENCY, AIMD_MAX
+from .link_check import LinkChecker, get_hostname
+from .concurrency import AIMDController
+
+
+class AsyncLinkChecker(LinkChecker):
+    """Link checker that runs page fetches and link checks concurrently, with at
+    most `concurrency` requests in flight at any time.
+
+    Requests are made from a thread pool so they share the fetch path of
+    `LinkChecker`; the event loop thread pops pages off the frontier, schedules
+    work and persists results. Link checks to hosts that may not be requested
+    yet wait in the event loop without taking up a request slot.
+
+    If `adaptive`, the global and per-host concurrency limits start at
+    `concurrency` and HOST_CONCURRENCY and are adapted by an AIMD controller.
+    """
+    def __init__(self, url, user, owner, concurrency=ASYNC_CONCURRENCY, adaptive=True,
+                 **kwargs):
+        super().__init__(url, user, owner, **kwargs)
+        self.concurrency = concurrency
+        if adaptive:
+            self.controller = AIMDController(limit=concurrency)
+            self.session.controller = self.controller
+            self.scheduler.controller = self.controller
+        self.pages_in_flight = 0
+        self.requests_in_flight = 0
+        self._loop = None
+        self._executor = None
+        self._slot_waiters = deque()
+        self._pages_in_flight = {}  # url -> depth
+        self._checks_in_flight = {}  # link -> external
+        self._pending = set()
+        self._host_waiters = defaultdict(deque)  # host -> futures of parked checks
+
+    def crawl(self, url):
+        """Concurrently check all links in pages popped off the frontier,
+        starting at `url`"""
+        self._loop = asyncio.new_event_loop()
+        max_workers = self.concurrency if self.controller is None else AIMD_MAX
+        self._executor = ThreadPoolExecutor(max_workers=max(max_workers, self.concurrency))
+        try:
+            self._loop.run_until_complete(self._crawl(url))
+        finally:
+            self._executor.shutdown(wait=True)
+            self._loop.close()
+
+    async def _crawl(self, url):
+        """Follow pages popped off the frontier until it is exhausted and every
+        spawned fetch and check is done"""
+        self.queue_links([url], 0)
+        while True:
+            # keep at most `concurrency` pages in flight so the frontier keeps its order
+            while self.frontier and self.pages_in_flight < self.limit and \
+                    len(self.links_checked_and_followed) <= PAGE_LIMIT:
+                url, depth = self.frontier.pop()
+                if url in self.links_checked_and_followed:
+                    continue
+                self.links_checked_and_followed.add(url)
+                self.pages_in_flight += 1
+                self._pages_in_flight[url] = depth
+                self._spawn(self._follow(url, depth))
+            if not self._pending:
+                break
+            done, _ = await asyncio.wait(
+                set(self._pending), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+            self.checkpoint_if_due()
+
+        # pages are left in the frontier only if the page limit was exceeded
+        if self.frontier:
+            print('Page limit {:,} exceeded for {}'.format(PAGE_LIMIT, self.url))
+
+    def checkpoint_state(self):
+        """Return the crawl state to resume the job from, in which pages and
+        link checks in flight are queued again"""
+        state = super().checkpoint_state()
+        state['frontier'] += [[url, depth, 1] for url, depth in self._pages_in_flight.items()]
+        state['pending'] += [list(check) for check in self._checks_in_flight.items()]
+        return state
+
+    def _spawn(self, coroutine):
+        task = self._loop.create_task(coroutine)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _request(self, func, *args):
+        """Run blocking request `func` in the thread pool, bounded by the
+        global concurrency limit"""
+        while self.requests_in_flight >= self.limit:
+            waiter = self._loop.create_future()
+            self._slot_waiters.append(waiter)
+            await waiter
+        self.requests_in_flight += 1
+        try:
+            return await self._loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.requests_in_flight -= 1
+            self._wake_slot_waiters()
+
+    @property
+    def limit(self):
+        """Current global concurrency limit"""
+        return self.concurrency if self.controller is None else self.controller.limit
+
+    def _wake_slot_waiters(self):
+        # the limit may have been raised since the waiters parked
+        for _ in range(max(1, self.limit - self.requests_in_flight)):
+            if not self._slot_waiters:
+                return
+            waiter = self._slot_waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def _follow(self, url, depth):
+        """Check all links found in `url` and queue its internal links"""
+        try:
+            print('Checking all links found in {}'.format(url))
+            page = await self._request(self.fetch_page, url)
+        finally:
+            self.pages_in_flight -= 1
+        links = self.page_links(url, page)
+        internal_links, external_links = self.group_links(links, url)
+        self.persist_links(internal_links + external_links, url)
+
+        for link in internal_links:
+            self._spawn(self._check(link))
+        for link in external_links:
+            self._spawn(self._check(link, external=True))
+        if not self.is_near_duplicate(url, page):
+            self.queue_links(internal_links, depth + 1)
+        del self._pages_in_flight[url]
+
+    async def _check(self, link, external=False):
+        """Request `link` unless already checked in this job and persist the results.
+        Outcomes of `external` links may be reused from the shared link cache"""
+        if not self.claim_link(link):
+            return
+        outcome = self.get_cached_outcome(link, external)
+        if outcome is not None:
+            self.persist_link_check(link, outcome, cached=True)
+            return
+        self._checks_in_flight[link] = external
+        outcome = await self._request_politely(link)
+        self.cache_outcome(link, outcome, external)
+        self.persist_link_check(link, outcome)
+        del self._checks_in_flight[link]
+
+    async def _request_politely(self, link):
+        """Request `link` once its host may be requested, retrying when the
+        host asks to, and return the outcome"""
+        host = get_hostname(link)
+        if self.scheduler.needs_robots(host):
+            await self._request(self.scheduler.robots.load, host, link, self.session)
+        deferred = False
+        while True:
+            delay = self.scheduler.delay(host)
+            if delay != 0 and not deferred:
+                deferred = True
+                self.scheduler.deferrals += 1
+            if delay is None:
+                # too many requests in flight to host: park until one finishes
+                waiter = self._loop.create_future()
+                self._host_waiters[host].append(waiter)
+                await waiter
+                continue
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            self.scheduler.start(host)
+            try:
+                outcome = await self._request(self.probe, link)
+            finally:
+                self._wake_waiter(host)
+            retry_after = self.scheduler.finish(host, link, outcome)
+            if retry_after is None:
+                return outcome
+            await asyncio.sleep(retry_after)
+
+    def _wake_waiter(self, host):
+        waiters = self._host_waiters[host]
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
@@ -0,0 +1,70 @@
+"""Per-host circuit breaker skipping requests to hosts that are down"""
+import time
+import threading
+from .globals import BREAKER_THRESHOLD, BREAKER_COOLOFF
+
+
+# exceptions showing a host cannot be reached
+host_down_exceptions = ('ConnectionError', 'ConnectTimeout', 'ReadTimeout')
+
+
+class HostCircuit(object):
+    """Consecutive failure count and state of the circuit of a single host"""
+    def __init__(self):
+        self.failures = 0
+        self.last_outcome = None
+        self.opened_at = None
+        self.probing = False
+
+
+class CircuitBreaker(object):
+    """Open a host's circuit after `threshold` consecutive connect failures or
+    timeouts, so that the host's remaining links are recorded as failed without
+    being requested. Once `cooloff` seconds have passed, a single half-open
+    probe request is let through: the circuit closes if it succeeds and
+    re-opens otherwise."""
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooloff=BREAKER_COOLOFF):
+        self.threshold = threshold
+        self.cooloff = cooloff
+        self.lock = threading.Lock()
+        self.circuits = {}  # hostname -> HostCircuit
+        self.short_circuits = 0
+
+    def allow(self, host):
+        """Return True if a request to `host` may be sent"""
+        with self.lock:
+            circuit = self.circuits.get(host)
+            if circuit is None or circuit.opened_at is None:
+                return True
+            if circuit.probing or time.time() - circuit.opened_at < self.cooloff:
+                self.short_circuits += 1
+                return False
+            # half-open: let a single probe through
+            circuit.probing = True
+            return True
+
+    def record(self, host, outcome):
+        """Record the `outcome` of a request to `host`"""
+        with self.lock:
+            circuit = self.circuits.setdefault(host, HostCircuit())
+            circuit.probing = False
+            if outcome.get('exception') not in host_down_exceptions:
+                circuit.failures = 0
+                circuit.opened_at = None
+                return
+            circuit.failures += 1
+            circuit.last_outcome = outcome
+            if circuit.failures >= self.threshold:
+                if circuit.opened_at is None:
+                    print('Circuit opened for {} after {} consecutive failures'.format(
+                        host, circuit.failures))
+                circuit.opened_at = time.time()
+
+    def short_circuit_outcome(self, host):
+        """Return the outcome recorded for a link to `host` while its circuit is open"""
+        circuit = self.circuits[host]
+        return dict(
+            exception=circuit.last_outcome['exception'],
+            note='Not requested: {} failed {} consecutive times ({})'.format(
+                host, circuit.failures, circuit.last_outcome.get('note')),
+        )
@@ -0,0 +1,121 @@
+"""Additive-increase/multiplicative-decrease control of scan concurrency"""
+import time
+import threading
+from .globals import ASYNC_CONCURRENCY, HOST_CONCURRENCY, AIMD_MIN, AIMD_MAX, \
+    AIMD_HOST_MAX, AIMD_WINDOW, AIMD_INCREASE, AIMD_DECREASE, AIMD_LATENCY_TOLERANCE, \
+    AIMD_ERROR_SHARE
+
+
+def is_connection_reset(exception, depth=5):
+    """Return True if `exception` was caused by the connection being reset,
+    looking into the exceptions it wraps"""
+    if isinstance(exception, ConnectionResetError):
+        return True
+    if depth == 0 or not isinstance(exception, BaseException):
+        return False
+    return any(is_connection_reset(arg, depth - 1) for arg in exception.args)
+
+
+class AIMDLimit(object):
+    """Concurrency limit of a single scope, re-assessed every `window` requests:
+    increased by `increase` while the p95 latency stays within `tolerance` times
+    the lowest p95 seen and the share of throttled or reset requests within
+    `error_share`, and multiplied by `decrease` otherwise"""
+    def __init__(self, scope, limit, min_limit, max_limit, window=AIMD_WINDOW,
+                 increase=AIMD_INCREASE, decrease=AIMD_DECREASE,
+                 tolerance=AIMD_LATENCY_TOLERANCE, error_share=AIMD_ERROR_SHARE):
+        self.scope = scope
+        self.limit = float(limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.window = window
+        self.increase = increase
+        self.decrease = decrease
+        self.tolerance = tolerance
+        self.error_share = error_share
+        self.latencies = []
+        self.errors = 0
+        self.baseline = None
+
+    def observe(self, seconds, error=False):
+        """Record a request that took `seconds`; return the resulting decision
+        once the window is full, else None"""
+        self.latencies.append(seconds)
+        self.errors += error
+        if len(self.latencies) < self.window:
+            return None
+        ordered = sorted(self.latencies)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        errors = self.errors
+        self.latencies = []
+        self.errors = 0
+        if self.baseline is None or p95 < self.baseline:
+            self.baseline = p95
+
+        old = int(self.limit)
+        if errors > self.error_share * self.window:
+            reason = '{} throttled or reset'.format(errors)
+            self.limit = max(self.min_limit, self.limit * self.decrease)
+        elif p95 > self.tolerance * self.baseline:
+            reason = 'p95 {:.3f}s over {:.3f}s baseline'.format(p95, self.baseline)
+            self.limit = max(self.min_limit, self.limit * self.decrease)
+        else:
+            reason = 'steady'
+            self.limit = min(self.max_limit, self.limit + self.increase)
+        return dict(scope=self.scope, old=old, new=int(self.limit), p95=p95,
+                    errors=errors, reason=reason)
+
+
+class AIMDController(object):
+    """Thread-safe AIMD controller of the global concurrency of a scan and of
+    the concurrency towards each host, fed with the latency and error signal of
+    every request sent. Decisions changing a limit are printed and kept in
+    `decisions`."""
+    def __init__(self, limit=ASYNC_CONCURRENCY, host_limit=HOST_CONCURRENCY,
+                 min_limit=AIMD_MIN, max_limit=AIMD_MAX, host_max_limit=AIMD_HOST_MAX):
+        self.host_initial = host_limit
+        self.host_max_limit = host_max_limit
+        self.lock = threading.Lock()
+        self.start = time.time()
+        self.global_limit = AIMDLimit('global', limit, min_limit, max_limit)
+        self.host_limits = {}  # host -> AIMDLimit
+        self.decisions = []
+
+    @property
+    def limit(self):
+        """Current global concurrency limit"""
+        return int(self.global_limit.limit)
+
+    def host_limit(self, host):
+        """Current concurrency limit towards `host`"""
+        host_limit = self.host_limits.get(host)
+        return self.host_initial if host_limit is None else int(host_limit.limit)
+
+    def observe(self, host, seconds, error=False):
+        """Record a request to `host` that took `seconds` and whether it was
+        throttled or its connection reset"""
+        with self.lock:
+            host_limit = self.host_limits.get(host)
+            if host_limit is None:
+                host_limit = self.host_limits[host] = AIMDLimit(
+                    host, self.host_initial, 1, self.host_max_limit)
+            for scope in (self.global_limit, host_limit):
+                decision = scope.observe(seconds, error)
+                if decision is not None:
+                    self.decide(decision)
+
+    def decide(self, decision):
+        if decision['old'] == decision['new']:
+            return
+        decision['at'] = round(time.time() - self.start, 3)
+        self.decisions.append(decision)
+        print('Concurrency of {}: {} -> {} ({})'.format(
+            decision['scope'], decision['old'], decision['new'], decision['reason']))
+
+    def to_json(self):
+        with self.lock:
+            return list(self.decisions)
+
+    def __repr__(self):
+        return '<Concurrency {} global, {:,} decisions over {:,} hosts>'.format(
+            self.limit, len(self.decisions), len(self.host_limits))
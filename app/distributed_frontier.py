@@ -0,0 +1,197 @@
+"""Crawl frontier shared through the database by the workers of a scan job"""
+import os
+import socket
+import datetime
+from sqlalchemy import or_, and_, select
+from sqlalchemy.dialects import postgresql
+from . import db
+from .models import FrontierURL, LinkCheck, ScanJob
+from .globals import PAGE_LIMIT, FRONTIER_LEASE_SECONDS
+
+
+def default_worker_id():
+    return '{}:{}'.format(socket.gethostname(), os.getpid())
+
+
+def insert_ignore(table, rows):
+    """Insert `rows` into `table`, skipping rows conflicting with existing ones"""
+    dialect = db.session.bind.dialect.name
+    if dialect == 'postgresql':
+        statement = postgresql.insert(table).on_conflict_do_nothing()
+    elif dialect == 'sqlite':
+        statement = table.insert().prefix_with('OR IGNORE')
+    else:
+        statement = table.insert().prefix_with('IGNORE')
+    db.session.execute(statement, rows)
+
+
+class DistributedFrontier(object):
+    """Frontier of scan job `job_id` in the frontier_url table, from which any
+    number of workers lease pages to follow, shallowest first.
+
+    Pages are claimed with SELECT ... FOR UPDATE SKIP LOCKED where supported,
+    and a conditional UPDATE, so that each page is leased by a single worker.
+    Leases expire after `lease_seconds`, after which pages of crashed workers
+    are claimed again. The same table records which worker claimed checking
+    each link, so that links found by several workers are checked once."""
+    table = FrontierURL.__table__
+
+    def __init__(self, job_id, worker_id=None, max_depth=None,
+                 lease_seconds=FRONTIER_LEASE_SECONDS, page_limit=PAGE_LIMIT):
+        self.job_id = job_id
+        self.worker_id = worker_id or default_worker_id()
+        self.max_depth = max_depth
+        self.lease = datetime.timedelta(seconds=lease_seconds)
+        self.page_limit = page_limit
+
+    def push(self, urls, depth):
+        """Queue pages `urls` found at `depth` for following, unless already queued"""
+        urls = list(urls)
+        if not urls or (self.max_depth is not None and depth > self.max_depth):
+            return
+        insert_ignore(self.table, [
+            dict(job_id=self.job_id, url=url, depth=depth, status='queued', checked=False)
+            for url in urls])
+        # links only checked so far become pages to follow
+        db.session.execute(
+            self.table.update().
+            where(self.table.c.job_id == self.job_id).
+            where(self.table.c.url.in_(urls)).
+            where(self.table.c.status == None).
+            values(status='queued', depth=depth))
+        db.session.commit()
+
+    def claimable(self, now):
+        return or_(
+            self.table.c.status == 'queued',
+            and_(self.table.c.status == 'leased', self.table.c.lease_expires < now))
+
+    def pages_claimed(self):
+        """Return the number of pages leased by any worker, as counted by `claim`"""
+        pages_claimed, = ScanJob.query.\
+            filter(ScanJob.id == self.job_id).\
+            with_entities(ScanJob.pages_claimed).\
+            one()
+        return pages_claimed
+
+    def count_claim(self):
+        """Count a newly leased page against the page limit of the job; return
+        False if the limit was reached"""
+        jobs = ScanJob.__table__
+        result = db.session.execute(
+            jobs.update().
+            where(jobs.c.id == self.job_id).
+            where(jobs.c.pages_claimed < self.page_limit).
+            values(pages_claimed=jobs.c.pages_claimed + 1))
+        return result.rowcount == 1
+
+    def claim(self):
+        """Lease the shallowest page that is queued or whose lease expired;
+        return its (id, url, depth), or None if there is none"""
+        if self.pages_claimed() >= self.page_limit:
+            db.session.commit()
+            return None
+        now = datetime.datetime.utcnow()
+        candidates = FrontierURL.query.\
+            filter(FrontierURL.job_id == self.job_id).\
+            filter(self.claimable(now)).\
+            order_by(FrontierURL.depth, FrontierURL.id).\
+            with_entities(
+                FrontierURL.id, FrontierURL.url, FrontierURL.depth,
+                FrontierURL.status, FrontierURL.lease_owner).\
+            limit(10).\
+            with_for_update(skip_locked=True).\
+            all()
+        for candidate in candidates:
+            result = db.session.execute(
+                self.table.update().
+                where(self.table.c.id == candidate.id).
+                where(self.claimable(now)).
+                values(status='leased', lease_owner=self.worker_id,
+                       lease_expires=now + self.lease))
+            if result.rowcount != 1:
+                # claimed by another worker in the meantime
+                continue
+            if candidate.status == 'leased':
+                print('Lease of {} by {} expired'.format(candidate.url, candidate.lease_owner))
+                self.release_checks(candidate.lease_owner)
+            elif not self.count_claim():
+                # other workers reached the page limit in the meantime
+                db.session.rollback()
+                return None
+            db.session.commit()
+            return candidate.id, candidate.url, candidate.depth
+        db.session.commit()
+        return None
+
+    def complete(self, page_id):
+        """Mark page `page_id` as followed"""
+        db.session.execute(
+            self.table.update().
+            where(self.table.c.id == page_id).
+            values(status='done', lease_expires=None))
+        db.session.commit()
+
+    def claim_checks(self, links):
+        """Claim checking each link in `links`; return the set of links claimed,
+        leaving out those claimed by any worker before"""
+        links = list(links)
+        if not links:
+            return set()
+        insert_ignore(self.table, [
+            dict(job_id=self.job_id, url=link, checked=False) for link in links])
+        unchecked = and_(
+            self.table.c.job_id == self.job_id,
+            self.table.c.url.in_(links),
+            self.table.c.checked == False)
+        claim = self.table.update().\
+            where(unchecked).\
+            values(checked=True, checked_by=self.worker_id)
+        if db.session.bind.dialect.name == 'postgresql':
+            claimed = {url for url, in db.session.execute(claim.returning(self.table.c.url))}
+        else:
+            # no UPDATE ... RETURNING: lock the links to claim, then claim them
+            claimed = {url for url, in db.session.execute(
+                select([self.table.c.url]).where(unchecked).with_for_update())}
+            db.session.execute(claim)
+        db.session.commit()
+        return claimed
+
+    def release_checks(self, worker_id):
+        """Release the links claimed by `worker_id` whose checks it did not persist"""
+        persisted = select([LinkCheck.url]).where(LinkCheck.job_id == self.job_id)
+        db.session.execute(
+            self.table.update().
+            where(self.table.c.job_id == self.job_id).
+            where(self.table.c.checked_by == worker_id).
+            where(~self.table.c.url.in_(persisted)).
+            values(checked=False, checked_by=None))
+
+    def finish(self):
+        """Flip the job's status to completed once no page is left to follow;
+        return True for the single worker that did so"""
+        pending_statuses = ['leased']
+        if self.pages_claimed() < self.page_limit:
+            pending_statuses.append('queued')
+        pending = FrontierURL.query.\
+            filter(FrontierURL.job_id == self.job_id).\
+            filter(FrontierURL.status.in_(pending_statuses)).\
+            count()
+        if pending:
+            db.session.commit()
+            return False
+        result = db.session.execute(
+            ScanJob.__table__.update().
+            where(ScanJob.__table__.c.id == self.job_id).
+            where(ScanJob.__table__.c.status != 'completed').
+            values(status='completed'))
+        db.session.commit()
+        return result.rowcount == 1
+
+    def completed(self):
+        status, = ScanJob.query.\
+            filter(ScanJob.id == self.job_id).\
+            with_entities(ScanJob.status).\
+            one()
+        db.session.commit()
+        return status == 'completed'
@@ -0,0 +1,97 @@
+"""Link checker cooperating with other workers on a scan job through a shared frontier"""
+import time
+from .globals import FRONTIER_POLL_SECONDS
+from . import db
+from .link_check import LinkChecker, standardize_url
+from .metrics import ScanMetrics
+from .models import ScanJob
+from .distributed_frontier import DistributedFrontier
+
+
+class DistributedLinkChecker(LinkChecker):
+    """Link checker following pages leased from the frontier of its job in the
+    database, so that any number of workers, in as many processes or on as many
+    nodes, crawl the same site together. Workers join an existing `job`, or
+    create it if not given.
+
+    Each link is checked by the first worker to claim it. A worker is done once
+    no page is queued or leased by any worker, and the last worker done flips
+    the job's status to completed.
+    """
+    def __init__(self, url, user, owner, max_depth=None, worker_id=None, **kwargs):
+        super().__init__(url, user, owner, max_depth=max_depth, **kwargs)
+        self.shared_frontier = DistributedFrontier(
+            self.job.id, worker_id=worker_id, max_depth=max_depth)
+        self.completed = False
+        self.pages_followed = 0
+
+    def checkpoint_state(self):
+        """The frontier is shared in the database, so checkpoints are heartbeats"""
+        return None
+
+    def persist_phase_metrics(self):
+        """Add the metrics of this worker since it last persisted them to those
+        of the job, which every worker adds to"""
+        db.session.refresh(self.job, ['phase_metrics'], with_for_update=True)
+        totals = ScanMetrics()
+        totals.load(self.job.phase_metrics or {})
+        totals.load(self.metrics.drain())
+        self.job.phase_metrics = totals.to_json()
+
+    def seeds_from_sitemaps(self):
+        """The frontier is seeded once, by the worker following the root page"""
+        return False
+
+    def check_links(self, links, external=False):
+        """Check each link in array `links` not claimed by any worker before"""
+        links = [link for link in links if link not in self.links_checked]
+        claimed = self.shared_frontier.claim_checks(links)
+        # links claimed by other workers are checked by them
+        self.links_checked.update(link for link in links if link not in claimed)
+        super().check_links([link for link in links if link in claimed], external)
+
+    def queue_links(self, links, depth):
+        """Queue each link in array `links` found at `depth` in the shared frontier"""
+        self.shared_frontier.push(
+            {link for link in map(standardize_url, links) if self.traps.admit(link)}, depth)
+
+    def crawl(self, url):
+        """Follow pages leased from the shared frontier, starting at `url`, until
+        no page is left to follow by any worker"""
+        self.queue_links([url], 0)
+        while True:
+            self.checkpoint_if_due()
+            claimed = self.shared_frontier.claim()
+            if claimed is None:
+                if self.shared_frontier.finish():
+                    self.completed = True
+                    print('Completed job {} after following {:,} pages'.format(
+                        self.job.id, self.pages_followed))
+                    return
+                if self.shared_frontier.completed():
+                    return
+                # pages leased by other workers may yet queue more pages
+                time.sleep(FRONTIER_POLL_SECONDS)
+                continue
+
+            page_id, url, depth = claimed
+            if depth == 0 and self.use_sitemaps:
+                self.seed_from_sitemaps()
+            self.links_checked_and_followed.add(url)
+            internal_links = self.check_all_links(url)
+            self.check_deferred_links(wait=True)
+            self.queue_links(internal_links, depth + 1)
+            # results are persisted before the page is done for other workers
+            self.writes.flush()
+            self.shared_frontier.complete(page_id)
+            self.pages_followed += 1
+
+
+def run_worker(job_id, worker_id=None, **kwargs):
+    """Join scan job `job_id` as a worker until no page is left to follow;
+    return True if this worker completed the job"""
+    job = ScanJob.query.get(job_id)
+    checker = DistributedLinkChecker(
+        job.root_url, job.user, job.owner, job=job, worker_id=worker_id, **kwargs)
+    checker.check_all_links_and_follow()
+    return checker.completed
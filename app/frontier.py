@@ -0,0 +1,202 @@
+"""Crawl frontier: pages queued for link checking and following"""
+import os
+import heapq
+import tempfile
+import itertools
+from .globals import FRONTIER_MAX_QUEUED, FRONTIER_SPILL_DIR
+from .url_sets import HashedUrlSet
+
+
+class Frontier(object):
+    """Priority queue of pages to crawl, ordered breadth first.
+
+    Pages are popped shallowest first; among pages at the same depth, those
+    with the most in-links found so far are popped first. Pages deeper than
+    `max_depth`, or which `traps` tells to be crawler traps, are never queued.
+    """
+    def __init__(self, max_depth=None, traps=None):
+        self.max_depth = max_depth
+        self.traps = traps
+        self.heap = []
+        self.queued = {}  # url -> heap entry
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.queued)
+
+    def __contains__(self, url):
+        return url in self.queued
+
+    def push(self, url, depth):
+        """Queue `url` found at `depth`; return True if it was queued"""
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        entry = self.queued.get(url)
+        if entry is None and self.traps is not None and not self.traps.admit(url):
+            return False
+        if entry is not None:
+            # found again: re-queue with one more in-link, the old entry goes stale
+            depth, inlinks = min(depth, entry[0]), entry[1] - 1
+        else:
+            inlinks = -1
+        entry = [depth, inlinks, next(self.counter), url]
+        self.queued[url] = entry
+        heapq.heappush(self.heap, entry)
+        return True
+
+    def to_json(self):
+        """Return the queued pages as [url, depth, in-links] lists, in queue order"""
+        return [[url, depth, -inlinks] for depth, inlinks, _, url in sorted(self.queued.values())]
+
+    def load(self, entries):
+        """Queue the pages of `entries` returned by `to_json`"""
+        for url, depth, inlinks in entries:
+            entry = [depth, -inlinks, next(self.counter), url]
+            self.queued[url] = entry
+            heapq.heappush(self.heap, entry)
+
+    def close(self):
+        """Release the resources of a frontier no longer resumed"""
+
+    def pop(self):
+        """Remove and return the next `(url, depth)` to crawl"""
+        while self.heap:
+            entry = heapq.heappop(self.heap)
+            depth, _, _, url = entry
+            if self.queued.get(url) is entry:
+                del self.queued[url]
+                return url, depth
+        raise IndexError('pop from an empty frontier')
+
+
+class SpillingFrontier(Frontier):
+    """Frontier keeping at most `max_queued` pages in memory. Pages queued
+    beyond are spilled to a file per depth in `spill_dir`, and read back in the
+    order they were spilled once no page in memory is shallower, so pages are
+    still popped breadth first, though spilled pages are not ordered by in-links.
+    Spilled pages are remembered as 64-bit hashes to queue each page once.
+
+    Checkpoints refer to the spill files by path and read offset, so spill
+    files are kept until the frontier is closed."""
+    def __init__(self, max_depth=None, traps=None, max_queued=FRONTIER_MAX_QUEUED,
+                 spill_dir=FRONTIER_SPILL_DIR):
+        super().__init__(max_depth, traps)
+        self.max_queued = max_queued
+        self.spill_dir = spill_dir
+        self.spills = {}  # depth -> [file, read offset]
+        self.spill_paths = []
+        self.n_spilled = 0
+        self.spilled = HashedUrlSet()
+
+    def __len__(self):
+        return len(self.queued) + self.n_spilled
+
+    def __contains__(self, url):
+        return url in self.queued or url in self.spilled
+
+    def push(self, url, depth):
+        if url in self.queued:
+            return super().push(url, depth)
+        # spilled pages are queued once, even if popped or back in memory since
+        if url in self.spilled:
+            return True
+        if len(self.queued) < self.max_queued:
+            return super().push(url, depth)
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        if self.traps is not None and not self.traps.admit(url):
+            return False
+        if depth not in self.spills:
+            spill = tempfile.NamedTemporaryFile(
+                dir=self.spill_dir, prefix='frontier-', suffix='.txt', delete=False)
+            self.spills[depth] = [spill, 0]
+            self.spill_paths.append(spill.name)
+        spill = self.spills[depth][0]
+        spill.seek(0, 2)
+        spill.write(url.encode('utf-8') + b'\n')
+        self.spilled.add(url)
+        self.n_spilled += 1
+        return True
+
+    def min_depth(self):
+        """Return the depth of the next page in memory, or None"""
+        while self.heap and self.queued.get(self.heap[0][3]) is not self.heap[0]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def read_spilled(self, depth, n):
+        """Read back up to `n` pages spilled at `depth`"""
+        spill, offset = self.spills[depth]
+        spill.seek(offset)
+        urls = []
+        while len(urls) < n:
+            line = spill.readline()
+            if not line:
+                spill.close()
+                del self.spills[depth]
+                break
+            urls.append(line[:-1].decode('utf-8'))
+        else:
+            self.spills[depth][1] = spill.tell()
+        return urls
+
+    def unspill(self):
+        """Read spilled pages back into memory if no page in memory is shallower"""
+        while self.spills:
+            depth = min(self.spills)
+            min_depth = self.min_depth()
+            if min_depth is not None and min_depth <= depth:
+                return
+            urls = self.read_spilled(depth, max(1, self.max_queued - len(self.queued)))
+            for url in urls:
+                self.n_spilled -= 1
+                entry = [depth, -1, next(self.counter), url]
+                self.queued[url] = entry
+                heapq.heappush(self.heap, entry)
+            if urls:
+                return
+
+    def to_json(self):
+        """Return the pages in memory as `Frontier.to_json` does, and the spill
+        files as [depth, path, read offset] lists"""
+        for spill, _ in self.spills.values():
+            spill.flush()
+        return dict(
+            queued=super().to_json(),
+            spills=[[depth, spill.name, offset]
+                    for depth, (spill, offset) in sorted(self.spills.items())])
+
+    def load(self, entries):
+        """Queue the pages of `entries` returned by `to_json`, reopening the
+        spill files it refers to"""
+        if isinstance(entries, list):
+            return super().load(entries)
+        super().load(entries['queued'])
+        for depth, path, offset in entries['spills']:
+            if not os.path.exists(path):
+                print('Spill file {} of pages at depth {} is gone, pages not resumed'.format(
+                    path, depth))
+                continue
+            spill = open(path, 'r+b')
+            position = 0
+            for line in spill:
+                self.spilled.add(line[:-1].decode('utf-8'))
+                position += len(line)
+                if position > offset:
+                    self.n_spilled += 1
+            self.spills[depth] = [spill, offset]
+            self.spill_paths.append(path)
+
+    def close(self):
+        """Close and remove the spill files"""
+        for spill, _ in self.spills.values():
+            spill.close()
+        self.spills = {}
+        for path in self.spill_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        self.spill_paths = []
+
+    def pop(self):
+        self.unspill()
+        return super().pop()
@@ -1,3 +1,64 @@
 """Set global statics"""
+from os import getenv
+
 GET_TIMEOUT = 10
-PAGE_LIMIT = 5000
\ No newline at end of file
+PAGE_LIMIT = 5000
+ASYNC_CONCURRENCY = 20
+WRITE_BATCH_SIZE = 500
+WRITE_BATCH_SECONDS = 5
+POOL_SIZE_PER_HOST = 10
+MAX_CONNECTIONS = 50
+MAX_POOLED_HOSTS = 100
+LINK_CACHE_TTL = 6 * 60 * 60
+LINK_CACHE_SIZE = 100000
+HEAD_FALLBACK_STATUSES = (400, 403, 405, 406, 501, 999)
+CHUNK_SIZE = 16 * 1024
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+CHARSET_SNIFF_BYTES = 1024
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+URL_CACHE_SIZE = 2 ** 16
+BREAKER_THRESHOLD = 3
+BREAKER_COOLOFF = 60
+TIMEOUT_MIN = 2
+TIMEOUT_MAX = 30
+TIMEOUT_MULTIPLIER = 3
+LATENCY_ALPHA = 0.2
+LATENCY_WINDOW = 50
+LATENCY_MIN_SAMPLES = 5
+LATENCY_MAX_HOSTS = 1000
+HOST_CONCURRENCY = 8
+HOST_MAX_RATE = 50
+CRAWL_DELAY_MAX = 10
+RETRY_AFTER_MAX = 60
+RETRY_LIMIT = 2
+THROTTLE_STATUSES = (429, 503)
+AIMD_MIN = 2
+AIMD_MAX = 50
+AIMD_HOST_MAX = 32
+AIMD_WINDOW = 20
+AIMD_INCREASE = 1
+AIMD_DECREASE = 0.5
+AIMD_LATENCY_TOLERANCE = 2
+AIMD_ERROR_SHARE = 0.05
+FRONTIER_LEASE_SECONDS = 5 * 60
+FRONTIER_POLL_SECONDS = 1
+LEADER_LEASE_SECONDS = 30
+LEADER_RENEW_SECONDS = 10
+WORKER_POLL_SECONDS = 5
+CHECKPOINT_SECONDS = 60
+STALE_JOB_SECONDS = 15 * 60
+HEARTBEAT_SECONDS = 60
+MAX_RESUMES = 3
+SITEMAP_MAX_FILES = 50
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024
+TRAP_MAX_PATH_DEPTH = 12
+TRAP_MAX_SEGMENT_REPEATS = 2
+TRAP_TEMPLATE_CAP = 500
+SIMHASH_MAX_DISTANCE = 6
+SIMHASH_MIN_FEATURES = 10
+SIMHASH_MIN_PAGES = 10
+SIMHASH_DF_BUCKETS = 2 ** 16
+FRONTIER_MAX_QUEUED = 10000
+FRONTIER_SPILL_DIR = getenv('FRONTIER_SPILL_DIR')  # None for the system temporary directory
+METRICS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+METRICS_WINDOW_HOURS = 24
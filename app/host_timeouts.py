@@ -0,0 +1,124 @@
+"""Per-host connect and read timeouts adapted to the latency observed for each host"""
+import threading
+from collections import deque
+from .globals import GET_TIMEOUT, TIMEOUT_MIN, TIMEOUT_MAX, TIMEOUT_MULTIPLIER, \
+    LATENCY_ALPHA, LATENCY_WINDOW, LATENCY_MIN_SAMPLES, LATENCY_MAX_HOSTS
+
+
+class LatencyStats(object):
+    """Exponentially weighted moving average and recent samples of a latency,
+    in seconds, and the number of samples seen"""
+    def __init__(self, alpha=LATENCY_ALPHA, window=LATENCY_WINDOW):
+        self.alpha = alpha
+        self.ewma = None
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        if self.ewma is None:
+            self.ewma = seconds
+        else:
+            self.ewma += self.alpha * (seconds - self.ewma)
+
+    def percentile(self, share):
+        """Return the latency that a `share` of recent samples do not exceed"""
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+    def to_json(self):
+        """Return the EWMA, p95 and number of samples, without the samples"""
+        if not self.samples:
+            return dict(ewma=None, p95=None, count=0)
+        return dict(ewma=round(self.ewma, 6), p95=round(self.percentile(0.95), 6),
+                    count=self.count)
+
+    def load(self, data):
+        """Warm up with a summary persisted by `to_json`: the p95 stands for up
+        to LATENCY_MIN_SAMPLES samples, until pushed out by new samples"""
+        if data.get('p95') is not None:
+            for _ in range(min(data.get('count', 0), LATENCY_MIN_SAMPLES)):
+                self.samples.append(data['p95'])
+        # latencies persisted before summaries were
+        for seconds in data.get('samples', []):
+            self.samples.append(seconds)
+        self.count = data.get('count', len(self.samples))
+        self.ewma = data.get('ewma')
+
+
+class HostLatency(object):
+    """Connect and first byte latencies of a single host"""
+    def __init__(self):
+        self.connect = LatencyStats()
+        self.first_byte = LatencyStats()
+
+    def count(self):
+        return self.connect.count + self.first_byte.count
+
+
+class HostTimeouts(object):
+    """Thread-safe per-host latency tracker deriving each host's connect and
+    read timeouts from the larger of the EWMA and the p95 of its latencies,
+    times `multiplier`, within `min_timeout` and `max_timeout`.
+    Hosts with fewer than LATENCY_MIN_SAMPLES samples get `default` timeouts.
+    Only the `max_hosts` hosts with the most samples are persisted."""
+    def __init__(self, default=GET_TIMEOUT, min_timeout=TIMEOUT_MIN,
+                 max_timeout=TIMEOUT_MAX, multiplier=TIMEOUT_MULTIPLIER,
+                 max_hosts=LATENCY_MAX_HOSTS):
+        self.default = default
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.multiplier = multiplier
+        self.max_hosts = max_hosts
+        self.lock = threading.Lock()
+        self.hosts = {}  # hostname -> HostLatency
+
+    def __len__(self):
+        return len(self.hosts)
+
+    def derive(self, stats):
+        if len(stats) < LATENCY_MIN_SAMPLES:
+            return self.default
+        timeout = max(stats.ewma, stats.percentile(0.95)) * self.multiplier
+        return min(self.max_timeout, max(self.min_timeout, timeout))
+
+    def timeout(self, host):
+        """Return the (connect, read) timeouts for a request to `host`"""
+        with self.lock:
+            latency = self.hosts.get(host)
+            if latency is None:
+                return self.default, self.default
+            return self.derive(latency.connect), self.derive(latency.first_byte)
+
+    def record_connect(self, host, seconds):
+        with self.lock:
+            self.hosts.setdefault(host, HostLatency()).connect.add(seconds)
+
+    def record_first_byte(self, host, seconds):
+        with self.lock:
+            self.hosts.setdefault(host, HostLatency()).first_byte.add(seconds)
+
+    def to_json(self):
+        """Return the latency summaries of the `max_hosts` hosts with the most samples"""
+        with self.lock:
+            hosts = sorted(self.hosts.items(), key=lambda item: -item[1].count())
+            return {
+                host: dict(
+                    connect=latency.connect.to_json(),
+                    first_byte=latency.first_byte.to_json())
+                for host, latency in hosts[:self.max_hosts]}
+
+    def load(self, data):
+        """Warm up with latencies persisted by `to_json`"""
+        with self.lock:
+            for host, stats in data.items():
+                latency = self.hosts.setdefault(host, HostLatency())
+                latency.connect.load(stats.get('connect', {}))
+                latency.first_byte.load(stats.get('first_byte', {}))
+
+    def __repr__(self):
+        return '<Latency of {:,} hosts>'.format(len(self.hosts))
@@ -0,0 +1,178 @@
+"""Pooled keep-alive HTTP session shared by page fetches and link checks"""
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from requests.compat import urlparse
+from .globals import POOL_SIZE_PER_HOST, MAX_CONNECTIONS, MAX_POOLED_HOSTS, THROTTLE_STATUSES
+from .host_timeouts import HostTimeouts
+from .concurrency import is_connection_reset
+
+
+headers = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/50.0.2661.102 Safari/537.36'}
+
+
+class ConnectionStats(object):
+    """Thread-safe counters of requests sent and connections opened"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.handshakes = 0
+
+    def count_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def count_handshake(self):
+        with self.lock:
+            self.handshakes += 1
+
+    @property
+    def reused(self):
+        """Number of requests sent over an already open connection"""
+        return self.requests - self.handshakes
+
+    def to_json(self):
+        return dict(
+            requests=self.requests,
+            handshakes=self.handshakes,
+            reused=self.reused,
+        )
+
+    def __repr__(self):
+        return '<{:,} requests: {:,} connections opened, {:,} reused>'.format(
+            self.requests, self.handshakes, self.reused)
+
+
+class ConnectTime(threading.local):
+    """Seconds spent resolving and connecting by the current request of each thread"""
+    seconds = 0.
+
+
+connect_time = ConnectTime()
+
+
+def response_timing(response):
+    """Return the seconds spent connecting and until the first byte of the
+    response, including redirects, and the number of redirects of `response`"""
+    return dict(
+        connect_time=getattr(response, 'connect_time', None),
+        ttfb=sum(hop.elapsed.total_seconds() for hop in response.history + [response]),
+        redirects=len(response.history),
+    )
+
+
+def timed_connect(connect, host, timeouts):
+    """Wrap method `connect` of a new connection to `host` to record how long
+    connecting takes in `timeouts`, and for the current request"""
+    def _connect(*args, **kwargs):
+        start = time.perf_counter()
+        result = connect(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        timeouts.record_connect(host, elapsed)
+        connect_time.seconds += elapsed
+        return result
+    return _connect
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """Transport adapter counting each request sent and each new connection
+    (TCP, plus TLS for HTTPS) opened by its connection pools, and recording
+    connect latencies in `timeouts` if provided"""
+    def __init__(self, stats, timeouts=None, **kwargs):
+        self.stats = stats
+        self.timeouts = timeouts
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        stats = self.stats
+        timeouts = self.timeouts
+
+        def counting_pool_class(pool_class):
+            def _new_conn(pool):
+                stats.count_handshake()
+                conn = pool_class._new_conn(pool)
+                if timeouts is not None:
+                    conn.connect = timed_connect(conn.connect, pool.host, timeouts)
+                return conn
+            return type(pool_class.__name__, (pool_class,), {'_new_conn': _new_conn})
+
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: counting_pool_class(pool_class)
+            for scheme, pool_class in self.poolmanager.pool_classes_by_scheme.items()}
+
+    def send(self, request, **kwargs):
+        self.stats.count_request()
+        return super().send(request, **kwargs)
+
+
+class HTTPSession(object):
+    """Keep-alive HTTP session pooling up to `pool_size` connections per host,
+    for up to `max_hosts` hosts, with at most `max_connections` requests in
+    flight across all hosts.
+
+    Requests are sent with the connect and read timeouts `timeouts` derived
+    for their host from the latencies observed so far, rather than the
+    `timeout` passed in. The latency of each request, and whether it was
+    throttled or its connection reset, is fed to `controller` if set.
+    Responses tell the seconds spent opening connections for the request as
+    `connect_time`, 0 if connections were reused."""
+    def __init__(self, pool_size=POOL_SIZE_PER_HOST, max_connections=MAX_CONNECTIONS,
+                 max_hosts=MAX_POOLED_HOSTS, timeouts=None, controller=None):
+        self.stats = ConnectionStats()
+        self.timeouts = timeouts if timeouts is not None else HostTimeouts()
+        self.controller = controller
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.session = requests.Session()
+        adapter = CountingHTTPAdapter(
+            self.stats,
+            self.timeouts,
+            pool_connections=max_hosts,
+            pool_maxsize=pool_size,
+            pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, url, **kwargs):
+        u = urlparse(url)
+        host = u.hostname
+        connect_timeout, read_timeout = kwargs['timeout'] = self.timeouts.timeout(host)
+        start = time.perf_counter()
+        connect_time.seconds = 0.
+        try:
+            with self.slots:
+                response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.ConnectTimeout:
+            # count timeouts as the timeout, so that slow hosts get longer ones
+            self.timeouts.record_connect(host, connect_timeout)
+            self.observe(u, connect_timeout)
+            raise
+        except requests.exceptions.ReadTimeout:
+            self.timeouts.record_first_byte(host, read_timeout)
+            self.observe(u, read_timeout)
+            raise
+        except requests.exceptions.ConnectionError as e:
+            if is_connection_reset(e):
+                self.observe(u, time.perf_counter() - start, error=True)
+            raise
+        response.connect_time = connect_time.seconds
+        for hop in response.history + [response]:
+            self.timeouts.record_first_byte(
+                urlparse(hop.url).hostname, hop.elapsed.total_seconds())
+        self.observe(
+            u, response.elapsed.total_seconds(),
+            error=response.status_code in THROTTLE_STATUSES)
+        return response
+
+    def observe(self, u, seconds, error=False):
+        """Feed the latency of a request to parsed URL `u` to the controller"""
+        if self.controller is not None:
+            self.controller.observe(
+                '{}://{}'.format(u.scheme, u.hostname), seconds, error)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,184 @@
+"""Incremental rescans: conditional requests and content hashes telling which
+pages are unchanged since the last scan of a site, whose hrefs are then reused
+instead of parsed again"""
+import time
+import hashlib
+import datetime
+import requests
+from . import db
+from .models import PageValidator
+from .globals import GET_TIMEOUT, CHUNK_SIZE, MAX_PAGE_BYTES
+from .http_session import headers, response_timing
+from .link_extract import extract_links, get_charset, is_html, limit_chunks
+from .write_buffer import insert_rows
+from .traps import Simhash
+from .metrics import ScanMetrics, TimedChunks
+
+
+class PageFetch(object):
+    """Hrefs found in a page, None if it is unchanged since the last scan, the
+    validators to request it conditionally next time, the `Simhash` features
+    of its content, and the fields of the `PageTiming` of its fetch"""
+    def __init__(self, hrefs, etag=None, last_modified=None, content_hash=None,
+                 fingerprint=None):
+        self.hrefs = hrefs
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        self.fingerprint = fingerprint
+        self.timing = None
+
+    @property
+    def unchanged(self):
+        return self.hrefs is None
+
+
+def hash_chunks(chunks, digest):
+    """Iterate over byte `chunks`, updating hash `digest` with each"""
+    for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+def fetch_page(url, session=None, validator=None, max_bytes=MAX_PAGE_BYTES, metrics=None):
+    """Get the hrefs in the HTML of `url`, requested through `session` if provided.
+    Given the `validator` of the page from the last scan, the page is requested
+    conditionally, and is unchanged if the response is a 304 or its body has the
+    same hash. The body is only read if the response is an HTML document, up to
+    `max_bytes` bytes. The time spent waiting for the response and parsing it
+    is recorded in `metrics` if given, and the timing of the fetch in the page"""
+    if metrics is None:
+        metrics = ScanMetrics()
+    http = session if session is not None else requests
+    request_headers = headers
+    if validator is not None:
+        request_headers = dict(headers)
+        if validator.etag:
+            request_headers['If-None-Match'] = validator.etag
+        if validator.last_modified:
+            request_headers['If-Modified-Since'] = validator.last_modified
+    t0 = time.time()
+    timing = {}
+
+    def fetched(page, seconds, bytes_read=0):
+        """Return `page`, fetched in `seconds` reading `bytes_read` body bytes"""
+        metrics.observe('fetch', seconds)
+        page.timing = dict(timing, elapsed=seconds, bytes_read=bytes_read)
+        return page
+
+    try:
+        response = http.get(
+            url, timeout=GET_TIMEOUT, verify=False, stream=True, headers=request_headers)
+        timing.update(response_timing(response), response=response.status_code)
+        try:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if validator is not None and response.status_code == 304:
+                return fetched(PageFetch(
+                    None, etag or validator.etag, last_modified or validator.last_modified,
+                    validator.content_hash), time.time() - t0)
+            content_type = response.headers.get('Content-Type', '')
+            if not is_html(content_type):
+                # e.g. a (potentially large) flat file
+                return fetched(PageFetch([]), time.time() - t0)
+            digest = hashlib.sha1()
+            timed_chunks = TimedChunks(
+                limit_chunks(response.iter_content(CHUNK_SIZE), max_bytes))
+            chunks = hash_chunks(timed_chunks, digest)
+            if validator is not None and validator.content_hash:
+                # read the body before parsing it, to skip parsing if unchanged
+                chunks = list(chunks)
+                if digest.hexdigest() == validator.content_hash:
+                    return fetched(
+                        PageFetch(None, etag, last_modified, validator.content_hash),
+                        time.time() - t0, timed_chunks.bytes)
+            # chunks are read as they are parsed
+            t1 = time.time()
+            waited = timed_chunks.seconds
+            fingerprint = Simhash()
+            hrefs = extract_links(chunks, get_charset(content_type), fingerprint)
+            waited_parsing = timed_chunks.seconds - waited
+            metrics.observe('parse', time.time() - t1 - waited_parsing)
+            metrics.count('hrefs_found', len(hrefs))
+            return fetched(PageFetch(
+                hrefs, etag, last_modified, digest.hexdigest(), fingerprint),
+                t1 - t0 + waited_parsing, timed_chunks.bytes)
+        finally:
+            response.close()
+    except requests.exceptions.RequestException as e:
+        print('Error while getting links in {}'.format(url))
+        print(e)
+        return fetched(PageFetch([]), time.time() - t0)
+
+
+class PageValidators(object):
+    """ETag, Last-Modified and content hash of each page of the site `root_url`
+    as of its last incremental scan, and the hrefs found in the page.
+    Validators of the pages fetched are buffered and persisted by `flush` if
+    `recording`, which only incremental scans are, as only they use them."""
+    table = PageValidator.__table__
+
+    def __init__(self, root_url, recording=True):
+        self.root_url = root_url
+        self.recording = recording
+        self.previous = {}  # url -> validator row of the last scan
+        self.updates = {}  # url -> validator row to persist
+        self.skipped = 0
+
+    def __len__(self):
+        return len(self.previous)
+
+    def load(self):
+        """Load the validators of the last scan of the site"""
+        self.previous = {
+            row.url: row for row in PageValidator.query.
+            filter(PageValidator.root_url == self.root_url).
+            with_entities(
+                PageValidator.id, PageValidator.url, PageValidator.etag,
+                PageValidator.last_modified, PageValidator.content_hash)}
+
+    def get(self, url):
+        return self.previous.get(url)
+
+    def previous_hrefs(self, url):
+        """Return the hrefs found in page `url` by the last scan"""
+        self.skipped += 1
+        hrefs, = PageValidator.query.\
+            filter(PageValidator.id == self.previous[url].id).\
+            with_entities(PageValidator.hrefs).\
+            one()
+        return hrefs
+
+    def record(self, url, page, hrefs, job_id):
+        """Buffer the validators of page `url` fetched as `page` by job `job_id`,
+        and the `hrefs` found in it"""
+        if not self.recording or page.content_hash is None:
+            return
+        self.updates[url] = dict(
+            root_url=self.root_url,
+            url=url,
+            etag=page.etag,
+            last_modified=page.last_modified,
+            content_hash=page.content_hash,
+            hrefs=hrefs,
+            job_id=job_id,
+            updated=datetime.datetime.utcnow())
+
+    def flush(self, batch_size=500):
+        """Replace the validators of the pages fetched"""
+        if not self.updates:
+            return
+        rows = list(self.updates.values())
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            db.session.execute(
+                self.table.delete().
+                where(self.table.c.root_url == self.root_url).
+                where(self.table.c.url.in_([row['url'] for row in batch])))
+            insert_rows(self.table, batch)
+        db.session.commit()
+        self.updates = {}
+
+    def __repr__(self):
+        return '<{:,} of {:,} pages unchanged since the last scan>'.format(
+            self.skipped, len(self.previous))
@@ -0,0 +1,69 @@
+"""Cache of external link check outcomes shared across the scan jobs of a process.
+
+The cache lives in process memory: scan worker processes each have their own,
+so an outcome cached by one worker is not reused by the others."""
+import time
+import threading
+from collections import OrderedDict
+from .globals import LINK_CACHE_TTL, LINK_CACHE_SIZE, THROTTLE_STATUSES
+
+
+def cacheable(outcome):
+    """Return True if `outcome` is a definitive HTTP response worth reusing
+    across jobs: not an exception, which may be a transient network failure or
+    a host short-circuited while down, nor a timeout, throttling or server
+    error response"""
+    status_code = outcome.get('response')
+    if outcome.get('exception') is not None or status_code is None:
+        return False
+    return status_code < 500 and status_code != 408 and status_code not in THROTTLE_STATUSES
+
+
+class LinkCache(object):
+    """Thread-safe LRU cache of up to `max_size` external link check outcomes,
+    each expiring `ttl` seconds after the link was checked"""
+    def __init__(self, max_size=LINK_CACHE_SIZE, ttl=LINK_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # url -> (check time, outcome)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, url):
+        """Return a copy of the cached outcome of checking `url`, or None if
+        missing or expired"""
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                del self.entries[url]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(url)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, url, outcome):
+        """Cache the `outcome` of checking `url` now, evicting the least
+        recently used outcome if full"""
+        with self.lock:
+            self.entries[url] = (time.time(), dict(outcome))
+            self.entries.move_to_end(url)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def to_json(self):
+        return dict(
+            size=len(self),
+            hits=self.hits,
+            misses=self.misses,
+        )
+
+
+# shared by all scan jobs run in this process, not by other worker processes
+link_cache = LinkCache()
@@ -1,40 +1,47 @@
 """Recursive link checker"""
+import re
+import time
 import argparse
-import requests
+from functools import lru_cache
 from requests.compat import urljoin, urlparse
-from bs4 import BeautifulSoup
 import datetime
-from .globals import GET_TIMEOUT, PAGE_LIMIT
+from .globals import PAGE_LIMIT, MAX_PAGE_BYTES, URL_CACHE_SIZE, CHECKPOINT_SECONDS, \
+    WRITE_BATCH_SIZE
 from . import app, db, scheduler
-from .models import Link, LinkCheck, ScanJob, ScheduledJob
+from .models import Link, LinkCheck, ScanJob, ScheduledJob, assess_severity
+from .frontier import Frontier, SpillingFrontier
+from .write_buffer import WriteBuffer
+from .http_session import HTTPSession, headers
+from .host_timeouts import HostTimeouts
+from .probe import LinkProber, timing_fields
+from .circuit_breaker import CircuitBreaker
+from .politeness import HostScheduler
+from .link_cache import link_cache, cacheable
+from .incremental import PageValidators, fetch_page
+from .sitemap import sitemap_urls
+from .traps import TrapDetector, NearDuplicates
+from .url_sets import make_url_set, dump_url_set, load_url_set
+from .metrics import ScanMetrics
 
 
-headers = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/50.0.2661.102 Safari/537.36'}
 web_extensions = ('html', 'htm', 'aspx', 'php', 'asp', 'cfm', 'xml')
+web_extensions_pattern = re.compile(r'\.(?:{})'.format('|'.join(web_extensions)))
 
+# each distinct URL string is parsed once
+parse_url = lru_cache(maxsize=URL_CACHE_SIZE)(urlparse)
 
-def get_all_links(url):
-    """Get all hrefs in the HTML of a given URL"""
-    if is_flat_file(url):
-        return []
-    try:
-        response = requests.get(url, timeout=GET_TIMEOUT, verify=False, headers=headers)
-    except requests.exceptions.RequestException as e:
-        print('Error while getting links in {}'.format(url))
-        print(e)
-        return []
-    html = response.content
-    soup = BeautifulSoup(html, 'lxml')
-    return [
-        bytes(a['href'], "utf-8").decode("unicode_escape")
-        for a in soup.find_all('a')
-        if a.has_attr('href')]
 
+def get_all_links(url, session=None, max_bytes=MAX_PAGE_BYTES):
+    """Get all hrefs in the HTML of a given URL, requested through `session` if provided.
+    The body is only read if the response is an HTML document, up to `max_bytes` bytes"""
+    return fetch_page(url, session, max_bytes=max_bytes).hrefs
 
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
 def get_base_url(url):
     """Strip the scheme and trailing slashes from the URL"""
     if (url.startswith('http')) and ('//' in url):
-        u = urlparse(url)
+        u = parse_url(url)
         url_root = u.netloc + u.path
     else:
         url_root = url
@@ -44,7 +51,7 @@ def get_base_url(url):
 
 def get_hostname(url):
     """strip the path and query string from the url"""
-    u = urlparse(url)
+    u = parse_url(url)
     return '{}://{}'.format(u.scheme, u.hostname)
 
 
@@ -60,28 +67,37 @@ def points_to_self(link, url_self):
 def remove_web_extensions(link):
     """ Remove web extensions (e.g., html, asp) from link URL
     """
-    link_no_web_extensions = link
-    for extension in web_extensions:
-        link_no_web_extensions = link_no_web_extensions.replace('.' + extension, '')
-    return link_no_web_extensions
+    if '.' not in link:
+        return link
+    return web_extensions_pattern.sub('', link)
 
 
 def is_internal_link(link, reference_url):
     """Return true IFF `link` is a sub-component of `reference_url`"""
+    internal = is_internal_href(link)
+    if internal is not None:
+        return internal
+    return get_base_url(link).startswith(get_base_url(reference_url))
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def is_internal_href(link):
+    """Return whether `link` is internal whatever page it is found in: True
+    for relative links and links without a domain, False for
+    protocol-relative links, or None if it depends on the page"""
     if link.startswith('//'):
         return False
     if link.startswith('/') or link.startswith('#') or link.startswith('.'):
         return True
-    if get_base_url(link).startswith(get_base_url(reference_url)):
-        return True
     link_no_web_extensions = remove_web_extensions(link)
     if '.' not in link_no_web_extensions:
         return True
-    return False
+    return None
 
 
+@lru_cache(maxsize=URL_CACHE_SIZE)
 def ensure_protocol(url, protocol='http'):
-    if urlparse(url).scheme:
+    if parse_url(url).scheme:
         return url
     if url.startswith('javascript:') or url.startswith('mailto:'):
         return url
@@ -96,7 +112,7 @@ def prepend_if_relative(url, url_base, keep_anchors=False):
         return url
     url_joined = urljoin(standardize_url(url_base, True), url)
     if not keep_anchors:
-        u = urlparse(url_joined)
+        u = parse_url(url_joined)
         return '{}://{}{}'.format(u.scheme, u.netloc, u.path)
     return url_joined
 
@@ -108,18 +124,33 @@ def group_links_internal_external(links, url):
     internal_links = []
     external_links = []
     for link in links:
-        link = link.replace('"', '').replace("'", '')
-        if is_internal_link(link, url):
-            internal_links.append(standardize_url(prepend_if_relative(link, url)))
+        internal, link_normalized = normalize_link(link, url)
+        if internal:
+            internal_links.append(link_normalized)
         else:
-            external_links.append(ensure_protocol(link.strip()))
+            external_links.append(link_normalized)
     return internal_links, external_links
 
 
+def normalize_link(link, url):
+    """Normalize href `link` found in `url`.
+    Returns a tupple: (True, standardized URL) for internal links, or
+    (False, URL with protocol) for external links.
+
+    Only joining relative links and comparing base URLs depend on `url`;
+    the other steps are memoized on the link or the joined URL alone, so
+    that hrefs repeated across pages reuse them.
+    """
+    link = link.replace('"', '').replace("'", '')
+    if is_internal_link(link, url):
+        return True, standardize_url(prepend_if_relative(link, url))
+    return False, ensure_protocol(link.strip())
+
+
 def is_flat_file(url):
     """Return True if `url` points to a (potentially large) flat file"""
     # strip url args:
-    u = urlparse(url)
+    u = parse_url(url)
     url = '{}://{}{}'.format(u.scheme, u.netloc, u.path)
     if not u.path:
         return False
@@ -134,6 +165,7 @@ def is_flat_file(url):
     return True
 
 
+@lru_cache(maxsize=URL_CACHE_SIZE)
 def standardize_url(url, keep_scheme=False):
     """Standardize `url` string formatting by removing anchors and trailing slashes,
     and by prepending schemas
@@ -146,7 +178,7 @@ def standardize_url(url, keep_scheme=False):
     # prepend scheme if necessary
     if url.startswith('//'):
         url = 'http:' + url
-    elif '.' in urlparse(url).path.split('/')[-1] and not url.startswith('/'):
+    elif '.' in parse_url(url).path.split('/')[-1] and not url.startswith('/'):
         url = ensure_protocol(url)
 
     # internal links
@@ -155,21 +187,56 @@ def standardize_url(url, keep_scheme=False):
         return url
 
     # external links
-    u = urlparse(ensure_protocol(url))
+    u = parse_url(ensure_protocol(url))
     scheme = u.scheme.replace('https', 'http') if not keep_scheme else u.scheme
     return '{}://{}{}'.format(scheme, u.netloc, u.path).strip()
 
 def standardize_descheme_url(url):
     url_standardized = standardize_url(url)
-    u = urlparse(ensure_protocol(url_standardized))
+    u = parse_url(ensure_protocol(url_standardized))
     return '{}{}'.format(u.netloc, u.path)
 
 
 class LinkChecker(object):
     """Link checker module, initialized with the root URL of the webiste to scan"""
-    def __init__(self, url, user, owner):
-        self.links_checked_and_followed = set()
+    def __init__(self, url, user, owner, max_depth=None, job=None, use_link_cache=True,
+                 incremental=False, use_sitemaps=False, bounded_memory=False,
+                 bloom_error_rate=None, suppress_near_duplicates=True):
+        self.bounded_memory = bounded_memory
+        self.links_checked_and_followed = make_url_set(bounded_memory, bloom_error_rate)
+        self.links_checked = make_url_set(bounded_memory, bloom_error_rate)
+        self.link_cache = link_cache if use_link_cache else None
+        self.link_cache_hits = 0
+        self.link_cache_misses = 0
+        self.traps = TrapDetector(admitted=make_url_set(bounded_memory))
+        self.near_duplicates = NearDuplicates() if suppress_near_duplicates else None
+        if bounded_memory:
+            self.frontier = SpillingFrontier(max_depth, self.traps)
+        else:
+            self.frontier = Frontier(max_depth, self.traps)
+        self.metrics = ScanMetrics()
+        self.writes = WriteBuffer(metrics=self.metrics)
+        self.timeouts = HostTimeouts()
+        self.session = HTTPSession(timeouts=self.timeouts)
+        self.breaker = CircuitBreaker()
+        self.prober = LinkProber(self.session, breaker=self.breaker)
+        self.scheduler = HostScheduler()
+        self.controller = None
+        self.use_sitemaps = use_sitemaps
+        self.pending_checks = []
+        self.last_checkpoint = time.time()
         self.url = ensure_protocol(standardize_url(url))
+        self.warm_timeouts(standardize_descheme_url(self.url))
+        self.validators = PageValidators(
+            standardize_descheme_url(self.url), recording=bool(incremental))
+        if incremental:
+            self.validators.load()
+        if job is not None:
+            # resume an existing job
+            self.job = job
+            self.prime_links_checked()
+            self.restore_checkpoint()
+            return
         self.job = ScanJob(
             root_url=standardize_descheme_url(self.url),
             start_time=datetime.datetime.utcnow(),
@@ -179,89 +246,315 @@ class LinkChecker(object):
         db.session.add(self.job)
         db.session.commit()
 
-    def check_link(self, link):
-        """Request the resources specified by `link` and persist the results"""
-        link_standardized = link
-        link_record_base = dict(
-            url_raw=link,
-            url=link_standardized,
-            job=self.job,
-        )
-        already_checked = LinkCheck.query.\
-            filter(LinkCheck.job == self.job).\
-            filter(LinkCheck.url == link_standardized).\
-            count() > 0
-        if already_checked:
-            return
-        else:
-            try:
-                response = requests.get(link_standardized, timeout=GET_TIMEOUT, stream=True, headers=headers)
-                note = None
-                linkcheck_record = LinkCheck(
-                    **link_record_base,
-                    response=response.status_code,
-                )
-                response.close()
-            except Exception as exception:
-                linkcheck_record = LinkCheck(
-                    **link_record_base,
-                    note=str(exception),
-                    exception=type(exception).__name__,
-                )
-
-        db.session.add(linkcheck_record)
+    def warm_timeouts(self, root_url):
+        """Load the host latencies observed by the last scan of `root_url`"""
+        previous = ScanJob.query.\
+            filter(ScanJob.root_url == root_url).\
+            filter(ScanJob.host_latency != None).\
+            order_by(ScanJob.start_time.desc()).\
+            with_entities(ScanJob.host_latency).first()
+        if previous is not None:
+            self.timeouts.load(previous.host_latency)
+
+    def persist_phase_metrics(self):
+        self.job.phase_metrics = self.metrics.to_json()
+
+    def persist_scan_stats(self):
+        """Persist the host latencies observed so the next scan starts warm,
+        the decisions of the concurrency controller if any, and the time spent
+        in each phase of the scan"""
+        self.persist_phase_metrics()
+        self.job.host_latency = self.timeouts.to_json()
+        if self.controller is not None:
+            self.job.concurrency_log = self.controller.to_json()
         db.session.commit()
-        return linkcheck_record
 
+    def checkpoint_state(self):
+        """Return the crawl state to resume the job from"""
+        return dict(
+            frontier=self.frontier.to_json(),
+            followed=dump_url_set(self.links_checked_and_followed),
+            pending=[[link, external] for _, _, link, external in self.scheduler.deferred.heap],
+            counters=dict(
+                link_cache_hits=self.link_cache_hits,
+                link_cache_misses=self.link_cache_misses,
+            ),
+        )
 
-    def check_links(self, links):
-        """Check each link in array `links`"""
+    def checkpoint(self):
+        """Persist the buffered results, then the crawl state"""
+        self.writes.flush()
+        with self.metrics.timer('commit'):
+            self.validators.flush()
+            self.job.checkpoint = self.checkpoint_state()
+            self.persist_phase_metrics()
+            self.job.heartbeat = datetime.datetime.utcnow()
+            db.session.commit()
+        self.last_checkpoint = time.time()
+
+    def checkpoint_if_due(self):
+        if self.bounded_memory:
+            self.flush_validators_if_batched()
+        if time.time() - self.last_checkpoint >= CHECKPOINT_SECONDS:
+            self.checkpoint()
+
+    def flush_validators_if_batched(self):
+        """Persist the buffered page validators once a batch is buffered"""
+        if len(self.validators.updates) >= WRITE_BATCH_SIZE:
+            with self.metrics.timer('commit'):
+                self.validators.flush()
+
+    def restore_checkpoint(self):
+        """Restore the crawl state of the job's last checkpoint, if any"""
+        state = self.job.checkpoint
+        if not state:
+            return
+        self.frontier.load(state['frontier'])
+        load_url_set(self.links_checked_and_followed, state['followed'])
+        self.pending_checks = state['pending']
+        self.link_cache_hits = state['counters']['link_cache_hits']
+        self.link_cache_misses = state['counters']['link_cache_misses']
+        self.metrics.load(self.job.phase_metrics or {})
+        print('Resuming job {} with {:,} pages followed and {:,} queued'.format(
+            self.job.id, len(self.links_checked_and_followed), len(self.frontier)))
+
+    def prime_links_checked(self):
+        """Load the links already checked in this job into the in-memory index"""
+        self.links_checked.update(
+            url for url, in self.job.link_checks.with_entities(LinkCheck.url))
+
+    def claim_link(self, link):
+        """Mark `link` as checked or in flight for this job;
+        return False if it already was"""
+        if link in self.links_checked:
+            return False
+        self.links_checked.add(link)
+        return True
+
+    def check_link(self, link, external=False):
+        """Request the resources specified by `link` and persist the results.
+        Outcomes of `external` links may be reused from the shared link cache"""
+        if not self.claim_link(link):
+            return
+        outcome = self.get_cached_outcome(link, external)
+        if outcome is not None:
+            return self.persist_link_check(link, outcome, cached=True)
+        return self.request_link_check(link, external)
+
+    def request_link_check(self, link, external=False):
+        """Request `link` and persist the results, unless its host may not be
+        requested yet or asks to retry later, in which case `link` is deferred"""
+        host = get_hostname(link)
+        if self.scheduler.needs_robots(host):
+            self.scheduler.robots.load(host, link, self.session)
+        delay = self.scheduler.delay(host)
+        if delay != 0:
+            return self.scheduler.defer(link, external, delay)
+        self.scheduler.start(host)
+        outcome = self.probe(link)
+        retry_after = self.scheduler.finish(host, link, outcome)
+        if retry_after is not None:
+            return self.scheduler.defer(link, external, retry_after)
+        self.cache_outcome(link, outcome, external)
+        return self.persist_link_check(link, outcome)
+
+    def check_deferred_links(self, wait=False):
+        """Check the deferred links that are ready, or all of them if `wait`"""
+        while True:
+            if wait:
+                self.checkpoint_if_due()
+            deferred = self.scheduler.deferred.pop(wait)
+            if deferred is None:
+                return
+            self.request_link_check(*deferred)
+
+    def get_cached_outcome(self, link, external):
+        """Return the cached outcome of checking `link` if external and cached"""
+        if not external or self.link_cache is None:
+            return None
+        outcome = self.link_cache.get(link)
+        if outcome is None:
+            self.link_cache_misses += 1
+        else:
+            self.link_cache_hits += 1
+        return outcome
+
+    def cache_outcome(self, link, outcome, external):
+        """Cache the `outcome` of checking `link` if external and definitive,
+        without the timing of the requests, which reusing it does not make"""
+        if external and self.link_cache is not None and cacheable(outcome):
+            self.link_cache.put(link, {
+                field: value for field, value in outcome.items() if field not in timing_fields})
+
+    def probe(self, link):
+        """Request `link` and return the outcome"""
+        with self.metrics.timer('check_network'):
+            return self.prober.request(link)
+
+    def persist_link_check(self, link, outcome, cached=False):
+        """Buffer the `outcome` of a request to `link` for persisting"""
+        with self.metrics.timer('check_persist'):
+            row = dict(
+                url_raw=link,
+                url=link,
+                job_id=self.job.id,
+                cached=cached,
+                **outcome
+            )
+            row['severity'] = assess_severity(link, row.get('response'), row.get('exception'))
+            self.writes.add_link_check(**row)
+            self.metrics.count('links_cached' if cached else 'links_checked')
+            return LinkCheck(**row)
+
+    def check_links(self, links, external=False):
+        """Check each link in array `links`, then the deferred links that are ready"""
+        for link in links:
+            self.check_link(link, external)
+        self.check_deferred_links()
+
+    def group_links(self, links, url_standardized):
+        """Split the hrefs found in `url_standardized` into internal links,
+        which are followed, and external links"""
+        with self.metrics.timer('group_links'):
+            _internal_links, external_links = group_links_internal_external(
+                links, url_standardized)
+            internal_links = []
+            for internal_link in _internal_links:
+                if internal_link.startswith(self.url):
+                    internal_links.append(internal_link)
+                else:
+                    # link is above root so we don't want to scan it's children
+                    external_links.append(internal_link)
+            return internal_links, external_links
+
+    def persist_links(self, links, source_url):
+        """Buffer each link in array `links` found in `source_url` for persisting"""
         for link in links:
-            self.check_link(link)
+            self.writes.add_link(url=link, source_url=source_url, job_id=self.job.id)
+
+    def fetch_page(self, url):
+        """Fetch page `url`, conditionally if the last scan of an incremental
+        scan fetched it"""
+        return fetch_page(
+            url, self.session, self.validators.get(url), metrics=self.metrics)
+
+    def page_links(self, url, page):
+        """Return the hrefs of page `url` fetched as `page`, those found by
+        the last scan if it is unchanged, and buffer the timing of its fetch"""
+        hrefs = self.validators.previous_hrefs(url) if page.unchanged else page.hrefs
+        self.validators.record(url, page, hrefs, self.job.id)
+        if page.timing is not None:
+            self.writes.add_page_timing(url=url, job_id=self.job.id, **page.timing)
+        return hrefs
+
+    def is_near_duplicate(self, url, page):
+        """Return True if page `url` fetched as `page` is a near-duplicate of a
+        page followed before, so that its links are not followed"""
+        if self.near_duplicates is None or page.fingerprint is None:
+            return False
+        if not self.near_duplicates.seen(page.fingerprint):
+            return False
+        print('Not following the links of near-duplicate page {}'.format(url))
+        return True
 
     def check_all_links(self, url):
         """Find all links within `url` and check each one"""
         url_standardized = standardize_url(url)
         print('Checking all links found in {}'.format(url_standardized))
-        links = get_all_links(url_standardized)
-        _internal_links, external_links = group_links_internal_external(links, url_standardized)
-        internal_links = []
-        for internal_link in _internal_links:
-            if internal_link.startswith(self.url):
-                internal_links.append(internal_link)
-            else:
-                # link is above root so we don't want to scan it's children
-                external_links.append(internal_link)
+        page = self.fetch_page(url_standardized)
+        links = self.page_links(url_standardized, page)
+        internal_links, external_links = self.group_links(links, url_standardized)
 
         # persist source links
-        standardized_links = internal_links + external_links
-        for link in standardized_links:
-            link_record = Link(url=link, source_url=url_standardized, job=self.job)
-            db.session.add(link_record)
-        db.session.commit()
+        self.persist_links(internal_links + external_links, url_standardized)
 
         # check links and return internal links for following
         self.check_links(internal_links)
-        self.check_links(external_links)
+        self.check_links(external_links, external=True)
+        if self.is_near_duplicate(url_standardized, page):
+            return []
         return internal_links
 
+    def queue_links(self, links, depth):
+        """Queue each link in array `links` found at `depth` for following,
+        unless already followed"""
+        for link in links:
+            link_standardized = standardize_url(link)
+            if link_standardized not in self.links_checked_and_followed:
+                self.frontier.push(link_standardized, depth)
+
     def check_all_links_and_follow(self, url=None):
-        """Recursively check all links in all sub-pages of `url`"""
+        """Check all links in all sub-pages of `url`, breadth first"""
         if url is None:
             url = self.url
-
-        # break if page limit exceeded
-        if len(self.links_checked_and_followed) > PAGE_LIMIT:
-            print('Page limit {:,} exceeded for {}'.format(PAGE_LIMIT, url))
-            return
-
-        url_standardized = standardize_url(url)
-        if url_standardized in self.links_checked_and_followed:
-            return
-        self.links_checked_and_followed.add(url_standardized)
-        internal_links = self.check_all_links(url)
-        for internal_link in internal_links:
-            self.check_all_links_and_follow(internal_link)
+        try:
+            if self.seeds_from_sitemaps():
+                self.seed_from_sitemaps()
+            # links in flight or deferred when the job was last checkpointed
+            for link, external in self.pending_checks:
+                self.check_link(link, external)
+            self.crawl(url)
+            self.check_deferred_links(wait=True)
+            self.job.checkpoint = None
+            self.frontier.close()
+        finally:
+            self.writes.flush()
+            with self.metrics.timer('commit'):
+                self.validators.flush()
+            print('Phases: {}'.format(self.metrics))
+            self.persist_scan_stats()
+            self.session.close()
+            print(self.writes.summary())
+            print('Pages unchanged since the last scan: {:,} skipped'.format(
+                self.validators.skipped))
+            print('Suppressed: {}, {:,} near-duplicate pages not expanded'.format(
+                self.traps, self.near_duplicates.duplicates if self.near_duplicates else 0))
+            print('Connections: {}'.format(self.session.stats))
+            print('Link check methods: {}'.format(self.prober))
+            print('Host timeouts: {}'.format(self.timeouts))
+            print('Politeness: {}'.format(self.scheduler))
+            if self.controller is not None:
+                print('Concurrency: {}'.format(self.controller))
+            print('Links to hosts down not requested: {:,}'.format(self.breaker.short_circuits))
+            print('Link cache: {:,} hits, {:,} misses'.format(
+                self.link_cache_hits, self.link_cache_misses))
+
+    def seeds_from_sitemaps(self):
+        """Return True if the scan starts by seeding its frontier from the
+        sitemaps of the site, which resumed scans did already"""
+        return self.use_sitemaps and self.job.checkpoint is None
+
+    def seed_from_sitemaps(self):
+        """Queue the pages under the root URL listed in the sitemaps of the
+        site, up to the page limit"""
+        urls = set()
+        for url in sitemap_urls(self.url, self.session):
+            url = standardize_url(url)
+            if url.startswith(self.url) and url not in self.links_checked_and_followed:
+                urls.add(url)
+                if len(urls) >= PAGE_LIMIT:
+                    break
+        print('Seeding {:,} pages listed in the sitemaps of {}'.format(len(urls), self.url))
+        self.queue_links(sorted(urls), 1)
+
+    def crawl(self, url):
+        """Check all links in pages popped off the frontier, starting at `url`"""
+        self.queue_links([url], 0)
+
+        while self.frontier:
+            self.checkpoint_if_due()
+
+            # break if page limit exceeded
+            if len(self.links_checked_and_followed) > PAGE_LIMIT:
+                print('Page limit {:,} exceeded for {}'.format(PAGE_LIMIT, self.url))
+                return
+
+            url, depth = self.frontier.pop()
+            if url in self.links_checked_and_followed:
+                continue
+            self.links_checked_and_followed.add(url)
+            internal_links = self.check_all_links(url)
+            self.queue_links(internal_links, depth + 1)
 
     def get_results(self, matcher):
         """Return a formatted JSON document describing any errors
@@ -0,0 +1,133 @@
+"""Streaming extraction of hrefs from HTML"""
+import re
+import codecs
+from lxml import etree
+from .globals import HTML_CONTENT_TYPES, CHARSET_SNIFF_BYTES
+
+
+meta_charset = re.compile(br'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+
+
+class LinkTarget(object):
+    """lxml parser target collecting the href of each anchor tag, so that no
+    document tree is built. If given, `fingerprint` is fed the hrefs and text
+    of the document"""
+    def __init__(self, fingerprint=None):
+        self.hrefs = []
+        self.fingerprint = fingerprint
+
+    def start(self, tag, attrib):
+        if tag == 'a':
+            href = attrib.get('href')
+            if href is not None:
+                self.hrefs.append(href)
+                if self.fingerprint is not None:
+                    self.fingerprint.add(href)
+
+    def end(self, tag):
+        pass
+
+    def data(self, data):
+        if self.fingerprint is not None:
+            self.fingerprint.add_text(data)
+
+    def close(self):
+        return self.hrefs
+
+
+def get_charset(content_type):
+    """Return the charset parameter of a Content-Type header, if any"""
+    for parameter in content_type.split(';')[1:]:
+        key, _, value = parameter.strip().partition('=')
+        if key.lower() == 'charset':
+            return value.strip('"\' ') or None
+    return None
+
+
+def codec_name(charset):
+    """Return the name of the codec of `charset`, or None if it is unknown"""
+    try:
+        return codecs.lookup(charset).name
+    except (LookupError, TypeError):
+        return None
+
+
+def detect_utf8(head):
+    """Return UTF-8 if the first bytes of a document `head` are valid UTF-8,
+    else Windows-1252"""
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(head)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp1252'
+
+
+def sniff_encoding(head):
+    """Return the encoding declared by the meta tags within the first bytes of
+    an HTML document `head` if known, else detected by `detect_utf8`"""
+    match = meta_charset.search(head)
+    if match is not None:
+        encoding = codec_name(match.group(1).decode('ascii'))
+        if encoding is not None:
+            return encoding
+    return detect_utf8(head)
+
+
+def is_html(content_type):
+    """Return True if a Content-Type header denotes an HTML or XHTML document.
+    Documents with no Content-Type are assumed to be HTML"""
+    media_type = content_type.split(';')[0].strip().lower()
+    return not media_type or media_type in HTML_CONTENT_TYPES
+
+
+def limit_chunks(chunks, max_bytes):
+    """Iterate over byte `chunks`, stopping after the first `max_bytes` bytes"""
+    n_bytes = 0
+    for chunk in chunks:
+        if n_bytes + len(chunk) > max_bytes:
+            yield chunk[:max_bytes - n_bytes]
+            print('Stopped reading after {:,} bytes'.format(max_bytes))
+            return
+        n_bytes += len(chunk)
+        yield chunk
+
+
+def unescape_href(href):
+    """Decode backslash escape sequences in `href`"""
+    if '\\' not in href:
+        return href
+    try:
+        return bytes(href, 'utf-8').decode('unicode_escape')
+    except UnicodeDecodeError:
+        return href
+
+
+def extract_links(chunks, encoding=None, fingerprint=None):
+    """Return the hrefs of all anchors in the HTML document whose bytes are
+    iterated over in `chunks`, parsing each chunk as it arrives. The document is
+    decoded with `encoding` if provided and known, else as declared in its meta
+    tags, else as UTF-8 if its first bytes are valid UTF-8.
+    If given, `fingerprint` is fed the hrefs and text of the document"""
+    chunks = iter(chunks)
+    head = b''
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= CHARSET_SNIFF_BYTES:
+            break
+    encoding = codec_name(encoding) or sniff_encoding(head)
+    target = LinkTarget(fingerprint)
+    try:
+        parser = etree.HTMLParser(target=target, encoding=encoding)
+    except LookupError:
+        # a codec unknown to libxml2
+        parser = etree.HTMLParser(target=target, encoding=detect_utf8(head))
+    if head:
+        parser.feed(head)
+    for chunk in chunks:
+        parser.feed(chunk)
+    try:
+        hrefs = parser.close()
+    except etree.XMLSyntaxError:
+        # empty document
+        return []
+    return [unescape_href(href) for href in hrefs]
@@ -0,0 +1,187 @@
+"""Timings and counters of the phases of scans, exported in the Prometheus text format"""
+import time
+import bisect
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from .globals import METRICS_BUCKETS
+
+
+class Histogram(object):
+    """Count and sum of durations in seconds, and count of durations up to
+    each upper bound of `buckets`"""
+    def __init__(self, buckets=METRICS_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last bucket is +Inf
+        self.count = 0
+        self.sum = 0.
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def merge(self, data):
+        """Add the durations of a histogram persisted by `to_json`"""
+        for i, count in enumerate(data.get('counts', [])):
+            self.counts[i] += count
+        self.count += data.get('count', 0)
+        self.sum += data.get('sum', 0.)
+
+    def cumulative_counts(self):
+        """Return (upper bound, count of durations up to it) pairs"""
+        bounds = ['{:g}'.format(bound) for bound in self.buckets] + ['+Inf']
+        total = 0
+        for bound, count in zip(bounds, self.counts):
+            total += count
+            yield bound, total
+
+    def to_json(self):
+        return dict(count=self.count, sum=round(self.sum, 6), counts=list(self.counts))
+
+
+class TimedChunks(object):
+    """Iterator over byte `chunks` adding up the seconds spent waiting for
+    each, and their bytes"""
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.seconds = 0.
+        self.bytes = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        t0 = time.time()
+        try:
+            chunk = next(self.chunks)
+        finally:
+            self.seconds += time.time() - t0
+        self.bytes += len(chunk)
+        return chunk
+
+
+class ScanMetrics(object):
+    """Thread-safe histograms of the time spent in each phase of a scan, and
+    counters of what was done.
+
+    Phases are 'fetch' and 'parse' for pages, 'group_links', 'check_network'
+    and 'check_persist' for links, and 'commit'. Persisting a link check may
+    trigger a commit, whose time is then counted in both phases."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = {}  # phase -> Histogram
+        self.counters = Counter()
+
+    def observe(self, phase, seconds):
+        with self.lock:
+            histogram = self.phases.get(phase)
+            if histogram is None:
+                histogram = self.phases[phase] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, phase):
+        """Time the block run within the context as `phase`"""
+        t0 = time.time()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.time() - t0)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def to_json(self):
+        with self.lock:
+            return dict(
+                phases={phase: histogram.to_json() for phase, histogram in self.phases.items()},
+                counters=dict(self.counters))
+
+    def drain(self):
+        """Return the metrics as by `to_json` and reset them"""
+        with self.lock:
+            phases, counters = self.phases, self.counters
+            self.phases = {}
+            self.counters = Counter()
+        return dict(
+            phases={phase: histogram.to_json() for phase, histogram in phases.items()},
+            counters=dict(counters))
+
+    def load(self, data):
+        """Add metrics persisted by `to_json`"""
+        with self.lock:
+            for phase, histogram in data.get('phases', {}).items():
+                self.phases.setdefault(phase, Histogram()).merge(histogram)
+            self.counters.update(data.get('counters', {}))
+
+    def __repr__(self):
+        with self.lock:
+            return '<{}>'.format(', '.join(
+                '{} {:.3f}s/{:,}'.format(phase, histogram.sum, histogram.count)
+                for phase, histogram in sorted(self.phases.items())))
+
+
+def prometheus_text(jobs, window_hours):
+    """Render the metrics of scan jobs `jobs`, (id, status, metrics) rows
+    whose metrics were persisted by `ScanMetrics.to_json`, in the Prometheus
+    text exposition format: the time spent in each phase and totals of each
+    counter over all jobs, and the time spent in each phase by each job in
+    progress.
+
+    `jobs` are the jobs started in the last `window_hours` hours, so totals
+    drop as jobs leave the window: they are exported as gauges, not as
+    histograms or counters, which Prometheus expects never to decrease."""
+    phases = {}
+    counters = Counter()
+    in_progress = []
+    for job_id, status, metrics in jobs:
+        for phase, histogram in metrics.get('phases', {}).items():
+            phases.setdefault(phase, Histogram()).merge(histogram)
+        counters.update(metrics.get('counters', {}))
+        if status == 'in progress':
+            in_progress.append((job_id, metrics))
+
+    lines = [
+        '# HELP linkcheck_window_phase_seconds Time spent in each phase of the scans '
+        'started in the last {} hours'.format(window_hours),
+        '# TYPE linkcheck_window_phase_seconds gauge',
+    ]
+    for phase, histogram in sorted(phases.items()):
+        lines.append('linkcheck_window_phase_seconds{{phase="{}"}} {}'.format(
+            phase, histogram.sum))
+    lines += [
+        '# HELP linkcheck_window_phase_runs Runs of each phase of the scans started '
+        'in the last {} hours'.format(window_hours),
+        '# TYPE linkcheck_window_phase_runs gauge',
+    ]
+    for phase, histogram in sorted(phases.items()):
+        lines.append('linkcheck_window_phase_runs{{phase="{}"}} {}'.format(
+            phase, histogram.count))
+    lines += [
+        '# HELP linkcheck_window_phase_runs_le Runs of each phase of the scans started '
+        'in the last {} hours lasting up to le seconds'.format(window_hours),
+        '# TYPE linkcheck_window_phase_runs_le gauge',
+    ]
+    for phase, histogram in sorted(phases.items()):
+        for bound, count in histogram.cumulative_counts():
+            lines.append('linkcheck_window_phase_runs_le{{phase="{}",le="{}"}} {}'.format(
+                phase, bound, count))
+    lines += [
+        '# HELP linkcheck_scan_events Events counted by the scans started in the '
+        'last {} hours'.format(window_hours),
+        '# TYPE linkcheck_scan_events gauge',
+    ]
+    for name, count in sorted(counters.items()):
+        lines.append('linkcheck_scan_events{{event="{}"}} {}'.format(name, count))
+    lines += [
+        '# HELP linkcheck_job_phase_seconds Time spent in each phase by each scan in '
+        'progress, as of its last checkpoint',
+        '# TYPE linkcheck_job_phase_seconds gauge',
+    ]
+    for job_id, metrics in in_progress:
+        for phase, histogram in sorted(metrics.get('phases', {}).items()):
+            lines.append('linkcheck_job_phase_seconds{{job_id="{}",phase="{}"}} {}'.format(
+                job_id, phase, histogram.get('sum', 0.)))
+    return '\n'.join(lines) + '\n'
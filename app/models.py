@@ -1,8 +1,7 @@
 """Data models for link check scans"""
 from . import db
 from passlib.apps import custom_app_context as pwd_context
-from sqlalchemy import UniqueConstraint, case, and_
-from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy import UniqueConstraint
 
 
 class Link(db.Model):
@@ -16,6 +15,34 @@ class Link(db.Model):
         return '<{} --> {}>'.format(self.source_url, self.url)
 
 
+def assess_severity(url, response, exception):
+    """Assess the severity of a link check on a 1-3 scale.
+    """
+    if response in (404, 400):
+        return 3
+    if exception == 'ConnectionError':
+        return 3
+    if response in (403,):
+        return 2
+    if exception == 'SSLError':
+        return 2
+    if response == 999 and 'linkedin.com' in (url or ''):
+        return 0
+    if exception == 'InvalidSchema':
+        return 0
+    if (url or '').startswith('javascript'):
+        return 0
+    if response != 200:
+        return 1
+    return 0
+
+
+def default_severity(context):
+    """Severity of a link check row inserted without one"""
+    row = context.get_current_parameters()
+    return assess_severity(row.get('url'), row.get('response'), row.get('exception'))
+
+
 class LinkCheck(db.Model):
     """Data model representing a request and response for single link"""
     id = db.Column(db.Integer, primary_key=True)
@@ -24,8 +51,22 @@ class LinkCheck(db.Model):
     response = db.Column(db.Integer, index=True)
     note = db.Column(db.Text)
     text = db.Column(db.Text)
-    exception = db.Column(db.String(20), index=True)
+    exception = db.Column(db.String(100), index=True)
+    cached = db.Column(db.Boolean, default=False)
     job_id = db.Column(db.Integer, db.ForeignKey('scan_job.id'), nullable=False)
+    method = db.Column(db.String(5))
+    connect_time = db.Column(db.Float)
+    ttfb = db.Column(db.Float)
+    elapsed = db.Column(db.Float)
+    bytes_read = db.Column(db.Integer)
+    redirects = db.Column(db.SmallInteger)
+    severity = db.Column(db.SmallInteger, default=default_severity)
+    __table_args__ = (
+        db.Index('ix_link_check_job_elapsed', 'job_id', 'elapsed'),
+        db.Index('ix_link_check_job_ttfb', 'job_id', 'ttfb'),
+        # historical results are filtered by severity, worst first, then by id
+        db.Index('ix_link_check_job_severity', 'job_id', db.text('severity DESC'), 'id'),
+    )
 
     def __repr__(self):
         return '<URL {}: {}>'.format(self.url, self.response)
@@ -36,49 +77,38 @@ class LinkCheck(db.Model):
             url=self.url_raw,
             response=self.response,
             note=self.note,
+            cached=self.cached,
             job_id=self.job_id,
+            method=self.method,
+            connect_time=self.connect_time,
+            ttfb=self.ttfb,
+            elapsed=self.elapsed,
+            bytes_read=self.bytes_read,
+            redirects=self.redirects,
         )
 
-    @hybrid_property
-    def severity(self):
-        """Assess the severity of a link check on a 1-3 scale.
-        """
-        if self.response in (404, 400):
-            return 3
-        if self.exception == 'ConnectionError':
-            return 3
-        if self.response in (403,):
-            return 2
-        if self.exception == 'SSLError':
-            return 2
-        if self.response == 999 and 'linkedin.com' in self.url:
-            return 0
-        if self.exception == 'InvalidSchema':
-            return 0
-        if self.url.startswith('javascript'):
-            return 0
-        if self.response != 200:
-            return 1
-        return 0
 
-    @severity.expression
-    def severity(cls):
-        """Assess the severity of a link check on a 1-3 scale.
-        """
-        return case(
-            [
-                (cls.response.in_(('404', '400')), 3),
-                (cls.exception == 'ConnectionError', 3),
-                (cls.response == '403', 2),
-                (cls.exception == 'SSLError', 2),
-                (and_(cls.response == '999', cls.url.contains('linkedin.com')), 0),
-                (cls.exception == 'InvalidSchema', 0),
-                (cls.url.like('javascript%'), 2),
-                (cls.exception != None, 1),
-                (cls.response != '200', 1),
-            ],
-            else_=0
-        )
+class FrontierURL(db.Model):
+    """Data model representing a URL of a scan job shared by distributed workers,
+    as a page to follow if it has a status, and as a link to check"""
+    __tablename__ = 'frontier_url'
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('scan_job.id'), nullable=False)
+    url = db.Column(db.Text, nullable=False)
+    depth = db.Column(db.Integer)
+    status = db.Column(db.String(10))
+    lease_owner = db.Column(db.String(64))
+    lease_expires = db.Column(db.DateTime)
+    checked = db.Column(db.Boolean, default=False, nullable=False)
+    checked_by = db.Column(db.String(64))
+    __table_args__ = (
+        UniqueConstraint('job_id', 'url', name='unique_frontier_urls_per_job'),
+        db.Index('ix_frontier_url_claim', 'job_id', 'status', 'depth', 'id'),
+    )
+
+    def __repr__(self):
+        return '<Frontier URL {} [{}]: {}>'.format(self.url, self.depth, self.status)
+
 
 class ScheduledJob(db.Model):
     """Data model representing a request and response for single link"""
@@ -113,6 +143,15 @@ class ScanJob(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     owner_id = db.Column(db.Integer, db.ForeignKey('owners.id'), nullable=False)
     status = db.Column(db.Text)
+    host_latency = db.Column(db.JSON)
+    concurrency_log = db.Column(db.JSON)
+    options = db.Column(db.JSON)
+    worker_id = db.Column(db.String(64))
+    checkpoint = db.Column(db.JSON)
+    heartbeat = db.Column(db.DateTime)
+    resumes = db.Column(db.Integer, default=0)
+    phase_metrics = db.Column(db.JSON)
+    pages_claimed = db.Column(db.Integer, default=0, server_default='0', nullable=False)
 
     def __repr__(self):
         return '<URL {} {}: {}>'.format(self.root_url, self.start_time, self.status)
@@ -128,6 +167,69 @@ class ScanJob(db.Model):
         )
 
 
+class PageValidator(db.Model):
+    """Data model representing the validators of a page as of the last scan of its site"""
+    __tablename__ = 'page_validator'
+    id = db.Column(db.Integer, primary_key=True)
+    root_url = db.Column(db.Text, nullable=False)
+    url = db.Column(db.Text, nullable=False)
+    etag = db.Column(db.Text)
+    last_modified = db.Column(db.Text)
+    content_hash = db.Column(db.String(40))
+    hrefs = db.Column(db.JSON)
+    job_id = db.Column(db.Integer, db.ForeignKey('scan_job.id'), nullable=False)
+    updated = db.Column(db.DateTime)
+    __table_args__ = (
+        UniqueConstraint('root_url', 'url', name='unique_page_validators_per_site'),
+    )
+
+    def __repr__(self):
+        return '<Validators of {}: {} {}>'.format(self.url, self.etag, self.content_hash)
+
+
+class PageTiming(db.Model):
+    """Data model representing the timing of the fetch of a page followed by a scan job"""
+    __tablename__ = 'page_timing'
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.Text, nullable=False)
+    job_id = db.Column(db.Integer, db.ForeignKey('scan_job.id'), nullable=False)
+    response = db.Column(db.Integer)
+    connect_time = db.Column(db.Float)
+    ttfb = db.Column(db.Float)
+    elapsed = db.Column(db.Float)
+    bytes_read = db.Column(db.Integer)
+    redirects = db.Column(db.SmallInteger)
+    __table_args__ = (
+        db.Index('ix_page_timing_job_elapsed', 'job_id', 'elapsed'),
+        db.Index('ix_page_timing_job_ttfb', 'job_id', 'ttfb'),
+    )
+
+    def __repr__(self):
+        return '<Page {}: {}s>'.format(self.url, self.elapsed)
+
+    def to_json(self):
+        return dict(
+            url=self.url,
+            response=self.response,
+            connect_time=self.connect_time,
+            ttfb=self.ttfb,
+            elapsed=self.elapsed,
+            bytes_read=self.bytes_read,
+            redirects=self.redirects,
+        )
+
+
+class LeaderLease(db.Model):
+    """Data model representing the lease of a role held by a single worker"""
+    __tablename__ = 'leader_lease'
+    name = db.Column(db.String(32), primary_key=True)
+    owner = db.Column(db.String(64))
+    expires = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return '<Lease {}: {} until {}>'.format(self.name, self.owner, self.expires)
+
+
 class PermissionedURL(db.Model):
     __tablename__ = 'permissioned_url'
     """Data model representing a request and response for single link"""
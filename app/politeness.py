@@ -0,0 +1,186 @@
+"""Host-aware scheduling of link checks honouring robots.txt Crawl-delay and Retry-After"""
+import time
+import heapq
+import datetime
+import threading
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from urllib.robotparser import RobotFileParser
+from requests.compat import urlparse
+from .globals import GET_TIMEOUT, HOST_CONCURRENCY, HOST_MAX_RATE, CRAWL_DELAY_MAX, \
+    RETRY_AFTER_MAX, RETRY_LIMIT, THROTTLE_STATUSES
+from .http_session import headers
+
+
+def parse_retry_after(value):
+    """Return the seconds to wait given by a Retry-After header `value`, either
+    delay seconds or an HTTP date, or None if missing or invalid"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = datetime.datetime.now(retry_at.tzinfo)
+    return max(0, (retry_at - now).total_seconds())
+
+
+class RobotsCache(object):
+    """Thread-safe cache of the Crawl-delay of each host, read from its robots.txt"""
+    def __init__(self, max_delay=CRAWL_DELAY_MAX):
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.delays = {}  # host -> Crawl-delay in seconds or None
+
+    def claim(self, host):
+        """Return True if the robots.txt of `host` is yet to be loaded, and mark
+        it as loading"""
+        with self.lock:
+            if host in self.delays:
+                return False
+            self.delays[host] = None
+            return True
+
+    def load(self, host, url, session):
+        """Read the Crawl-delay of `host` from the robots.txt of the site of `url`"""
+        u = urlparse(url)
+        delay = None
+        try:
+            response = session.get(
+                '{}://{}/robots.txt'.format(u.scheme, u.netloc),
+                timeout=GET_TIMEOUT, headers=headers)
+            if response.status_code == 200:
+                parser = RobotFileParser()
+                parser.parse(response.text.splitlines())
+                delay = parser.crawl_delay(headers['User-Agent'])
+        except Exception as e:
+            print('Error while getting robots.txt of {}'.format(host))
+            print(e)
+        if delay is not None:
+            delay = min(float(delay), self.max_delay)
+        with self.lock:
+            self.delays[host] = delay
+
+    def crawl_delay(self, host):
+        with self.lock:
+            return self.delays.get(host)
+
+
+class HostState(object):
+    """Requests in flight to a single host and when the next one may be sent"""
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = 0
+        self.next_at = 0
+
+
+class DeferredLinks(object):
+    """Links parked until the time their host may be requested again"""
+    def __init__(self):
+        self.heap = []  # [ready time, sequence number, link, external]
+        self.seq = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, link, external, delay):
+        heapq.heappush(self.heap, [time.time() + delay, self.seq, link, external])
+        self.seq += 1
+
+    def pop(self, wait=False):
+        """Pop the (link, external) pair parked the longest among those ready,
+        waiting for the first to be ready if `wait`; return None if none is"""
+        if not self.heap:
+            return None
+        ready_at = self.heap[0][0]
+        now = time.time()
+        if ready_at > now:
+            if not wait:
+                return None
+            time.sleep(ready_at - now)
+        _, _, link, external = heapq.heappop(self.heap)
+        return link, external
+
+
+class HostScheduler(object):
+    """Politeness scheduler allowing at most `max_in_flight` requests in flight
+    and `max_rate` requests per second to each host, spacing requests to hosts
+    by the Crawl-delay of their robots.txt, and backing off from hosts asking
+    to retry later with a 429 or 503 response and a Retry-After header.
+
+    Robots.txt is only read for hosts with more than one link to check.
+    Links to hosts that may not be requested yet are parked in `deferred`.
+    If `controller` is set, it adapts the in-flight limit of each host.
+    """
+    def __init__(self, max_in_flight=HOST_CONCURRENCY, max_rate=HOST_MAX_RATE,
+                 robots=None, controller=None):
+        self.max_in_flight = max_in_flight
+        self.controller = controller
+        self.min_interval = 1 / max_rate if max_rate else 0
+        self.robots = robots if robots is not None else RobotsCache()
+        self.lock = threading.Lock()
+        self.hosts = {}  # host -> HostState
+        self.retries = Counter()  # link -> retries after throttling
+        self.deferred = DeferredLinks()
+        self.deferrals = 0
+        self.throttled = 0
+
+    def needs_robots(self, host):
+        """Return True if the robots.txt of `host` should be loaded before its
+        next request, which is the case once it was requested before"""
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None or state.requests == 0:
+                return False
+        return self.robots.claim(host)
+
+    def delay(self, host):
+        """Return the seconds until a request to `host` may be sent, 0 if it
+        may be sent now, or None if it has too many requests in flight"""
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None:
+                return 0
+            max_in_flight = self.max_in_flight
+            if self.controller is not None:
+                max_in_flight = self.controller.host_limit(host)
+            if max_in_flight and state.in_flight >= max_in_flight:
+                return None
+            return max(0, state.next_at - time.time())
+
+    def start(self, host):
+        """Record a request to `host` being sent"""
+        interval = max(self.min_interval, self.robots.crawl_delay(host) or 0)
+        with self.lock:
+            state = self.hosts.setdefault(host, HostState())
+            state.in_flight += 1
+            state.requests += 1
+            state.next_at = max(state.next_at, time.time() + interval)
+
+    def finish(self, host, link, outcome):
+        """Record the `outcome` of a request to `host` for `link` and return the
+        seconds to wait before retrying if `host` asked to, else None"""
+        retry_after = outcome.pop('retry_after', None)
+        with self.lock:
+            state = self.hosts[host]
+            state.in_flight -= 1
+            if outcome.get('response') not in THROTTLE_STATUSES or retry_after is None:
+                return None
+            if retry_after > RETRY_AFTER_MAX or self.retries[link] >= RETRY_LIMIT:
+                return None
+            self.retries[link] += 1
+            self.throttled += 1
+            state.next_at = max(state.next_at, time.time() + retry_after)
+            return retry_after
+
+    def defer(self, link, external, delay):
+        """Park `link` for `delay` seconds"""
+        self.deferrals += 1
+        self.deferred.push(link, external, delay or 0)
+
+    def __repr__(self):
+        return '<{:,} hosts: {:,} deferrals, {:,} throttled responses>'.format(
+            len(self.hosts), self.deferrals, self.throttled)
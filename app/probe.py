@@ -0,0 +1,111 @@
+"""HEAD-first link probing, falling back to GET for hosts mishandling HEAD"""
+import time
+from collections import Counter
+import requests
+from requests.compat import urlparse
+from .globals import GET_TIMEOUT, HEAD_FALLBACK_STATUSES, THROTTLE_STATUSES
+from .http_session import headers, response_timing
+from .politeness import parse_retry_after
+
+
+# probing methods, from cheapest to most expensive
+methods = ('HEAD', 'RANGE', 'GET')
+
+# outcome fields describing the requests made rather than the link
+timing_fields = ('method', 'connect_time', 'ttfb', 'elapsed', 'bytes_read', 'redirects')
+
+
+def request_link(url, session=None, method='GET'):
+    """Request the resource at `url` with `method`, through `session` if
+    provided, and return the fields describing the outcome.
+    Method 'RANGE' is a GET of the first byte only. Outcomes of throttled
+    requests include the seconds to wait before retrying as `retry_after`.
+    Outcomes include the `timing_fields` of the request: the seconds spent
+    connecting, until the first byte and in total, the body bytes read, none
+    as bodies are not downloaded, and the number of redirects"""
+    http = session if session is not None else requests
+    timing = dict(method=method)
+    request_headers = headers
+    if method == 'RANGE':
+        method = 'GET'
+        request_headers = dict(headers, Range='bytes=0-0')
+    start = time.perf_counter()
+    try:
+        response = http.request(
+            method, url, timeout=GET_TIMEOUT, stream=True, allow_redirects=True,
+            headers=request_headers)
+        timing.update(response_timing(response), bytes_read=response.raw.tell())
+        response.close()
+        timing['elapsed'] = time.perf_counter() - start
+        status_code = response.status_code
+        if status_code == 206:
+            # partial content of a ranged GET
+            status_code = 200
+        if status_code in THROTTLE_STATUSES:
+            return dict(
+                response=status_code,
+                retry_after=parse_retry_after(response.headers.get('Retry-After')),
+                **timing)
+        return dict(response=status_code, **timing)
+    except Exception as exception:
+        return dict(
+            note=str(exception),
+            exception=type(exception).__name__,
+            elapsed=time.perf_counter() - start,
+            **timing)
+
+
+class LinkProber(object):
+    """Check links with a HEAD request first, falling back to a ranged GET and
+    then a plain GET when the response status is one that servers mishandling
+    HEAD return (`fallback_statuses`). Hosts found to mishandle a method are
+    probed with the method that worked for the rest of the scan.
+    Links to hosts whose circuit is open in `breaker` are not requested."""
+    def __init__(self, session=None, fallback_statuses=HEAD_FALLBACK_STATUSES, breaker=None):
+        self.session = session
+        self.fallback_statuses = fallback_statuses
+        self.breaker = breaker
+        self.host_methods = {}  # hostname -> index of the first method to try
+        self.method_counts = Counter()
+
+    def needs_fallback(self, method, outcome):
+        status_code = outcome.get('response')
+        if method == 'RANGE' and status_code == 416:
+            # range not satisfiable, e.g. an empty resource
+            return True
+        return status_code in self.fallback_statuses
+
+    def request(self, url):
+        """Request `url` and return the fields describing the outcome"""
+        host = urlparse(url).hostname
+        if self.breaker is None:
+            return self.probe(url, host)
+        if not self.breaker.allow(host):
+            return self.breaker.short_circuit_outcome(host)
+        outcome = self.probe(url, host)
+        self.breaker.record(host, outcome)
+        return outcome
+
+    def probe(self, url, host):
+        """Request `url` with the cheapest method `host` handles; the outcome
+        elapsed time includes the requests with methods it mishandled"""
+        first = self.host_methods.get(host, 0)
+        elapsed = 0
+        for i in range(first, len(methods)):
+            method = methods[i]
+            self.method_counts[method] += 1
+            outcome = request_link(url, self.session, method)
+            elapsed = outcome['elapsed'] = elapsed + outcome['elapsed']
+            if not self.needs_fallback(method, outcome):
+                if i > first:
+                    # earlier methods are mishandled by this host
+                    self.host_methods[host] = i
+                return outcome
+        # the host answered every method with a fallback status: the cheaper
+        # methods tell nothing more, so probe its next links with the last one
+        self.host_methods[host] = len(methods) - 1
+        return outcome
+
+    def __repr__(self):
+        return '<{}>'.format(', '.join(
+            '{:,} {}'.format(self.method_counts[method], method) for method in methods))
@@ -0,0 +1,105 @@
+"""Discovery of the pages of a site from its sitemaps, to seed the crawl frontier"""
+import zlib
+from collections import deque
+import requests
+from lxml import etree
+from requests.compat import urljoin, urlparse
+from .globals import GET_TIMEOUT, CHUNK_SIZE, SITEMAP_MAX_FILES, SITEMAP_MAX_BYTES
+from .http_session import headers
+from .link_extract import limit_chunks
+
+
+def robots_sitemaps(root_url, session):
+    """Return the URLs of the `Sitemap:` entries of the robots.txt of the site of `root_url`"""
+    u = urlparse(root_url)
+    try:
+        response = session.get(
+            '{}://{}/robots.txt'.format(u.scheme, u.netloc), timeout=GET_TIMEOUT, headers=headers)
+    except requests.exceptions.RequestException as e:
+        print('Error while getting robots.txt of {}'.format(root_url))
+        print(e)
+        return []
+    if response.status_code != 200:
+        return []
+    sitemaps = []
+    for line in response.text.splitlines():
+        key, _, value = line.partition(':')
+        if key.strip().lower() == 'sitemap' and value.strip():
+            sitemaps.append(value.strip())
+    return sitemaps
+
+
+def gunzip_chunks(chunks):
+    """Iterate over byte `chunks`, decompressing them if they are gzipped"""
+    decompressor = None
+    for chunk in chunks:
+        if decompressor is None:
+            if not chunk.startswith(b'\x1f\x8b'):
+                yield chunk
+                yield from chunks
+                return
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        yield decompressor.decompress(chunk)
+    if decompressor is not None:
+        yield decompressor.flush()
+
+
+def local_name(tag):
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+
+def parse_sitemap(chunks):
+    """Iterate over the ('url' or 'sitemap', location) entries of the urlset
+    or sitemap index whose bytes are iterated over in `chunks`, parsing each
+    chunk as it arrives and discarding the entries parsed. Sitemaps come from
+    untrusted sites: entities are not expanded, nor external resources loaded"""
+    parser = etree.XMLPullParser(
+        events=('end',), recover=True, resolve_entities=False, no_network=True,
+        huge_tree=False)
+    for chunk in chunks:
+        parser.feed(chunk)
+        for _, element in parser.read_events():
+            kind = local_name(element.tag)
+            if kind not in ('url', 'sitemap'):
+                continue
+            for child in element:
+                if local_name(child.tag) == 'loc' and child.text and child.text.strip():
+                    yield kind, child.text.strip()
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+
+def read_sitemap(url, session, max_bytes=SITEMAP_MAX_BYTES):
+    """Iterate over the entries of sitemap `url`, which may be gzipped"""
+    try:
+        response = session.get(url, timeout=GET_TIMEOUT, stream=True, headers=headers)
+        try:
+            if response.status_code != 200:
+                return
+            chunks = gunzip_chunks(response.iter_content(CHUNK_SIZE))
+            yield from parse_sitemap(limit_chunks(chunks, max_bytes))
+        finally:
+            response.close()
+    except (requests.exceptions.RequestException, zlib.error) as e:
+        print('Error while reading sitemap {}'.format(url))
+        print(e)
+
+
+def sitemap_urls(root_url, session, max_files=SITEMAP_MAX_FILES):
+    """Iterate over the page URLs listed in the sitemaps of the site of
+    `root_url`: those of its robots.txt and /sitemap.xml, following sitemap
+    indexes, reading at most `max_files` sitemaps"""
+    queue = deque(robots_sitemaps(root_url, session))
+    queue.append(urljoin(root_url, '/sitemap.xml'))
+    seen = set()
+    while queue and len(seen) < max_files:
+        sitemap = queue.popleft()
+        if sitemap in seen:
+            continue
+        seen.add(sitemap)
+        for kind, location in read_sitemap(sitemap, session):
+            if kind == 'sitemap':
+                queue.append(location)
+                continue
+            yield location
@@ -0,0 +1,165 @@
+"""Detection of crawler traps and near-duplicate pages, which would otherwise
+use up the page limit of a scan"""
+import re
+import math
+import hashlib
+from array import array
+from collections import Counter
+from requests.compat import urlparse
+from .globals import TRAP_MAX_PATH_DEPTH, TRAP_MAX_SEGMENT_REPEATS, TRAP_TEMPLATE_CAP, \
+    SIMHASH_MAX_DISTANCE, SIMHASH_MIN_FEATURES, SIMHASH_MIN_PAGES, SIMHASH_DF_BUCKETS
+
+digits_pattern = re.compile(r'\d+')
+token_pattern = re.compile(r'^[0-9a-zA-Z_-]{16,}$')
+word_pattern = re.compile(r'\w+')
+
+
+def path_template(url):
+    """Return the template of the path of `url`: with path parameters such as
+    session IDs dropped, long tokens replaced with {id} and numbers with {n}"""
+    u = urlparse(url)
+    segments = []
+    for segment in u.path.split('/'):
+        segment = segment.split(';')[0]
+        if token_pattern.match(segment) and any(c.isdigit() for c in segment):
+            segments.append('{id}')
+        else:
+            segments.append(digits_pattern.sub('{n}', segment))
+    return u.netloc + '/'.join(segments)
+
+
+class TrapDetector(object):
+    """Filter of the pages queued for following, suppressing those whose path
+    is deeper than `max_depth` segments, repeats a segment more than
+    `max_repeats` times, such as /a/b/a/b/a/b, or, if `template_cap` is set,
+    whose path template already has that many pages, such as a calendar's days.
+    Suppressed pages are counted by reason. Pages admitted are remembered in
+    `admitted`, a set of URLs."""
+    def __init__(self, max_depth=TRAP_MAX_PATH_DEPTH, max_repeats=TRAP_MAX_SEGMENT_REPEATS,
+                 template_cap=TRAP_TEMPLATE_CAP, admitted=None):
+        self.max_depth = max_depth
+        self.max_repeats = max_repeats
+        self.template_cap = template_cap
+        self.admitted = admitted if admitted is not None else set()
+        self.templates = Counter()
+        self.suppressed = Counter()  # reason -> pages suppressed
+
+    def trap(self, url):
+        """Return why `url` looks like a crawler trap, or None"""
+        segments = [segment for segment in urlparse(url).path.split('/') if segment]
+        if len(segments) > self.max_depth:
+            return 'path depth'
+        if segments and Counter(segments).most_common(1)[0][1] > self.max_repeats:
+            return 'repeated segments'
+        if self.template_cap and self.templates[path_template(url)] >= self.template_cap:
+            return 'path template cap'
+        return None
+
+    def admit(self, url):
+        """Return True if `url` may be queued for following"""
+        if url in self.admitted:
+            return True
+        reason = self.trap(url)
+        if reason is not None:
+            self.suppressed[reason] += 1
+            return False
+        self.admitted.add(url)
+        self.templates[path_template(url)] += 1
+        return True
+
+    def __len__(self):
+        return sum(self.suppressed.values())
+
+    def __repr__(self):
+        return '<{:,} trap pages suppressed: {}>'.format(
+            len(self), ', '.join('{:,} {}'.format(n, reason)
+                                 for reason, n in self.suppressed.most_common()) or 'none')
+
+
+def feature_hash(feature):
+    return int.from_bytes(
+        hashlib.blake2b(feature.encode('utf-8', 'replace'), digest_size=8).digest(), 'big')
+
+
+class Simhash(object):
+    """Features of a page, the hashes of its distinct hrefs and words,
+    accumulated as the page is parsed, from which its 64-bit simhash is
+    computed"""
+    def __init__(self):
+        self.features = set()
+
+    def __len__(self):
+        return len(self.features)
+
+    def add(self, feature):
+        self.features.add(feature_hash(feature))
+
+    def add_text(self, text):
+        self.features.update(map(feature_hash, word_pattern.findall(text.lower())))
+
+    def digest(self, weight=None):
+        """Return the simhash, with features weighted by function `weight` if
+        given, or None if there are too few features to tell near-duplicates apart"""
+        if len(self.features) < SIMHASH_MIN_FEATURES:
+            return None
+        weights = [0] * 64
+        for h in self.features:
+            w = weight(h) if weight is not None else 1
+            for bit in range(64):
+                weights[bit] += w if h >> bit & 1 else -w
+        return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+class NearDuplicates(object):
+    """Index of the simhashes of the pages followed, finding pages within
+    `max_distance` differing bits of a page seen before. Simhashes are split
+    into `max_distance + 1` bands, one of which must be equal for simhashes
+    that close.
+
+    Features are weighted by their inverse document frequency among the pages
+    seen, so that the navigation and footer shared by the pages of a site do
+    not make them all look alike. Document frequencies are counted in
+    `df_buckets` hashed buckets, to bound memory. Pages are only compared once
+    `min_pages` pages were seen, as boilerplate cannot be told apart before."""
+    def __init__(self, max_distance=SIMHASH_MAX_DISTANCE, min_pages=SIMHASH_MIN_PAGES,
+                 df_buckets=SIMHASH_DF_BUCKETS):
+        self.max_distance = max_distance
+        self.min_pages = min_pages
+        self.n_bands = max_distance + 1
+        self.band_bits = 64 // self.n_bands
+        self.bands = [{} for _ in range(self.n_bands)]  # band value -> simhashes
+        self.document_frequency = array('I', bytes(4 * df_buckets))
+        self.pages = 0
+        self.duplicates = 0
+
+    def band_values(self, simhash):
+        mask = (1 << self.band_bits) - 1
+        return [simhash >> (i * self.band_bits) & mask for i in range(self.n_bands)]
+
+    def weight(self, feature):
+        """Inverse document frequency of `feature` among the pages seen. Features
+        sharing a bucket add up their frequencies, which may exceed the number
+        of pages seen"""
+        df = min(self.document_frequency[feature % len(self.document_frequency)], self.pages)
+        return math.log((self.pages + 1) / df)
+
+    def seen(self, fingerprint):
+        """Return True if a page near the page of Simhash `fingerprint` was
+        seen before, else index it"""
+        self.pages += 1
+        for feature in fingerprint.features:
+            self.document_frequency[feature % len(self.document_frequency)] += 1
+        if self.pages <= self.min_pages:
+            return False
+        simhash = fingerprint.digest(self.weight)
+        if simhash is None:
+            return False
+        values = self.band_values(simhash)
+        for band, value in zip(self.bands, values):
+            for other in band.get(value, ()):
+                if bin(simhash ^ other).count('1') <= self.max_distance:
+                    self.duplicates += 1
+                    return True
+        for band, value in zip(self.bands, values):
+            band.setdefault(value, []).append(simhash)
+        return False
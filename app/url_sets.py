@@ -0,0 +1,169 @@
+"""Compact sets of URLs for scans of very large sites"""
+import math
+import heapq
+import base64
+import hashlib
+from array import array
+from bisect import bisect_left
+
+
+def url_hash(url):
+    """Return a 64-bit hash of `url`"""
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashedUrlSet(object):
+    """Set of URLs stored as 64-bit hashes, 8 bytes per URL: recently added
+    hashes are kept in a set, which is merged into a sorted array once it
+    holds `merge_size` hashes. Two URLs collide with a negligible probability"""
+    def __init__(self, merge_size=4096):
+        self.merge_size = merge_size
+        self.hashes = array('Q')
+        self.recent = set()
+
+    def __len__(self):
+        return len(self.hashes) + len(self.recent)
+
+    def __contains__(self, url):
+        return self.contains_hash(url_hash(url))
+
+    def contains_hash(self, h):
+        if h in self.recent:
+            return True
+        i = bisect_left(self.hashes, h)
+        return i < len(self.hashes) and self.hashes[i] == h
+
+    def add(self, url):
+        self.add_hash(url_hash(url))
+
+    def add_hash(self, h):
+        if self.contains_hash(h):
+            return
+        self.recent.add(h)
+        if len(self.recent) >= self.merge_size:
+            self.merge()
+
+    def update(self, urls):
+        for url in urls:
+            self.add(url)
+
+    def merge(self):
+        self.hashes = array('Q', heapq.merge(self.hashes, sorted(self.recent)))
+        self.recent = set()
+
+    def to_json(self):
+        self.merge()
+        return dict(hashes=base64.b64encode(self.hashes.tobytes()).decode('ascii'))
+
+    def load(self, data):
+        hashes = array('Q')
+        hashes.frombytes(base64.b64decode(data['hashes']))
+        for h in hashes:
+            self.add_hash(h)
+
+    def __repr__(self):
+        return '<{:,} URL hashes>'.format(len(self))
+
+
+class BloomFilter(object):
+    """Bloom filter of URLs sized for `capacity` URLs at a false positive rate
+    of `error_rate`"""
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.n_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.n_hashes = max(1, round(self.n_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.n_bits + 7) // 8)
+        self.count = 0
+
+    def positions(self, url):
+        # enhanced double hashing of a 128-bit digest
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big')
+        return [(h1 + i * h2 + (i ** 3 - i) // 6) % self.n_bits for i in range(self.n_hashes)]
+
+    def __contains__(self, url):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self.positions(url))
+
+    def add(self, url):
+        """Add `url`; return True if it was not in the filter"""
+        added = False
+        for p in self.positions(url):
+            if not self.bits[p >> 3] & (1 << (p & 7)):
+                self.bits[p >> 3] |= 1 << (p & 7)
+                added = True
+        self.count += added
+        return added
+
+
+class ScalableBloomFilter(object):
+    """Set of URLs in a series of Bloom filters, each twice as large as the
+    last and with half its false positive rate, added as the last fills up, so
+    that the overall false positive rate stays under `error_rate` however many
+    URLs are added. URLs falsely found are never checked or followed."""
+    def __init__(self, error_rate, initial_capacity=100000):
+        self.error_rate = error_rate
+        self.initial_capacity = initial_capacity
+        self.filters = []
+
+    def __len__(self):
+        return sum(f.count for f in self.filters)
+
+    def __contains__(self, url):
+        return any(url in f for f in self.filters)
+
+    def add(self, url):
+        if url in self:
+            return
+        if not self.filters or self.filters[-1].count >= self.filters[-1].capacity:
+            n = len(self.filters)
+            self.filters.append(BloomFilter(
+                self.initial_capacity * 2 ** n, self.error_rate / 2 ** (n + 1)))
+        self.filters[-1].add(url)
+
+    def update(self, urls):
+        for url in urls:
+            self.add(url)
+
+    def to_json(self):
+        return dict(filters=[
+            dict(capacity=f.capacity, count=f.count,
+                 bits=base64.b64encode(bytes(f.bits)).decode('ascii'))
+            for f in self.filters])
+
+    def load(self, data):
+        self.filters = []
+        for n, state in enumerate(data['filters']):
+            f = BloomFilter(state['capacity'], self.error_rate / 2 ** (n + 1))
+            f.bits = bytearray(base64.b64decode(state['bits']))
+            f.count = state['count']
+            self.filters.append(f)
+
+    def __repr__(self):
+        return '<~{:,} URLs in {:,} Bloom filters of {:,} bytes>'.format(
+            len(self), len(self.filters), sum(len(f.bits) for f in self.filters))
+
+
+def make_url_set(bounded_memory=False, error_rate=None):
+    """Return an empty set of URLs: a plain set, or in bounded memory mode a
+    set of URL hashes, or a Bloom filter if a false positive `error_rate` is given"""
+    if not bounded_memory:
+        return set()
+    if error_rate:
+        return ScalableBloomFilter(error_rate)
+    return HashedUrlSet()
+
+
+def dump_url_set(urls):
+    """Return set of URLs `urls` as JSON, for `load_url_set`"""
+    if isinstance(urls, set):
+        return sorted(urls)
+    return urls.to_json()
+
+
+def load_url_set(urls, data):
+    """Add the URLs dumped in `data` by `dump_url_set` to `urls`"""
+    if isinstance(urls, set):
+        urls.update(data)
+    else:
+        urls.load(data)
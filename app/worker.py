@@ -0,0 +1,222 @@
+"""Scan worker process: runs the scan jobs queued by the web processes.
+
+Any number of workers may run side by side. Each claims queued scan jobs and
+runs them, and joins distributed scan jobs in progress when idle. A single
+worker at a time is elected leader and runs the APScheduler jobs, which queue
+scan jobs when due, and reaps the jobs of workers that stopped: those are
+queued again to resume from their last checkpoint.
+
+Run with `python -m app.worker`.
+"""
+import time
+import datetime
+import threading
+from contextlib import contextmanager
+from sqlalchemy import or_, case, func
+from . import app, db, scheduler
+from .models import ScanJob, LeaderLease
+from .api import run_scan
+from .distributed_frontier import default_worker_id, insert_ignore
+from .globals import LEADER_LEASE_SECONDS, LEADER_RENEW_SECONDS, WORKER_POLL_SECONDS, \
+    STALE_JOB_SECONDS, MAX_RESUMES, HEARTBEAT_SECONDS
+
+
+class LeaderElection(object):
+    """Election of a single leader among workers, through a lease in the
+    leader_lease table that the leader renews before it expires"""
+    table = LeaderLease.__table__
+
+    def __init__(self, worker_id, name='scheduler', lease_seconds=LEADER_LEASE_SECONDS):
+        self.worker_id = worker_id
+        self.name = name
+        self.lease = datetime.timedelta(seconds=lease_seconds)
+        self.leading = False
+
+    def campaign(self):
+        """Acquire or renew the lease if free, expired or already held;
+        return True if leading"""
+        now = datetime.datetime.utcnow()
+        try:
+            insert_ignore(self.table, [dict(name=self.name, owner=None, expires=now)])
+            result = db.session.execute(
+                self.table.update().
+                where(self.table.c.name == self.name).
+                where(or_(
+                    self.table.c.owner == self.worker_id,
+                    self.table.c.owner == None,
+                    self.table.c.expires < now)).
+                values(owner=self.worker_id, expires=now + self.lease))
+            db.session.commit()
+            leading = result.rowcount == 1
+        except Exception as e:
+            db.session.rollback()
+            print('Error while campaigning for {} leader'.format(self.name))
+            print(e)
+            leading = False
+        if leading != self.leading:
+            print('Worker {} {} {} leader'.format(
+                self.worker_id, 'is now' if leading else 'is no longer', self.name))
+        self.leading = leading
+        return leading
+
+    def resign(self):
+        db.session.execute(
+            self.table.update().
+            where(self.table.c.name == self.name).
+            where(self.table.c.owner == self.worker_id).
+            values(owner=None))
+        db.session.commit()
+        self.leading = False
+
+
+def lead_scheduler(election, stop, renew_seconds=LEADER_RENEW_SECONDS):
+    """Run the APScheduler jobs while `election` is won, until `stop` is set"""
+    with app.app_context():
+        while not stop.is_set():
+            if election.campaign():
+                scheduler.scheduler.resume()
+                reap_stale_jobs()
+            else:
+                scheduler.scheduler.pause()
+            stop.wait(renew_seconds)
+        scheduler.scheduler.pause()
+        election.resign()
+
+
+def reap_stale_jobs(stale_seconds=STALE_JOB_SECONDS, max_resumes=MAX_RESUMES):
+    """Queue the jobs in progress without a checkpoint for `stale_seconds` again,
+    to be resumed, or fail them once resumed `max_resumes` times"""
+    table = ScanJob.__table__
+    stale_before = datetime.datetime.utcnow() - datetime.timedelta(seconds=stale_seconds)
+    stale = func.coalesce(table.c.heartbeat, table.c.start_time) < stale_before
+    jobs = ScanJob.query.\
+        filter(ScanJob.status == 'in progress').\
+        filter(stale).\
+        with_entities(ScanJob.id, ScanJob.options, ScanJob.resumes).\
+        all()
+    for job_id, options, resumes in jobs:
+        resumes = resumes or 0
+        if options is not None and resumes < max_resumes:
+            values = dict(status='queued', worker_id=None, resumes=resumes + 1)
+        else:
+            values = dict(status='failed')
+        result = db.session.execute(
+            table.update().
+            where(table.c.id == job_id).
+            where(table.c.status == 'in progress').
+            where(stale).
+            values(**values))
+        if result.rowcount == 1:
+            print('Stale scan job {} {}'.format(
+                job_id, 'queued to resume' if values['status'] == 'queued' else 'failed'))
+    db.session.commit()
+
+
+def beat(job_id, stop, interval):
+    """Refresh the heartbeat of scan job `job_id` in progress every `interval`
+    seconds until `stop` is set, through a connection of its own"""
+    table = ScanJob.__table__
+    while not stop.wait(interval):
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(
+                    table.update().
+                    where(table.c.id == job_id).
+                    where(table.c.status == 'in progress').
+                    values(heartbeat=datetime.datetime.utcnow()))
+        except Exception as e:
+            print('Error while refreshing the heartbeat of scan job {}'.format(job_id))
+            print(e)
+
+
+@contextmanager
+def heartbeat(job_id, interval=HEARTBEAT_SECONDS):
+    """Refresh the heartbeat of scan job `job_id` from a thread while the
+    context runs, so that a job busy checking the links of a slow page is not
+    reaped while its worker is alive"""
+    stop = threading.Event()
+    threading.Thread(target=beat, args=(job_id, stop, interval), daemon=True).start()
+    try:
+        yield
+    finally:
+        # not joined: a refresh may wait on a row lock held by the caller
+        stop.set()
+
+
+def claim_scan_job(worker_id):
+    """Claim the oldest queued scan job; return it, or None if none is queued"""
+    candidates = ScanJob.query.\
+        filter(ScanJob.status == 'queued').\
+        order_by(ScanJob.id).\
+        with_entities(ScanJob.id).\
+        limit(10).\
+        with_for_update(skip_locked=True).\
+        all()
+    for job_id, in candidates:
+        table = ScanJob.__table__
+        now = datetime.datetime.utcnow()
+        result = db.session.execute(
+            table.update().
+            where(table.c.id == job_id).
+            where(table.c.status == 'queued').
+            values(status='in progress', worker_id=worker_id, heartbeat=now,
+                   # resumed jobs keep their original start time
+                   start_time=case([(table.c.resumes > 0, table.c.start_time)], else_=now)))
+        if result.rowcount == 1:
+            db.session.commit()
+            return ScanJob.query.get(job_id)
+    db.session.commit()
+    return None
+
+
+def find_distributed_job(joined):
+    """Return a distributed scan job in progress not in `joined`, or None"""
+    jobs = ScanJob.query.\
+        filter(ScanJob.status == 'in progress').\
+        filter(ScanJob.options != None).\
+        order_by(ScanJob.id).\
+        all()
+    db.session.commit()
+    for job in jobs:
+        if job.id not in joined and job.options.get('engine') == 'distributed':
+            return job
+    return None
+
+
+def work(worker_id, stop, poll_seconds=WORKER_POLL_SECONDS):
+    """Run queued scan jobs, or join distributed ones, until `stop` is set"""
+    joined = set()
+    with app.app_context():
+        while not stop.is_set():
+            job = claim_scan_job(worker_id) or find_distributed_job(joined)
+            if job is None:
+                stop.wait(poll_seconds)
+                continue
+            joined.add(job.id)
+            try:
+                with heartbeat(job.id):
+                    run_scan(job, worker_id)
+            except Exception as e:
+                db.session.rollback()
+                print('Error while running scan job {}'.format(job.id))
+                print(e)
+
+
+def main():
+    worker_id = default_worker_id()
+    print('Scan worker {} started'.format(worker_id))
+    stop = threading.Event()
+    leader = threading.Thread(
+        target=lead_scheduler, args=(LeaderElection(worker_id), stop), daemon=True)
+    leader.start()
+    try:
+        work(worker_id, stop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        leader.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Write-behind buffer persisting scan results in bulk"""
+import time
+from sqlalchemy.exc import DataError, IntegrityError
+from . import db
+from .globals import WRITE_BATCH_SIZE, WRITE_BATCH_SECONDS
+from .models import Link, LinkCheck, PageTiming
+
+
+def fit_strings(table, rows):
+    """Return `rows` with their values truncated to the length of the string
+    columns of `table`"""
+    lengths = [(column.name, column.type.length) for column in table.columns
+               if isinstance(column.type, db.String) and column.type.length]
+    for row in rows:
+        for name, length in lengths:
+            value = row.get(name)
+            if isinstance(value, str) and len(value) > length:
+                row = dict(row)
+                row[name] = value[:length]
+        yield row
+
+
+def insert_rows(table, rows):
+    """Bulk insert `rows` into `table`, with one executemany per distinct set of
+    columns since each executemany binds the columns of its first row"""
+    batches = {}
+    for row in fit_strings(table, rows):
+        batches.setdefault(tuple(sorted(row)), []).append(row)
+    for batch in batches.values():
+        db.session.execute(table.insert(), batch)
+
+
+class WriteBuffer(object):
+    """Buffer `Link`, `LinkCheck` and `PageTiming` rows and insert them in bulk once
+    `batch_size` rows are buffered or the oldest buffered row is
+    `batch_seconds` old. Flushes are timed as 'commit' in `metrics` if given.
+
+    Each flush is one transaction. If a row is rejected by the database, the
+    batch is rolled back and written again one row per transaction, and the
+    rejected rows are dropped so they do not fail every later flush. On any
+    other error the batch is rolled back and stays buffered for the next
+    flush. Rows still buffered when a process dies are lost, and are
+    re-checked when the job is resumed.
+    """
+    def __init__(self, batch_size=WRITE_BATCH_SIZE, batch_seconds=WRITE_BATCH_SECONDS,
+                 metrics=None):
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        self.metrics = metrics
+        self.links = []
+        self.link_checks = []
+        self.page_timings = []
+        self.oldest = None
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.write_time = 0.
+
+    def __len__(self):
+        return len(self.links) + len(self.link_checks) + len(self.page_timings)
+
+    def add_link(self, **row):
+        self.links.append(row)
+        self.added()
+
+    def add_link_check(self, **row):
+        self.link_checks.append(row)
+        self.added()
+
+    def add_page_timing(self, **row):
+        self.page_timings.append(row)
+        self.added()
+
+    def added(self):
+        """Flush if a size or time threshold has been reached"""
+        now = time.time()
+        if self.oldest is None:
+            self.oldest = now
+        if len(self) >= self.batch_size or now - self.oldest >= self.batch_seconds:
+            self.flush()
+
+    def tables(self):
+        return ((Link.__table__, self.links), (LinkCheck.__table__, self.link_checks),
+                (PageTiming.__table__, self.page_timings))
+
+    def flush(self):
+        """Insert all buffered rows in a single transaction"""
+        n_rows = len(self)
+        if n_rows == 0:
+            return
+        t0 = time.time()
+        try:
+            for table, rows in self.tables():
+                insert_rows(table, rows)
+            db.session.commit()
+        except (DataError, IntegrityError):
+            db.session.rollback()
+            n_rows -= self.insert_each()
+        except Exception:
+            db.session.rollback()
+            raise
+        elapsed = time.time() - t0
+        self.links = []
+        self.link_checks = []
+        self.page_timings = []
+        self.oldest = None
+        self.rows_written += n_rows
+        self.write_time += elapsed
+        if self.metrics is not None:
+            self.metrics.observe('commit', elapsed)
+            self.metrics.count('rows_written', n_rows)
+        print('Wrote {:,} rows in {:.3f}s ({:,.0f} rows/sec)'.format(
+            n_rows, elapsed, n_rows / max(elapsed, 1e-6)))
+
+    def insert_each(self):
+        """Insert the buffered rows one per transaction, dropping the rows the
+        database rejects; return the number of rows dropped"""
+        n_dropped = 0
+        for table, rows in self.tables():
+            for row in rows:
+                try:
+                    insert_rows(table, [row])
+                    db.session.commit()
+                except (DataError, IntegrityError) as e:
+                    db.session.rollback()
+                    n_dropped += 1
+                    print('Dropped {} row {}: {}'.format(table.name, row, e.orig))
+        self.rows_dropped += n_dropped
+        if self.metrics is not None:
+            self.metrics.count('rows_dropped', n_dropped)
+        return n_dropped
+
+    def summary(self):
+        return 'Wrote {:,} rows in {:.3f}s total ({:,.0f} rows/sec), {:,} rejected rows dropped'.format(
+            self.rows_written, self.write_time,
+            self.rows_written / max(self.write_time, 1e-6), self.rows_dropped)
@@ -0,0 +1 @@
+"""Offline crawl benchmarks run against local fixture servers"""
@@ -0,0 +1,57 @@
+"""Count the database queries issued per scan of a local synthetic website"""
+import argparse
+from contextlib import contextmanager
+from sqlalchemy import event
+from app import db
+from app.link_check import LinkChecker
+from app.models import LinkCheck, Owner
+from .fixture_server import SyntheticSite, serve
+
+
+class CountQueryLinkChecker(LinkChecker):
+    """Link checker deduplicating links with a COUNT query per link, as it did
+    before the in-memory index of checked links"""
+    def claim_link(self, link):
+        already_checked = LinkCheck.query.\
+            filter(LinkCheck.job == self.job).\
+            filter(LinkCheck.url == link).\
+            count() > 0
+        return not already_checked
+
+
+@contextmanager
+def count_queries():
+    """Count the SQL statements executed within the context"""
+    counter = dict(queries=0)
+
+    def before_cursor_execute(*args):
+        counter['queries'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def queries_per_scan(engine, root_url, owner):
+    """Scan `root_url` with link checker class `engine`; return the number of
+    queries issued and the number of links checked"""
+    with count_queries() as counter:
+        checker = engine(root_url, owner.user, owner)
+        checker.check_all_links_and_follow()
+    return counter['queries'], checker.job.link_checks.count()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Database queries per scan benchmark')
+    parser.add_argument('-p', '--pages', type=int, default=50, help='Number of pages')
+    parser.add_argument('-f', '--fan-out', type=int, default=3, help='Child pages per page')
+    args = parser.parse_args()
+    site = SyntheticSite(n_pages=args.pages, fan_out=args.fan_out, latency=0)
+    owner = Owner.query.first()
+    with serve(site) as root_url:
+        for label, engine in (('before', CountQueryLinkChecker), ('after', LinkChecker)):
+            queries, n_links = queries_per_scan(engine, root_url, owner)
+            print('{:<6} {:,} queries for {:,} links checked ({:.1f} per link)'.format(
+                label, queries, n_links, queries / n_links))
@@ -0,0 +1,37 @@
+"""Compare link checker engines on a local synthetic website"""
+import time
+import argparse
+from app.link_check import LinkChecker
+from app.async_link_check import AsyncLinkChecker
+from app.models import Owner
+from .fixture_server import SyntheticSite, serve
+
+
+def time_engine(engine, root_url, owner, **kwargs):
+    """Scan `root_url` with link checker class `engine`; return seconds elapsed"""
+    t0 = time.time()
+    checker = engine(root_url, owner.user, owner, **kwargs)
+    checker.check_all_links_and_follow()
+    return time.time() - t0
+
+
+def compare_engines(site, concurrency):
+    owner = Owner.query.first()
+    with serve(site) as root_url:
+        elapsed_recursive = time_engine(LinkChecker, root_url, owner)
+        elapsed_async = time_engine(AsyncLinkChecker, root_url, owner, concurrency=concurrency)
+    return elapsed_recursive, elapsed_async
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Link checker engine benchmark')
+    parser.add_argument('-p', '--pages', type=int, default=50, help='Number of pages')
+    parser.add_argument('-f', '--fan-out', type=int, default=3, help='Child pages per page')
+    parser.add_argument('-l', '--latency', type=float, default=0.05, help='Response latency (s)')
+    parser.add_argument('-c', '--concurrency', type=int, default=20, help='Async concurrency')
+    args = parser.parse_args()
+    site = SyntheticSite(n_pages=args.pages, fan_out=args.fan_out, latency=args.latency)
+    elapsed_recursive, elapsed_async = compare_engines(site, args.concurrency)
+    print('recursive: {:.1f} seconds elapsed'.format(elapsed_recursive))
+    print('async:     {:.1f} seconds elapsed'.format(elapsed_async))
+    print('speedup:   {:.1f}x'.format(elapsed_recursive / elapsed_async))
@@ -0,0 +1,324 @@
+"""Local HTTP server generating a deterministic synthetic website"""
+import os
+import re
+import sys
+import math
+import time
+import gzip
+import random
+import socket
+import hashlib
+import threading
+import socketserver
+from contextlib import contextmanager
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'samples')
+href_pattern = re.compile(r'\shref\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+)', re.IGNORECASE)
+word_pattern = re.compile(r'\w+')
+
+
+def lognormal_latency(median, sigma, seed=0):
+    """Return a function giving each path a latency in seconds drawn from a
+    lognormal distribution of `median` and shape `sigma`, the same for a path
+    on every run"""
+    def latency(path):
+        digest = hashlib.md5('{}:{}'.format(seed, path).encode('utf-8')).hexdigest()
+        return random.Random(digest).lognormvariate(math.log(median), sigma)
+    return latency
+
+
+def dead_host(host='127.0.0.1'):
+    """Return a root URL on a free port of loopback address `host` that nothing
+    listens on, so that requests to it are refused"""
+    with socket.socket() as s:
+        s.bind((host, 0))
+        return 'http://{}:{}/site'.format(*s.getsockname())
+
+
+def load_template(name):
+    """Read sample page `name` from the samples directory, stripping the href
+    of its links so that only the links of the synthetic site are found"""
+    with open(os.path.join(SAMPLES_DIR, name), encoding='utf-8', errors='replace') as f:
+        return href_pattern.sub('', f.read())
+
+
+class SyntheticSite(object):
+    """Tree-shaped website of `n_pages` pages, each linking to `fan_out` child
+    pages and `n_external` external resources, a share `broken_share` of which
+    respond with a 404. Pages are at most `depth` links away from the root if
+    given. Every response is delayed by `latency` seconds, or by `latency(path)`
+    seconds if it is a function such as one returned by `lognormal_latency`.
+    HEAD requests are answered with a 405 unless `allow_head`.
+    If `flat_file_size` is set, each page also links to an extensionless CSV
+    export of that many bytes.
+    External resources are served by the site itself, or spread over the root
+    URLs `external_hosts` of other sites if given, including any `dead_host`.
+    If `template` names a page of the samples directory, pages are that page
+    with their links in place of its own, and as many page specific words as
+    it has distinct words so that pages are not near-duplicates.
+    Robots.txt sets a Crawl-delay of `crawl_delay` seconds if given, and the
+    first request to each external resource is answered with a 429 asking to
+    retry after `retry_after` seconds if given.
+    Pages are served with an ETag and a Last-Modified header if `validators`,
+    and conditional requests for unchanged pages are answered with a 304.
+    All pages, and a page outside of /site, are listed in a /sitemap.xml if
+    `sitemap` is 'plain', or if it is 'index' in a sitemap index listed in
+    robots.txt, which points to a plain and a gzipped sitemap.
+    If `calendar`, the root page links to an endless calendar of near-duplicate
+    pages, each linking to the next day.
+    """
+    last_modified = 'Mon, 05 Oct 2026 08:00:00 GMT'
+
+    def __init__(self, n_pages=50, fan_out=3, n_external=3, broken_share=0.2, latency=0.05,
+                 allow_head=True, flat_file_size=0, external_hosts=None, crawl_delay=None,
+                 retry_after=None, validators=False, sitemap=None, calendar=False, depth=None,
+                 template=None):
+        self.n_pages = n_pages
+        self.fan_out = fan_out
+        self.depth = depth
+        self.n_external = n_external
+        self.broken_share = broken_share
+        self.latency = latency
+        self.allow_head = allow_head
+        self.flat_file_size = flat_file_size
+        self.external_hosts = external_hosts
+        self.crawl_delay = crawl_delay
+        self.retry_after = retry_after
+        self.validators = validators
+        self.sitemap = sitemap
+        self.calendar = calendar
+        self.template = load_template(template) if template else None
+        self.template_words = len(set(word_pattern.findall(self.template.lower()))) \
+            if template else 0
+        self.lock = threading.Lock()
+        self.throttled = set()  # paths answered with a 429
+        self.not_modified = 0  # conditional requests answered with a 304
+
+    def delay(self, path):
+        """Return the seconds to wait before answering a request for `path`"""
+        if callable(self.latency):
+            return self.latency(path)
+        return self.latency
+
+    def page_depth(self, page):
+        depth = 0
+        while page > 0:
+            page = (page - 1) // self.fan_out
+            depth += 1
+        return depth
+
+    def page_path(self, page):
+        return '/site' if page == 0 else '/site/page/{}'.format(page)
+
+    def external_path(self, page, i):
+        # external resources live outside of /site so they are not followed
+        n = page * self.n_external + i
+        broken = (n % 100) < self.broken_share * 100
+        return '/{}/{}'.format('missing' if broken else 'ext', n)
+
+    def external_host(self, page, i):
+        if not self.external_hosts:
+            return '{host}'
+        n = page * self.n_external + i
+        return self.external_hosts[n % len(self.external_hosts)].rsplit('/site', 1)[0]
+
+    def is_not_modified(self, request_headers, etag):
+        """Return True if a conditional request with `request_headers` for the
+        body tagged `etag` should be answered with a 304"""
+        if not self.validators:
+            return False
+        if_none_match = request_headers.get('If-None-Match')
+        if if_none_match is not None:
+            # takes precedence over If-Modified-Since
+            not_modified = if_none_match == etag
+        else:
+            not_modified = request_headers.get('If-Modified-Since') == self.last_modified
+        if not_modified:
+            with self.lock:
+                self.not_modified += 1
+            return True
+        return False
+
+    def throttle(self, path):
+        """Return True if `path` should be answered with a 429"""
+        if self.retry_after is None or not path.startswith('/ext/'):
+            return False
+        with self.lock:
+            if path in self.throttled:
+                return False
+            self.throttled.add(path)
+            return True
+
+    def page_html(self, page):
+        children = range(page * self.fan_out + 1, page * self.fan_out + self.fan_out + 1)
+        hrefs = [self.page_path(child) for child in children if child < self.n_pages]
+        if self.depth is not None and self.page_depth(page) >= self.depth:
+            hrefs = []
+        hrefs += [
+            '{}{}'.format(self.external_host(page, i), self.external_path(page, i))
+            for i in range(self.n_external)]
+        if self.flat_file_size:
+            hrefs.append('/site/export/{}?format=csv'.format(page))
+        if self.calendar and page == 0:
+            hrefs.append('/site/calendar/0')
+        anchors = '\n'.join('<a href="{}">link</a>'.format(href) for href in hrefs)
+        if self.template is not None:
+            words = ' '.join('p{}w{}'.format(page, i) for i in range(self.template_words))
+            return self.template.replace(
+                '</body>', '<p>{}</p>\n{}\n</body>'.format(words, anchors), 1)
+        return '<html><head><title>Page {}</title></head><body>\n{}\n</body></html>'.format(
+            page, anchors)
+
+    def calendar_html(self, day):
+        events = ' '.join('No event scheduled in room {}.'.format(room) for room in range(500))
+        return '<html><head><title>Calendar</title></head><body>\n<h1>Day {}</h1>\n' \
+            '<p>{}</p>\n<a href="/site/calendar/{}">next day</a>\n</body></html>'.format(
+                day, events, day + 1)
+
+    def robots_txt(self):
+        lines = ['User-agent: *']
+        if self.crawl_delay is not None:
+            lines.append('Crawl-delay: {}'.format(self.crawl_delay))
+        if self.sitemap == 'index':
+            lines.append('Sitemap: {host}/sitemaps/index.xml')
+        return '\n'.join(lines) + '\n'
+
+    def urlset(self, pages):
+        urls = ['{{host}}{}'.format(self.page_path(page)) for page in pages]
+        return '<?xml version="1.0" encoding="UTF-8"?>\n' \
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n{}\n</urlset>'.format(
+                '\n'.join('<url><loc>{}</loc></url>'.format(url) for url in urls))
+
+    def sitemap_route(self, path):
+        """Return the content type and body of sitemap `path`, or None"""
+        pages = list(range(self.n_pages))
+        if self.sitemap == 'plain' and path == '/sitemap.xml':
+            return 'application/xml', self.urlset(pages).replace(
+                '</urlset>', '<url><loc>{host}/other</loc></url>\n</urlset>')
+        if self.sitemap != 'index':
+            return None
+        if path == '/sitemaps/index.xml':
+            return 'application/xml', '<?xml version="1.0" encoding="UTF-8"?>\n' \
+                '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n' \
+                '<sitemap><loc>{host}/sitemaps/0.xml</loc></sitemap>\n' \
+                '<sitemap><loc>{host}/sitemaps/1.xml.gz</loc></sitemap>\n' \
+                '</sitemapindex>'
+        half = len(pages) // 2
+        if path == '/sitemaps/0.xml':
+            return 'application/xml', self.urlset(pages[:half])
+        if path == '/sitemaps/1.xml.gz':
+            return 'application/gzip', self.urlset(pages[half:])
+        return None
+
+    def route(self, path):
+        """Return the status code, content type and body served at `path`.
+        Flat file bodies are given by their size in bytes"""
+        if path == '/robots.txt' and (self.crawl_delay is not None or self.sitemap):
+            return 200, 'text/plain', self.robots_txt()
+        sitemap = self.sitemap_route(path)
+        if sitemap is not None:
+            return (200,) + sitemap
+        if path == '/site':
+            return 200, 'text/html; charset=utf-8', self.page_html(0)
+        if path.startswith('/site/page/'):
+            page = int(path.split('/')[-1])
+            if page < self.n_pages:
+                return 200, 'text/html; charset=utf-8', self.page_html(page)
+        if path.startswith('/site/calendar/') and self.calendar:
+            return 200, 'text/html; charset=utf-8', self.calendar_html(int(path.split('/')[-1]))
+        if path.startswith('/site/export/') and self.flat_file_size:
+            return 200, 'text/csv', self.flat_file_size
+        if path.startswith('/ext/'):
+            return 200, 'text/html; charset=utf-8', '<html><body>external resource</body></html>'
+        return 404, 'text/html; charset=utf-8', '<html><body>not found</body></html>'
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients close streamed responses without reading them
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def make_handler(site):
+    """Create a request handler class serving `site`"""
+    class SyntheticSiteHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive
+
+        def do_GET(self):
+            self.respond(include_body=True)
+
+        def do_HEAD(self):
+            if not site.allow_head:
+                time.sleep(site.delay(self.path.split('?')[0]))
+                self.send_response(405)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.respond(include_body=False)
+
+        def respond(self, include_body):
+            path = self.path.split('?')[0]
+            time.sleep(site.delay(path))
+            if site.throttle(path):
+                self.send_response(429)
+                self.send_header('Retry-After', str(site.retry_after))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status, content_type, body = site.route(path)
+            if isinstance(body, int):
+                self.respond_flat_file(status, content_type, body, include_body)
+                return
+            host = 'http://{}:{}'.format(*self.server.server_address)
+            body = body.replace('{host}', host).encode('utf-8')
+            if content_type == 'application/gzip':
+                body = gzip.compress(body)
+            etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+            if status == 200 and site.is_not_modified(self.headers, etag):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            if site.validators:
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', site.last_modified)
+            self.end_headers()
+            if include_body:
+                self.wfile.write(body)
+
+        def respond_flat_file(self, status, content_type, size, include_body):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(size))
+            self.end_headers()
+            if include_body:
+                block = b'0' * 64 * 1024
+                for start in range(0, size, len(block)):
+                    self.wfile.write(block[:size - start])
+
+        def log_message(self, format, *args):
+            pass
+
+    return SyntheticSiteHandler
+
+
+@contextmanager
+def serve(site, host='127.0.0.1'):
+    """Serve `site` on a free port of loopback address `host` for the duration
+    of the context, yielding its root URL"""
+    server = ThreadingHTTPServer((host, 0), make_handler(site))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield 'http://{}:{}/site'.format(*server.server_address)
+    finally:
+        server.shutdown()
+        server.server_close()
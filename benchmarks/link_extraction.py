@@ -0,0 +1,51 @@
+"""Compare link extraction with BeautifulSoup and the streaming lxml extractor
+over the HTML pages in samples/"""
+import glob
+import time
+import argparse
+import tracemalloc
+from bs4 import BeautifulSoup
+from app.link_extract import extract_links
+from app.globals import CHUNK_SIZE
+
+
+def soup_links(html):
+    """Link extraction as done by `get_all_links` before the streaming extractor"""
+    soup = BeautifulSoup(html, 'lxml')
+    return [
+        bytes(a['href'], "utf-8").decode("unicode_escape")
+        for a in soup.find_all('a')
+        if a.has_attr('href')]
+
+
+def streaming_links(html):
+    chunks = (html[i:i + CHUNK_SIZE] for i in range(0, len(html), CHUNK_SIZE))
+    return extract_links(chunks, 'utf-8')
+
+
+def benchmark(extractor, pages, repeat):
+    """Return pages/sec and peak traced memory (bytes) of `extractor` over `pages`"""
+    tracemalloc.start()
+    for page in pages:
+        extractor(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    t0 = time.time()
+    for _ in range(repeat):
+        for page in pages:
+            extractor(page)
+    return repeat * len(pages) / (time.time() - t0), peak
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Link extraction benchmark')
+    parser.add_argument('-r', '--repeat', type=int, default=20, help='Passes over the samples')
+    args = parser.parse_args()
+    pages = []
+    for filename in sorted(glob.glob('samples/*.html')):
+        with open(filename, 'rb') as f:
+            pages.append(f.read())
+    for label, extractor in (('beautifulsoup', soup_links), ('streaming', streaming_links)):
+        pages_per_second, peak = benchmark(extractor, pages, args.repeat)
+        print('{:<14} {:,.0f} pages/sec, {:,.0f} KiB peak memory'.format(
+            label, pages_per_second, peak / 1024))
@@ -0,0 +1,72 @@
+"""Measure the peak memory of scans of a large synthetic website, with and
+without the bounded memory mode"""
+import time
+import argparse
+import tracemalloc
+import app.link_check
+from app.link_check import LinkChecker, get_base_url, is_internal_href, standardize_url
+from app.incremental import PageFetch
+from app.link_extract import extract_links
+from app.models import Owner
+from .fixture_server import SyntheticSite
+
+ROOT_URL = 'http://synthetic.test/site'
+
+
+class SyntheticLinkChecker(LinkChecker):
+    """Link checker crawling `site` without network requests, so that only the
+    memory held by the crawl state and result writes is measured"""
+    def __init__(self, site, *args, **kwargs):
+        super().__init__(ROOT_URL, *args, use_link_cache=False, **kwargs)
+        self.site = site
+        # numbered synthetic pages all share a path template
+        self.traps.template_cap = None
+
+    def fetch_page(self, url):
+        path = url.split('synthetic.test', 1)[1]
+        _, _, body = self.site.route(path)
+        body = body.replace('{host}', 'http://synthetic.test').encode('utf-8')
+        return PageFetch(extract_links([body]))
+
+    def request_link_check(self, link, external=False):
+        return self.persist_link_check(link, dict(response=200))
+
+
+def measure(site, owner, **kwargs):
+    """Scan `site` with link checker options `kwargs`; return the peak memory
+    allocated in bytes, the seconds elapsed and the pages followed"""
+    app.link_check.PAGE_LIMIT = site.n_pages
+    # start each scan with empty URL caches, which are bounded in any mode
+    for cached in (get_base_url, is_internal_href, standardize_url):
+        cached.cache_clear()
+    tracemalloc.start()
+    t0 = time.time()
+    checker = SyntheticLinkChecker(site, owner.user, owner, **kwargs)
+    checker.check_all_links_and_follow()
+    elapsed = time.time() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed, len(checker.links_checked_and_followed)
+
+
+def compare_modes(n_pages, error_rate):
+    owner = Owner.query.first()
+    site = SyntheticSite(n_pages=n_pages, fan_out=3, n_external=3, latency=0)
+    return [
+        ('default', measure(site, owner)),
+        ('bounded', measure(site, owner, bounded_memory=True)),
+        ('bounded, Bloom filter', measure(
+            site, owner, bounded_memory=True, bloom_error_rate=error_rate)),
+    ]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bounded memory mode benchmark')
+    parser.add_argument('-p', '--pages', type=int, default=100000, help='Number of pages')
+    parser.add_argument('-e', '--error-rate', type=float, default=0.001,
+                        help='Bloom filter false positive rate')
+    args = parser.parse_args()
+    print('{:<24} {:>12} {:>12} {:>10}'.format('mode', 'peak memory', 'per page', 'elapsed'))
+    for mode, (peak, elapsed, pages) in compare_modes(args.pages, args.error_rate):
+        print('{:<24} {:>10.1f}MB {:>10,.0f}B {:>9.1f}s ({:,} pages)'.format(
+            mode, peak / 2 ** 20, peak / pages, elapsed, pages))
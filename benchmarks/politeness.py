@@ -0,0 +1,64 @@
+"""Show that a slow host no longer stalls link checks to other hosts"""
+import time
+import argparse
+from contextlib import ExitStack
+from app.async_link_check import AsyncLinkChecker
+from app.link_check import get_hostname
+from app.models import Owner
+from app.politeness import HostScheduler
+from .fixture_server import SyntheticSite, serve
+
+
+class HostTimingLinkChecker(AsyncLinkChecker):
+    """Async link checker recording when the last link to each host was checked"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.t0 = time.time()
+        self.host_done = {}
+
+    def persist_link_check(self, link, outcome, cached=False):
+        self.host_done[get_hostname(link)] = time.time() - self.t0
+        return super().persist_link_check(link, outcome, cached)
+
+
+def time_hosts(root_url, owner, concurrency, scheduler):
+    """Scan `root_url` with `scheduler`; return the seconds until the last
+    link to each host was checked"""
+    checker = HostTimingLinkChecker(
+        root_url, owner.user, owner, concurrency=concurrency, use_link_cache=False)
+    checker.scheduler = scheduler
+    checker.check_all_links_and_follow()
+    return checker.host_done
+
+
+def compare_schedulers(n_pages, n_external, slow_latency, concurrency):
+    """Scan a site linking to a slow host and two fast hosts, with and without
+    per-host limits; return the per-host timings of each scan"""
+    owner = Owner.query.first()
+    with ExitStack() as stack:
+        slow_url = stack.enter_context(serve(SyntheticSite(latency=slow_latency), '127.0.0.2'))
+        fast_urls = [
+            stack.enter_context(serve(SyntheticSite(latency=0.01), host))
+            for host in ('127.0.0.3', '127.0.0.4')]
+        site = SyntheticSite(
+            n_pages=n_pages, n_external=n_external, latency=0.01,
+            external_hosts=[slow_url] + fast_urls)
+        root_url = stack.enter_context(serve(site))
+        unlimited = time_hosts(
+            root_url, owner, concurrency, HostScheduler(max_in_flight=None, max_rate=None))
+        limited = time_hosts(root_url, owner, concurrency, HostScheduler())
+    return unlimited, limited
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Politeness scheduler benchmark')
+    parser.add_argument('-p', '--pages', type=int, default=20, help='Number of pages')
+    parser.add_argument('-e', '--external', type=int, default=6, help='External links per page')
+    parser.add_argument('-l', '--latency', type=float, default=0.5, help='Slow host latency (s)')
+    parser.add_argument('-c', '--concurrency', type=int, default=20, help='Async concurrency')
+    args = parser.parse_args()
+    unlimited, limited = compare_schedulers(
+        args.pages, args.external, args.latency, args.concurrency)
+    print('{:<24} {:>10} {:>10}'.format('links to host done at', 'unlimited', 'per host'))
+    for host in sorted(unlimited):
+        print('{:<24} {:>9.1f}s {:>9.1f}s'.format(host, unlimited[host], limited[host]))
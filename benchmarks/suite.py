@@ -0,0 +1,187 @@
+"""Reproducible crawl benchmark suite scanning local synthetic websites end to
+end, reporting throughput, request latency, rows written and peak memory as JSON"""
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import multiprocessing
+from contextlib import ExitStack, redirect_stdout
+from app.link_check import LinkChecker
+from app.async_link_check import AsyncLinkChecker
+from app.models import Owner
+from .fixture_server import SyntheticSite, serve, dead_host, lognormal_latency
+
+
+class InstrumentedMixin(object):
+    """Link checker mixin timing each page fetch and link check request"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+        self.links = 0
+        request = self.prober.request
+
+        def timed_request(link):
+            t0 = time.time()
+            outcome = request(link)
+            self.latencies.append(time.time() - t0)
+            return outcome
+        self.prober.request = timed_request
+
+    def fetch_page(self, url):
+        t0 = time.time()
+        page = super().fetch_page(url)
+        self.latencies.append(time.time() - t0)
+        return page
+
+    def persist_link_check(self, link, outcome, cached=False):
+        self.links += 1
+        return super().persist_link_check(link, outcome, cached)
+
+
+def instrumented(engine):
+    """Return link checker class `engine` with timings"""
+    return type('Instrumented' + engine.__name__, (InstrumentedMixin, engine), {})
+
+
+class Scenario(object):
+    """Synthetic website of `n_pages` pages times the suite's scale, with
+    `slow_hosts` external hosts answering after `slow_latency` seconds and
+    `dead_hosts` external hosts refusing connections, scanned by `engine` with
+    link checker options `checker_options`. Other options are those of
+    `SyntheticSite`"""
+    def __init__(self, name, description, engine=LinkChecker, n_pages=100,
+                 slow_hosts=0, slow_latency=0.5, dead_hosts=0, checker_options=None,
+                 **site_options):
+        self.name = name
+        self.description = description
+        self.engine = engine
+        self.n_pages = n_pages
+        self.slow_hosts = slow_hosts
+        self.slow_latency = slow_latency
+        self.dead_hosts = dead_hosts
+        self.checker_options = checker_options or {}
+        self.site_options = site_options
+
+    def serve(self, stack, scale=1):
+        """Serve the website and its external hosts for the duration of
+        ExitStack `stack`; return its root URL"""
+        # external hosts need their own address, hosts being told apart by name
+        external_hosts = [
+            stack.enter_context(serve(
+                SyntheticSite(latency=self.slow_latency), '127.0.0.{}'.format(10 + i)))
+            for i in range(self.slow_hosts)]
+        external_hosts += [
+            dead_host('127.0.0.{}'.format(20 + i)) for i in range(self.dead_hosts)]
+        site = SyntheticSite(
+            n_pages=self.n_pages * scale, external_hosts=external_hosts or None,
+            **self.site_options)
+        return stack.enter_context(serve(site))
+
+
+SCENARIOS = [
+    Scenario('baseline', 'Tree of pages with a fan-out of 4, 20% broken links',
+             n_pages=200, fan_out=4, n_external=4, latency=0.005),
+    Scenario('async', 'Baseline scanned by the async engine',
+             engine=AsyncLinkChecker, n_pages=200, fan_out=4, n_external=4,
+             latency=0.005),
+    Scenario('lognormal latency', 'Lognormal latencies of median 20ms, async engine',
+             engine=AsyncLinkChecker, n_pages=200, fan_out=4, n_external=4,
+             latency=lognormal_latency(0.02, 1.0)),
+    Scenario('deep', 'Chain of pages 100 links deep',
+             n_pages=100, fan_out=1, n_external=2, latency=0.005),
+    Scenario('slow and dead hosts', 'External links to a 500ms host and a dead host',
+             engine=AsyncLinkChecker, n_pages=100, fan_out=4, n_external=6,
+             latency=0.005, slow_hosts=1, dead_hosts=1),
+    Scenario('large flat files', 'Each page links to a 20MB extensionless CSV export',
+             n_pages=20, fan_out=3, n_external=2, latency=0.005, flat_file_size=20 * 2 ** 20),
+    Scenario('sample templates', 'Pages rendered from samples/va.html, 60KB each',
+             n_pages=100, fan_out=4, n_external=4, latency=0.005, template='va.html'),
+    Scenario('bounded memory', 'Baseline scanned in bounded memory mode',
+             n_pages=200, fan_out=4, n_external=4, latency=0.005,
+             checker_options=dict(bounded_memory=True)),
+]
+
+
+def percentile(latencies, share):
+    """Return the latency that a `share` of `latencies` do not exceed"""
+    if not latencies:
+        return None
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def peak_rss_kb():
+    """Return the peak resident set size of this process in kilobytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_scenario(scenario, owner, scale=1):
+    """Scan the website of `scenario`, silencing the scan log; return its results"""
+    with ExitStack() as stack:
+        root_url = scenario.serve(stack, scale)
+        stack.enter_context(redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        t0 = time.time()
+        checker = instrumented(scenario.engine)(
+            root_url, owner.user, owner, use_link_cache=False, **scenario.checker_options)
+        # numbered synthetic pages all share a path template
+        checker.traps.template_cap = None
+        checker.check_all_links_and_follow()
+        elapsed = time.time() - t0
+    pages = len(checker.links_checked_and_followed)
+    return dict(
+        scenario=scenario.name,
+        description=scenario.description,
+        engine=scenario.engine.__name__,
+        pages=pages,
+        links=checker.links,
+        seconds=round(elapsed, 3),
+        pages_per_sec=round(pages / elapsed, 1),
+        links_per_sec=round(checker.links / elapsed, 1),
+        requests=len(checker.latencies),
+        latency_p50=percentile(checker.latencies, 0.5),
+        latency_p99=percentile(checker.latencies, 0.99),
+        rows_written=checker.writes.rows_written,
+        peak_rss_kb=peak_rss_kb(),
+    )
+
+
+def run_named_scenario(name, scale):
+    scenario = next(scenario for scenario in SCENARIOS if scenario.name == name)
+    return run_scenario(scenario, Owner.query.first(), scale)
+
+
+def run_suite(names=None, scale=1, isolate=True):
+    """Run the scenarios named `names`, or all of them, each in a fresh process
+    if `isolate` so that its peak RSS is its own; return their results"""
+    names = names or [scenario.name for scenario in SCENARIOS]
+    if not isolate:
+        return [run_named_scenario(name, scale) for name in names]
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for name in names:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(run_named_scenario, (name, scale)))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Crawl benchmark suite')
+    parser.add_argument('-s', '--scenario', action='append',
+                        choices=[scenario.name for scenario in SCENARIOS],
+                        help='Scenario to run, all by default; may be repeated')
+    parser.add_argument('-x', '--scale', type=int, default=1, help='Page count multiplier')
+    parser.add_argument('-o', '--output', help='JSON output file, stdout by default')
+    parser.add_argument('--in-process', action='store_true',
+                        help='Run all scenarios in this process; peak RSS is then cumulative')
+    args = parser.parse_args()
+    results = run_suite(args.scenario, args.scale, isolate=not args.in_process)
+    report = json.dumps(dict(scale=args.scale, results=results), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
@@ -0,0 +1,67 @@
+"""Measure URL normalization throughput over the hrefs of the pages in samples/,
+each found on several distinct pages as nav bars and footers are in a crawl"""
+import time
+import argparse
+from os import path
+from requests.compat import urljoin
+from app.link_check import (
+    group_links_internal_external, parse_url, get_base_url, standardize_url, is_internal_href,
+    ensure_protocol)
+from app.link_extract import extract_links
+
+
+# sample pages and the URLs they were saved from
+sample_urls = {
+    'stokes.html': 'http://www.stokes4senate.com/forms/shares/new',
+    'va.html': 'https://www.va.gov/HEALTHBENEFITS/cost/',
+    'va_directory.html': 'https://www.va.gov/directory/guide/home.asp',
+    'va_ptsd.html': 'https://www.va.gov/directory/guide/PTSD.asp',
+    'va_recovery.html': 'https://www.va.gov/directory/guide/PTSD.asp',
+}
+
+
+def clear_url_caches():
+    for cached in (parse_url, get_base_url, standardize_url, is_internal_href, ensure_protocol):
+        cached.cache_clear()
+
+
+def page_urls(url, n_pages):
+    """Return `n_pages` distinct URLs of pages next to `url`"""
+    return [urljoin(url, 'page{}.html'.format(i)) for i in range(n_pages)]
+
+
+def normalize_pages(pages):
+    """Normalize the hrefs of each page; return the number of URLs normalized"""
+    n_urls = 0
+    for url, links in pages:
+        internal_links, external_links = group_links_internal_external(links, url)
+        n_urls += len(internal_links) + len(external_links)
+    return n_urls
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='URL normalization benchmark')
+    parser.add_argument('-n', '--pages', type=int, default=20,
+                        help='Distinct pages each sample is found on')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Passes over the pages')
+    args = parser.parse_args()
+    pages = []
+    for filename, url in sorted(sample_urls.items()):
+        with open(path.join('samples', filename), 'rb') as f:
+            links = extract_links([f.read()])
+        pages += [(page_url, links) for page_url in page_urls(url, args.pages)]
+
+    # caches start empty at each pass, so hits only come from hrefs repeated
+    # within and across pages
+    elapsed = 0
+    for _ in range(args.repeat):
+        clear_url_caches()
+        t0 = time.time()
+        n_urls = normalize_pages(pages)
+        elapsed += time.time() - t0
+    print('{:,} pages: {:,.0f} normalized URLs/sec'.format(
+        len(pages), args.repeat * n_urls / elapsed))
+    for cached in (is_internal_href, standardize_url, ensure_protocol, parse_url, get_base_url):
+        info = cached.cache_info()
+        print('{}: {:,} hits, {:,} misses, {:.0%} hit rate'.format(
+            cached.__name__, info.hits, info.misses, info.hits / max(1, info.hits + info.misses)))
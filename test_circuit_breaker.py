@@ -0,0 +1,69 @@
+import time
+import socket
+from app.circuit_breaker import CircuitBreaker
+from app.http_session import HTTPSession
+from app.probe import LinkProber
+
+connection_error = dict(exception='ConnectionError', note='Connection refused')
+
+
+def test_opens_after_threshold():
+    breaker = CircuitBreaker(threshold=3, cooloff=60)
+    for _ in range(2):
+        assert breaker.allow('dead.com')
+        breaker.record('dead.com', connection_error)
+    assert breaker.allow('dead.com')
+    breaker.record('dead.com', connection_error)
+    assert not breaker.allow('dead.com')
+    assert breaker.allow('alive.com')
+    assert breaker.short_circuits == 1
+    outcome = breaker.short_circuit_outcome('dead.com')
+    assert outcome['exception'] == 'ConnectionError'
+    assert outcome['note'].startswith('Not requested')
+
+
+def test_success_resets_failures():
+    breaker = CircuitBreaker(threshold=2, cooloff=60)
+    breaker.record('flaky.com', connection_error)
+    breaker.record('flaky.com', dict(response=200))
+    breaker.record('flaky.com', connection_error)
+    assert breaker.allow('flaky.com')
+
+
+def test_other_exceptions_ignored():
+    breaker = CircuitBreaker(threshold=1, cooloff=60)
+    breaker.record('bad-cert.com', dict(exception='SSLError', note='bad cert'))
+    assert breaker.allow('bad-cert.com')
+
+
+def test_half_open_probe():
+    breaker = CircuitBreaker(threshold=1, cooloff=0.01)
+    breaker.record('dead.com', connection_error)
+    assert not breaker.allow('dead.com')
+    time.sleep(0.02)
+    assert breaker.allow('dead.com')
+    # a single probe at a time
+    assert not breaker.allow('dead.com')
+    breaker.record('dead.com', connection_error)
+    assert not breaker.allow('dead.com')
+    time.sleep(0.02)
+    assert breaker.allow('dead.com')
+    breaker.record('dead.com', dict(response=200))
+    assert breaker.allow('dead.com')
+    assert breaker.allow('dead.com')
+
+
+def test_prober_short_circuits_dead_host():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    dead_port = sock.getsockname()[1]
+    sock.close()
+    session = HTTPSession()
+    prober = LinkProber(session, breaker=CircuitBreaker(threshold=3, cooloff=60))
+    outcomes = [
+        prober.request('http://127.0.0.1:{}/asset/{}'.format(dead_port, i))
+        for i in range(10)]
+    assert session.stats.requests == 3
+    assert prober.method_counts['HEAD'] == 3
+    assert all(outcome['exception'] == 'ConnectionError' for outcome in outcomes)
+    assert all(outcome['note'].startswith('Not requested') for outcome in outcomes[3:])
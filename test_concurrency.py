@@ -0,0 +1,69 @@
+from requests.exceptions import ConnectionError
+from urllib3.exceptions import ProtocolError
+from app.async_link_check import AsyncLinkChecker
+from app.concurrency import AIMDLimit, AIMDController, is_connection_reset
+from app.models import Owner
+from benchmarks.fixture_server import SyntheticSite, serve
+
+
+def test_is_connection_reset():
+    reset = ConnectionError(ProtocolError(
+        'Connection aborted.', ConnectionResetError(104, 'Connection reset by peer')))
+    assert is_connection_reset(reset)
+    assert not is_connection_reset(ConnectionError('Name or service not known'))
+
+
+def test_additive_increase():
+    limit = AIMDLimit('global', 10, 2, 12, window=5)
+    for _ in range(4):
+        assert limit.observe(0.1) is None
+    decision = limit.observe(0.1)
+    assert (decision['old'], decision['new'], decision['reason']) == (10, 11, 'steady')
+    for _ in range(10):
+        limit.observe(0.1)
+    assert limit.limit == 12
+
+
+def test_multiplicative_decrease_on_errors():
+    limit = AIMDLimit('global', 10, 2, 50, window=5, error_share=0.1)
+    for i in range(5):
+        decision = limit.observe(0.1, error=(i == 0))
+    assert (decision['old'], decision['new']) == (10, 5)
+    for _ in range(15):
+        limit.observe(0.1, error=True)
+    assert limit.limit == 2
+
+
+def test_multiplicative_decrease_on_p95_rise():
+    limit = AIMDLimit('global', 10, 2, 50, window=5, tolerance=2)
+    for _ in range(5):
+        limit.observe(0.1)
+    for _ in range(5):
+        decision = limit.observe(0.5)
+    assert (decision['old'], decision['new']) == (11, 5)
+    assert decision['reason'].startswith('p95')
+
+
+def test_controller_per_host():
+    controller = AIMDController(limit=10, host_limit=4)
+    for _ in range(20):
+        controller.observe('http://slow.com', 0.1, error=True)
+        controller.observe('http://fast.com', 0.1)
+    assert controller.host_limit('http://slow.com') < 4
+    assert controller.host_limit('http://fast.com') > 4
+    assert controller.host_limit('http://new.com') == 4
+    assert [decision['scope'] for decision in controller.decisions] == [
+        'global', 'http://slow.com', 'global', 'http://fast.com']
+    assert controller.to_json() == controller.decisions
+
+
+def test_decisions_logged_per_job():
+    owner = Owner.query.first()
+    site = SyntheticSite(n_pages=30, n_external=3, latency=0)
+    with serve(site) as root_url:
+        checker = AsyncLinkChecker(root_url, owner.user, owner, concurrency=4)
+        checker.check_all_links_and_follow()
+    assert checker.job.concurrency_log
+    assert checker.controller.limit != 4
+    fixed = AsyncLinkChecker(root_url, owner.user, owner, adaptive=False)
+    assert fixed.controller is None
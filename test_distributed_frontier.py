@@ -0,0 +1,107 @@
+import datetime
+import multiprocessing
+from app import db
+from app.distributed_frontier import DistributedFrontier
+from app.distributed_link_check import run_worker
+from app.models import Owner, ScanJob, LinkCheck, FrontierURL
+from benchmarks.fixture_server import SyntheticSite, serve
+
+
+def create_job(root_url):
+    owner = Owner.query.first()
+    job = ScanJob(
+        root_url=root_url,
+        start_time=datetime.datetime.utcnow(),
+        user=owner.user,
+        owner=owner,
+        status='in progress')
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def test_pages_leased_once():
+    job = create_job('dummy.com')
+    first = DistributedFrontier(job.id, 'first')
+    second = DistributedFrontier(job.id, 'second')
+    first.push(['http://dummy.com/a', 'http://dummy.com/b'], 1)
+    second.push(['http://dummy.com', 'http://dummy.com/a'], 0)
+    assert first.claim()[1:] == ('http://dummy.com', 0)
+    assert second.claim()[1:] == ('http://dummy.com/a', 1)
+    assert first.claim()[1:] == ('http://dummy.com/b', 1)
+    assert second.claim() is None
+
+
+def test_links_checked_once():
+    job = create_job('dummy.com')
+    first = DistributedFrontier(job.id, 'first')
+    second = DistributedFrontier(job.id, 'second')
+    assert first.claim_checks(['http://a.com', 'http://b.com']) == {'http://a.com', 'http://b.com'}
+    assert second.claim_checks(['http://b.com', 'http://c.com']) == {'http://c.com'}
+    # checked links may still be queued as pages
+    second.push(['http://c.com'], 1)
+    assert first.claim()[1] == 'http://c.com'
+
+
+def test_page_limit():
+    job = create_job('dummy.com')
+    first = DistributedFrontier(job.id, 'first', page_limit=2, lease_seconds=-1)
+    second = DistributedFrontier(job.id, 'second', page_limit=2)
+    first.push(['http://dummy.com', 'http://dummy.com/a', 'http://dummy.com/b'], 0)
+    assert first.claim()[1] == 'http://dummy.com'
+    # reclaiming an expired lease is not counted again
+    page_id, url, depth = second.claim()
+    assert url == 'http://dummy.com'
+    assert second.claim()[1] == 'http://dummy.com/a'
+    assert second.claim() is None
+    assert second.pages_claimed() == 2
+
+
+def test_expired_lease_reclaimed():
+    job = create_job('dummy.com')
+    crashed = DistributedFrontier(job.id, 'crashed', lease_seconds=-1)
+    crashed.push(['http://dummy.com'], 0)
+    crashed.claim_checks(['http://a.com'])
+    assert crashed.claim() is not None
+    other = DistributedFrontier(job.id, 'other')
+    assert not other.finish()
+    page_id, url, depth = other.claim()
+    assert url == 'http://dummy.com'
+    # links claimed by the crashed worker without results are released
+    assert other.claim_checks(['http://a.com']) == {'http://a.com'}
+    other.complete(page_id)
+    assert other.finish()
+
+
+def test_completed_exactly_once():
+    job = create_job('dummy.com')
+    frontiers = [DistributedFrontier(job.id, str(i)) for i in range(3)]
+    frontiers[0].push(['http://dummy.com'], 0)
+    page_id, _, _ = frontiers[1].claim()
+    assert not frontiers[0].finish()
+    frontiers[1].complete(page_id)
+    assert [frontier.finish() for frontier in frontiers] == [True, False, False]
+    assert frontiers[2].completed()
+
+
+def test_workers_in_processes():
+    site = SyntheticSite(n_pages=40, fan_out=3, n_external=3, latency=0.01)
+    with serve(site) as root_url:
+        job = create_job(root_url.split('://')[1])
+        job_id = job.id
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(3) as pool:
+            completed = pool.starmap(
+                run_worker, [(job_id, 'worker-{}'.format(i)) for i in range(3)])
+    assert sorted(completed) == [False, False, True]
+    db.session.expire_all()
+    assert ScanJob.query.get(job_id).status == 'completed'
+    checked = [url for url, in LinkCheck.query.filter(LinkCheck.job_id == job_id).
+               with_entities(LinkCheck.url)]
+    assert len(checked) == len(set(checked)) == 40 + 40 * 3 - 1
+    pages = FrontierURL.query.filter(FrontierURL.job_id == job_id).\
+        filter(FrontierURL.status == 'done').count()
+    assert pages == 40
+    workers = FrontierURL.query.filter(FrontierURL.job_id == job_id).\
+        with_entities(FrontierURL.checked_by).distinct().all()
+    assert len(workers) > 1
@@ -0,0 +1,132 @@
+import os
+import json
+from app.frontier import Frontier, SpillingFrontier
+
+
+def test_breadth_first():
+    frontier = Frontier()
+    frontier.push('http://a.com/deep', 2)
+    frontier.push('http://a.com/shallow', 1)
+    frontier.push('http://a.com', 0)
+    assert frontier.pop() == ('http://a.com', 0)
+    assert frontier.pop() == ('http://a.com/shallow', 1)
+    assert frontier.pop() == ('http://a.com/deep', 2)
+    assert len(frontier) == 0
+
+
+def test_most_linked_first():
+    frontier = Frontier()
+    frontier.push('http://a.com/once', 1)
+    frontier.push('http://a.com/twice', 1)
+    frontier.push('http://a.com/twice', 1)
+    assert len(frontier) == 2
+    assert frontier.pop() == ('http://a.com/twice', 1)
+    assert frontier.pop() == ('http://a.com/once', 1)
+
+
+def test_insertion_order_within_depth():
+    frontier = Frontier()
+    for i in range(5):
+        frontier.push('http://a.com/{}'.format(i), 1)
+    assert [frontier.pop()[0] for _ in range(5)] == ['http://a.com/{}'.format(i) for i in range(5)]
+
+
+def test_shallowest_depth_kept():
+    frontier = Frontier()
+    frontier.push('http://a.com/page', 3)
+    frontier.push('http://a.com/page', 1)
+    assert frontier.pop() == ('http://a.com/page', 1)
+    assert not frontier
+
+
+def test_max_depth():
+    frontier = Frontier(max_depth=1)
+    assert frontier.push('http://a.com', 0)
+    assert frontier.push('http://a.com/1', 1)
+    assert not frontier.push('http://a.com/1/2', 2)
+    assert 'http://a.com/1/2' not in frontier
+    assert len(frontier) == 2
+
+
+def test_pop_empty():
+    frontier = Frontier()
+    try:
+        frontier.pop()
+        assert False
+    except IndexError:
+        pass
+
+
+def test_to_json_and_load():
+    frontier = Frontier()
+    frontier.push('http://a.com/deep', 2)
+    frontier.push('http://a.com/shallow', 1)
+    frontier.push('http://a.com/popular', 1)
+    frontier.push('http://a.com/popular', 1)
+    restored = Frontier()
+    restored.load(frontier.to_json())
+    assert len(restored) == 3
+    assert [restored.pop() for _ in range(3)] == [frontier.pop() for _ in range(3)]
+
+
+def test_spilling_frontier_breadth_first():
+    frontier = SpillingFrontier(max_queued=3)
+    for depth in (2, 1, 2, 1, 3, 1, 2):
+        for i in range(3):
+            frontier.push('http://a.com/{}/{}/{}'.format(depth, len(frontier), i), depth)
+    assert len(frontier.queued) == 3
+    assert len(frontier) == 21
+    popped = [frontier.pop() for _ in range(21)]
+    assert not frontier
+    assert [depth for _, depth in popped] == sorted(depth for _, depth in popped)
+    assert len(set(popped)) == 21
+    frontier.close()
+
+
+def test_spilled_pages_queued_once():
+    frontier = SpillingFrontier(max_queued=1)
+    frontier.push('http://a.com/0', 1)
+    assert frontier.push('http://a.com/1', 1)
+    assert frontier.push('http://a.com/1', 1)
+    assert 'http://a.com/1' in frontier
+    assert len(frontier) == 2
+
+
+def test_spilling_frontier_checkpoint(tmpdir):
+    frontier = SpillingFrontier(max_queued=3, spill_dir=str(tmpdir))
+    for depth in (1, 2, 1, 2):
+        for i in range(3):
+            frontier.push('http://a.com/{}/{}/{}'.format(depth, len(frontier), i), depth)
+    popped = [frontier.pop() for _ in range(4)]
+    state = json.loads(json.dumps(frontier.to_json()))
+    # spilled pages are checkpointed by spill file and read offset, not inlined
+    assert len(state['queued']) <= 3
+    assert all(os.path.dirname(path) == str(tmpdir) for _, path, _ in state['spills'])
+    expected = [frontier.pop() for _ in range(8)]
+    assert not frontier
+
+    restored = SpillingFrontier(max_queued=3, spill_dir=str(tmpdir))
+    restored.load(state)
+    assert len(restored) == 8
+    assert popped[0][0] not in restored
+    resumed = [restored.pop() for _ in range(8)]
+    assert not restored
+    assert sorted(resumed) == sorted(expected)
+    assert [depth for _, depth in resumed] == sorted(depth for _, depth in resumed)
+
+    frontier.close()
+    restored.close()
+    assert not tmpdir.listdir()
+
+
+def test_spilled_page_not_queued_again():
+    frontier = SpillingFrontier(max_queued=1)
+    frontier.push('http://a.com/x', 1)
+    frontier.push('http://a.com/y', 1)
+    assert frontier.pop() == ('http://a.com/x', 1)
+    # room in memory again, but y is still spilled
+    assert frontier.push('http://a.com/y', 1)
+    assert len(frontier) == 1
+    assert frontier.pop() == ('http://a.com/y', 1)
+    assert not frontier
+    frontier.close()
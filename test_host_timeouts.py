@@ -0,0 +1,107 @@
+import pytest
+import requests
+from app.host_timeouts import HostTimeouts
+from app.http_session import HTTPSession
+from app.link_check import LinkChecker
+from app.models import Owner
+from benchmarks.fixture_server import SyntheticSite, serve
+
+
+def test_default_until_enough_samples():
+    timeouts = HostTimeouts(default=10, min_timeout=1, max_timeout=30, multiplier=3)
+    assert timeouts.timeout('new.com') == (10, 10)
+    for _ in range(4):
+        timeouts.record_first_byte('new.com', 0.5)
+    assert timeouts.timeout('new.com') == (10, 10)
+    timeouts.record_first_byte('new.com', 0.5)
+    assert timeouts.timeout('new.com') == (10, 1.5)
+
+
+def test_timeouts_within_bounds():
+    timeouts = HostTimeouts(default=10, min_timeout=1, max_timeout=30, multiplier=3)
+    for _ in range(10):
+        timeouts.record_connect('fast.com', 0.01)
+        timeouts.record_first_byte('fast.com', 0.05)
+        timeouts.record_first_byte('slow.com', 15)
+    assert timeouts.timeout('fast.com') == (1, 1)
+    assert timeouts.timeout('slow.com') == (10, 30)
+
+
+def test_p95_covers_stalls():
+    timeouts = HostTimeouts(default=10, min_timeout=0.1, max_timeout=30, multiplier=2)
+    for _ in range(19):
+        timeouts.record_first_byte('spiky.com', 0.1)
+    timeouts.record_first_byte('spiky.com', 2)
+    assert timeouts.timeout('spiky.com')[1] == pytest.approx(4)
+
+
+def test_to_json_and_load():
+    timeouts = HostTimeouts(default=10, min_timeout=1, max_timeout=30, multiplier=3)
+    for _ in range(5):
+        timeouts.record_first_byte('slow.com', 5)
+    warm = HostTimeouts(default=10, min_timeout=1, max_timeout=30, multiplier=3)
+    warm.load(timeouts.to_json())
+    assert warm.timeout('slow.com') == (10, 15)
+
+
+def test_to_json_summarizes_latencies():
+    timeouts = HostTimeouts(default=10, min_timeout=0.1, max_timeout=30, multiplier=2, max_hosts=2)
+    for i in range(100):
+        timeouts.record_first_byte('busy.com', 2 if i % 20 == 19 else 0.1)
+    for i in range(10):
+        timeouts.record_first_byte('quiet.com', 1)
+    timeouts.record_first_byte('rare.com', 1)
+    data = timeouts.to_json()
+    # only a summary of the most sampled hosts
+    assert sorted(data) == ['busy.com', 'quiet.com']
+    assert sorted(data['busy.com']['first_byte']) == ['count', 'ewma', 'p95']
+    assert data['busy.com']['first_byte']['count'] == 100
+    assert data['busy.com']['connect'] == dict(ewma=None, p95=None, count=0)
+    warm = HostTimeouts(default=10, min_timeout=0.1, max_timeout=30, multiplier=2)
+    warm.load(data)
+    assert warm.timeout('busy.com') == timeouts.timeout('busy.com')
+    assert warm.timeout('busy.com')[0] == 10
+    # new samples push out the persisted p95
+    for _ in range(50):
+        warm.record_first_byte('busy.com', 0.1)
+    assert warm.timeout('busy.com')[1] == pytest.approx(0.2, rel=1e-3)
+
+
+def test_load_persisted_samples():
+    warm = HostTimeouts(default=10, min_timeout=1, max_timeout=30, multiplier=3)
+    warm.load({'slow.com': dict(connect={}, first_byte=dict(ewma=5, samples=[5] * 5))})
+    assert warm.timeout('slow.com') == (10, 15)
+
+
+def test_session_records_latency():
+    session = HTTPSession()
+    with serve(SyntheticSite(latency=0.01)) as root_url:
+        for _ in range(5):
+            session.get(root_url)
+    session.close()
+    latency = session.timeouts.hosts['127.0.0.1']
+    assert len(latency.connect) == 1
+    assert len(latency.first_byte) == 5
+    assert latency.first_byte.ewma >= 0.01
+
+
+def test_session_records_timeouts():
+    session = HTTPSession()
+    for _ in range(5):
+        session.timeouts.record_first_byte('127.0.0.1', 0.01)
+    session.timeouts.min_timeout = 0.05
+    with serve(SyntheticSite(latency=0.5)) as root_url:
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            session.get(root_url)
+    session.close()
+    assert max(session.timeouts.hosts['127.0.0.1'].first_byte.samples) == 0.05
+
+
+def test_next_scan_starts_warm():
+    owner = Owner.query.first()
+    with serve(SyntheticSite(n_pages=5, n_external=0, latency=0)) as root_url:
+        checker = LinkChecker(root_url, owner.user, owner)
+        checker.check_all_links_and_follow()
+        assert checker.job.host_latency['127.0.0.1']['first_byte']['count']
+        next_checker = LinkChecker(root_url, owner.user, owner)
+    assert '127.0.0.1' in next_checker.timeouts.hosts
@@ -0,0 +1,35 @@
+from app.http_session import HTTPSession
+from benchmarks.fixture_server import SyntheticSite, serve
+
+
+def test_connection_reuse():
+    session = HTTPSession()
+    with serve(SyntheticSite(latency=0)) as root_url:
+        for _ in range(10):
+            assert session.get(root_url).status_code == 200
+    session.close()
+    assert session.stats.requests == 10
+    assert session.stats.handshakes == 1
+    assert session.stats.reused == 9
+
+
+def test_connection_per_host():
+    session = HTTPSession()
+    with serve(SyntheticSite(latency=0)) as root_url:
+        with serve(SyntheticSite(latency=0)) as other_root_url:
+            for _ in range(3):
+                session.get(root_url)
+                session.get(other_root_url)
+    session.close()
+    assert session.stats.requests == 6
+    assert session.stats.handshakes == 2
+
+
+def test_streamed_response_released():
+    session = HTTPSession(pool_size=1, max_connections=1)
+    with serve(SyntheticSite(latency=0)) as root_url:
+        for _ in range(3):
+            response = session.get(root_url, stream=True)
+            response.close()
+    session.close()
+    assert session.stats.requests == 3
@@ -0,0 +1,67 @@
+from unittest.mock import patch
+from app.api import scheduled_scan
+from app.link_check import LinkChecker, standardize_descheme_url
+from app.async_link_check import AsyncLinkChecker
+from app.incremental import fetch_page
+from app.models import Owner, LinkCheck, PageValidator
+from benchmarks.fixture_server import SyntheticSite, serve
+
+
+def scan_results(checker):
+    checker.check_all_links_and_follow()
+    return set(checker.job.link_checks.with_entities(LinkCheck.url, LinkCheck.response))
+
+
+def test_conditional_request():
+    with serve(SyntheticSite(n_pages=1, latency=0, validators=True)) as root_url:
+        page = fetch_page(root_url)
+        assert len(page.hrefs) == 3
+        assert page.etag and page.last_modified and page.content_hash
+        unchanged = fetch_page(root_url, validator=page)
+        assert unchanged.unchanged
+        assert unchanged.content_hash == page.content_hash
+
+
+def test_unchanged_content_hash():
+    with serve(SyntheticSite(n_pages=1, latency=0)) as root_url:
+        page = fetch_page(root_url)
+        assert page.etag is None
+        assert fetch_page(root_url, validator=page).unchanged
+
+
+def test_incremental_rescan():
+    owner = Owner.query.first()
+    for validators in (True, False):
+        site = SyntheticSite(n_pages=6, n_external=2, latency=0, validators=validators)
+        with serve(site) as root_url:
+            first = scan_results(LinkChecker(root_url, owner.user, owner, incremental=True))
+            for engine in (LinkChecker, AsyncLinkChecker):
+                rescan = engine(root_url, owner.user, owner, incremental=True)
+                assert scan_results(rescan) == first
+                assert rescan.validators.skipped == 6
+
+            # pages whose links changed are parsed again
+            site.n_external = 3
+            rescan = LinkChecker(root_url, owner.user, owner, incremental=True)
+            assert len(scan_results(rescan)) == len(first) + 6
+            assert rescan.validators.skipped == 0
+        assert site.not_modified == (12 if validators else 0)
+
+
+def test_validators_recorded_by_incremental_scans_only():
+    owner = Owner.query.first()
+    with serve(SyntheticSite(n_pages=3, latency=0)) as root_url:
+        root = standardize_descheme_url(root_url)
+        scan_results(LinkChecker(root_url, owner.user, owner))
+        assert PageValidator.query.filter(PageValidator.root_url == root).count() == 0
+        scan_results(LinkChecker(root_url, owner.user, owner, incremental=True))
+        assert PageValidator.query.filter(PageValidator.root_url == root).count() == 3
+
+
+@patch('app.api.scheduler.add_job')
+def test_scheduled_scan_incremental_option(add_job):
+    owner = Owner.query.first()
+    scheduled_scan('incremental.dummy.com', owner.user, dict(hour=3), owner)
+    assert add_job.call_args[1]['kwargs']['incremental'] is True
+    scheduled_scan('full.dummy.com', owner.user, dict(hour=3), owner, incremental=False)
+    assert add_job.call_args[1]['kwargs']['incremental'] is False
@@ -0,0 +1,48 @@
+import time
+from app.link_cache import LinkCache, cacheable
+
+
+def test_hit_and_miss():
+    cache = LinkCache()
+    assert cache.get('http://a.com') is None
+    cache.put('http://a.com', dict(response=200))
+    assert cache.get('http://a.com') == dict(response=200)
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_returns_copy():
+    cache = LinkCache()
+    cache.put('http://a.com', dict(response=200))
+    cache.get('http://a.com')['response'] = 404
+    assert cache.get('http://a.com') == dict(response=200)
+
+
+def test_ttl():
+    cache = LinkCache(ttl=0.01)
+    cache.put('http://a.com', dict(exception='SSLError', note='bad cert'))
+    time.sleep(0.02)
+    assert cache.get('http://a.com') is None
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    cache = LinkCache(max_size=2)
+    cache.put('http://a.com', dict(response=200))
+    cache.put('http://b.com', dict(response=200))
+    cache.get('http://a.com')
+    cache.put('http://c.com', dict(response=404))
+    assert len(cache) == 2
+    assert cache.get('http://b.com') is None
+    assert cache.get('http://a.com') is not None
+    assert cache.get('http://c.com') is not None
+
+
+def test_cacheable():
+    assert cacheable(dict(response=200))
+    assert cacheable(dict(response=404))
+    assert not cacheable(dict(response=503))
+    assert not cacheable(dict(response=429))
+    assert not cacheable(dict(response=408))
+    assert not cacheable(dict(exception='ReadTimeout', note='timed out'))
+    assert not cacheable(dict(exception='ConnectionError', note='Not requested: a.com failed'))
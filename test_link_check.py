@@ -1,7 +1,34 @@
+import datetime
 from os import path
+import requests
 from app.link_check import *
 from app.models import Owner
-from unittest.mock import patch
+from app.politeness import HostScheduler
+from app.traps import TrapDetector
+from unittest.mock import patch, Mock
+
+
+def mock_transport(response):
+    """Give mock `response` the timing of a real response"""
+    response.history = []
+    response.elapsed = datetime.timedelta(0)
+    response.connect_time = 0.
+    response.raw.tell.return_value = 0
+
+
+def mock_html(response, html):
+    """Serve `html` from mock `response`"""
+    mock_transport(response)
+    response.headers = {'Content-Type': 'text/html; charset=utf-8'}
+    response.iter_content.return_value = [html.encode('utf-8')]
+
+
+def chain_page(method, url, **kwargs):
+    """Mock response for page n of a site where each page links only to page n + 1"""
+    n = int(url.split('/')[-1]) if url.split('/')[-1].isdigit() else 0
+    response = Mock(status_code=200)
+    mock_html(response, '<a href="/chain/{}">next</a>'.format(n + 1) if n < 1100 else '')
+    return response
 
 
 class TestLinkCheck(object):
@@ -66,10 +93,10 @@ class TestLinkCheck(object):
         assert r.response is None
         assert r.exception == "ConnectTimeout"
 
-    @patch('app.link_check.requests.get')
-    def test_links_checked_and_followed_single_page(self, mock_get):
-        mock_get.return_value.status_code = 404
-        mock_get.return_value.content = self.sample_html
+    @patch('app.http_session.HTTPSession.request')
+    def test_links_checked_and_followed_single_page(self, mock_request):
+        mock_request.return_value.status_code = 404
+        mock_html(mock_request.return_value, self.sample_html)
         test_checker = LinkChecker(
             'https://blog.dummy.com',
             self.owner.user,
@@ -77,10 +104,10 @@ class TestLinkCheck(object):
         test_checker.check_all_links_and_follow()
         assert len(test_checker.links_checked_and_followed) == 3
 
-    @patch('app.link_check.requests.get')
-    def test_links_checked_and_followed_single_page_no_schema(self, mock_get):
-        mock_get.return_value.status_code = 404
-        mock_get.return_value.content = self.sample_html
+    @patch('app.http_session.HTTPSession.request')
+    def test_links_checked_and_followed_single_page_no_schema(self, mock_request):
+        mock_request.return_value.status_code = 404
+        mock_html(mock_request.return_value, self.sample_html)
         test_checker = LinkChecker(
             'blog.dummy.com',
             self.owner.user,
@@ -88,16 +115,104 @@ class TestLinkCheck(object):
         test_checker.check_all_links_and_follow()
         assert len(test_checker.links_checked_and_followed) == 3
 
+    @patch('app.http_session.HTTPSession.request')
+    def test_deep_site_breadth_first(self, mock_request):
+        mock_request.side_effect = chain_page
+        test_checker = LinkChecker(
+            'https://blog.dummy.com/chain',
+            self.owner.user,
+            self.owner)
+        # mocked responses are instant, so don't rate limit link checks
+        test_checker.scheduler = HostScheduler(max_rate=None)
+        # nor cap the pages of the /chain/{n} path template
+        test_checker.frontier.traps = TrapDetector(template_cap=None)
+        test_checker.check_all_links_and_follow()
+        assert len(test_checker.links_checked_and_followed) == 1101
+
+    @patch('app.http_session.HTTPSession.request')
+    def test_max_depth(self, mock_request):
+        mock_request.side_effect = chain_page
+        test_checker = LinkChecker(
+            'https://blog.dummy.com/chain',
+            self.owner.user,
+            self.owner,
+            max_depth=2)
+        test_checker.check_all_links_and_follow()
+        assert test_checker.links_checked_and_followed == set([
+            'http://blog.dummy.com/chain',
+            'http://blog.dummy.com/chain/1',
+            'http://blog.dummy.com/chain/2',
+        ])
+
+    @patch('app.http_session.HTTPSession.request')
+    def test_links_checked_index(self, mock_request):
+        mock_request.return_value.status_code = 200
+        mock_transport(mock_request.return_value)
+        assert self.test_checker.check_link('http://somegreatsite.com').response == 200
+        assert self.test_checker.check_link('http://somegreatsite.com') is None
+        assert mock_request.call_count == 1
+
+    @patch('app.http_session.HTTPSession.request')
+    def test_resume_primes_links_checked(self, mock_request):
+        mock_request.return_value.status_code = 200
+        mock_transport(mock_request.return_value)
+        self.test_checker.check_link('http://somegreatsite.com')
+        self.test_checker.writes.flush()
+        resumed_checker = LinkChecker(
+            'https://stripe.com/blog',
+            self.owner.user,
+            self.owner,
+            job=self.test_checker.job)
+        assert resumed_checker.job.id == self.test_checker.job.id
+        assert 'http://somegreatsite.com' in resumed_checker.links_checked
+        assert resumed_checker.check_link('http://somegreatsite.com') is None
+        assert mock_request.call_count == 1
+
+    @patch('app.http_session.HTTPSession.request')
+    def test_external_link_cache(self, mock_request):
+        mock_request.return_value.status_code = 404
+        mock_transport(mock_request.return_value)
+        r = self.test_checker.check_link('http://cached.dummy.com/page', external=True)
+        assert r.response == 404
+        assert not r.cached
+        other_checker = LinkChecker('https://blog.dummy.com', self.owner.user, self.owner)
+        r = other_checker.check_link('http://cached.dummy.com/page', external=True)
+        assert r.response == 404
+        assert r.cached
+        assert mock_request.call_count == 1
+        assert other_checker.link_cache_hits == 1
+
+    @patch('app.http_session.HTTPSession.request')
+    def test_external_link_cache_opt_out(self, mock_request):
+        mock_request.return_value.status_code = 200
+        mock_transport(mock_request.return_value)
+        self.test_checker.check_link('http://uncached.dummy.com/page', external=True)
+        other_checker = LinkChecker(
+            'https://blog.dummy.com', self.owner.user, self.owner, use_link_cache=False)
+        r = other_checker.check_link('http://uncached.dummy.com/page', external=True)
+        assert not r.cached
+        assert mock_request.call_count == 2
+
+    @patch('app.http_session.HTTPSession.request')
+    def test_external_link_failures_not_cached(self, mock_request):
+        mock_request.side_effect = requests.exceptions.ConnectionError('refused')
+        r = self.test_checker.check_link('http://down.dummy.com/page', external=True)
+        assert r.exception == 'ConnectionError'
+        other_checker = LinkChecker('https://blog.dummy.com', self.owner.user, self.owner)
+        r = other_checker.check_link('http://down.dummy.com/page', external=True)
+        assert not r.cached
+        assert mock_request.call_count == 2
+
     def test_long_response_siafoo(self):
         r = self.test_checker.check_link('http://www.siafoo.net/article/52')
         assert r.response == 200
 
-    @patch('app.link_check.requests.get')
-    def test_stokes(self, mock_get):
+    @patch('app.http_session.HTTPSession.request')
+    def test_stokes(self, mock_request):
         with open(path.join('samples', 'stokes.html'), 'r') as f:
             sample_html = f.read()
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.content = sample_html
+        mock_request.return_value.status_code = 200
+        mock_html(mock_request.return_value, sample_html)
         test_checker = LinkChecker(
             'http://www.stokes4senate.com/forms/shares/new',
             self.owner.user,
@@ -112,12 +227,12 @@ class TestLinkCheck(object):
             'http://www.stokes4senate.com/forms/shares/new',
         ])
 
-    @patch('app.link_check.requests.get')
-    def test_dot_asp_va(self, mock_get):
+    @patch('app.http_session.HTTPSession.request')
+    def test_dot_asp_va(self, mock_request):
         with open(path.join('samples', 'va.html'), 'r') as f:
             sample_html = f.read()
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.content = sample_html
+        mock_request.return_value.status_code = 200
+        mock_html(mock_request.return_value, sample_html)
         test_checker = LinkChecker(
             'https://www.va.gov/HEALTHBENEFITS/cost/',
             self.owner.user,
@@ -128,12 +243,12 @@ class TestLinkCheck(object):
         asp_links = [link for link in links_checked if 'copays.asp' in link]
         assert 'http://copays.asp' not in asp_links
 
-    @patch('app.link_check.requests.get')
-    def test_relative_ext_va(self, mock_get):
+    @patch('app.http_session.HTTPSession.request')
+    def test_relative_ext_va(self, mock_request):
         with open(path.join('samples', 'va_directory.html'), 'r') as f:
             sample_html = f.read()
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.content = sample_html
+        mock_request.return_value.status_code = 200
+        mock_html(mock_request.return_value, sample_html)
         test_checker = LinkChecker(
             'https://www.va.gov/directory/guide/home.asp',
             self.owner.user,
@@ -144,12 +259,12 @@ class TestLinkCheck(object):
         assert 'http://./PTSD.asp' not in links_checked
         assert 'http://www.va.gov/directory/guide/PTSD.asp' in links_checked
 
-    @patch('app.link_check.requests.get')
-    def test_relative_no_dot_slash(self, mock_get):
+    @patch('app.http_session.HTTPSession.request')
+    def test_relative_no_dot_slash(self, mock_request):
         with open(path.join('samples', 'va_ptsd.html'), 'r') as f:
             sample_html = f.read()
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.content = sample_html
+        mock_request.return_value.status_code = 200
+        mock_html(mock_request.return_value, sample_html)
         test_checker = LinkChecker(
             'https://www.va.gov/directory/guide/PTSD.asp',
             self.owner.user,
@@ -160,12 +275,12 @@ class TestLinkCheck(object):
         assert 'http://state_PTSD.cfm?STATE=VI' not in links_checked
         assert 'http://www.va.gov/directory/guide/state_PTSD.cfm' in links_checked
 
-    @patch('app.link_check.requests.get')
-    def test_relative_dot_xml(self, mock_get):
+    @patch('app.http_session.HTTPSession.request')
+    def test_relative_dot_xml(self, mock_request):
         with open(path.join('samples', 'va_recovery.html'), 'r') as f:
             sample_html = f.read()
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.content = sample_html
+        mock_request.return_value.status_code = 200
+        mock_html(mock_request.return_value, sample_html)
         test_checker = LinkChecker(
             'https://www.va.gov/directory/guide/PTSD.asp',
             self.owner.user,
@@ -0,0 +1,96 @@
+import time
+from os import path
+from app.link_check import get_all_links
+from app.link_extract import extract_links, get_charset, is_html
+from benchmarks.fixture_server import SyntheticSite, serve
+
+
+def test_extract_links():
+    html = b'<html><body><A HREF="/a">A</A><a name="no-href"></a><a href="http://b.com">B</a></body></html>'
+    assert extract_links([html]) == ['/a', 'http://b.com']
+
+
+def test_chunk_boundaries():
+    html = b'<html><body><a href="/first">1</a><a href="/second">2</a></body></html>'
+    chunks = [html[i:i + 7] for i in range(0, len(html), 7)]
+    assert extract_links(chunks) == ['/first', '/second']
+
+
+def test_empty_document():
+    assert extract_links([]) == []
+    assert extract_links([b'']) == []
+
+
+def test_header_charset():
+    html = '<a href="/caf\xe9">café</a>'.encode('iso-8859-1')
+    assert extract_links([html], 'iso-8859-1') == ['/caf\xe9']
+
+
+def test_invalid_header_charset():
+    html = '<a href="/caf\xe9">café</a>'.encode('utf-8')
+    assert extract_links([html], 'utf8mb4') == ['/caf\xe9']
+    assert extract_links([html], 'none') == ['/caf\xe9']
+    assert extract_links([html], 'utf_8') == ['/caf\xe9']
+
+
+def test_undeclared_charset():
+    html = '<a href="/caf\xe9">café</a>'.encode('utf-8')
+    assert extract_links([html]) == ['/caf\xe9']
+    chunks = [html[i:i + 9] for i in range(0, len(html), 9)]
+    assert extract_links(chunks) == ['/caf\xe9']
+    assert extract_links(['<a href="/caf\xe9">café</a>'.encode('cp1252')]) == ['/caf\xe9']
+
+
+def test_meta_charset():
+    html = '<meta charset="iso-8859-1"><a href="/caf\xe9">café</a>'.encode('iso-8859-1')
+    assert extract_links([html]) == ['/caf\xe9']
+    html = '<meta charset="bogus"><a href="/caf\xe9">café</a>'.encode('utf-8')
+    assert extract_links([html]) == ['/caf\xe9']
+
+
+def test_unicode_escape():
+    assert extract_links([b'<a href="http:\\u002F\\u002Fa.com">a</a>']) == ['http://a.com']
+
+
+def test_get_charset():
+    assert get_charset('text/html; charset=UTF-8') == 'UTF-8'
+    assert get_charset('text/html;charset="iso-8859-1"') == 'iso-8859-1'
+    assert get_charset('text/html') is None
+    assert get_charset('') is None
+
+
+def test_is_html():
+    assert is_html('text/html')
+    assert is_html('text/html; charset=utf-8')
+    assert is_html('application/xhtml+xml')
+    assert is_html('')
+    assert not is_html('text/csv')
+    assert not is_html('application/zip')
+    assert not is_html('application/json')
+
+
+def test_samples():
+    with open(path.join('samples', 'va.html'), 'rb') as f:
+        links = extract_links([f.read()])
+    assert len(links) == 338
+    assert 'copays.asp' in links
+
+
+def test_get_all_links_html():
+    with serve(SyntheticSite(latency=0, n_external=2)) as root_url:
+        links = get_all_links(root_url)
+    assert len(links) == 5
+
+
+def test_get_all_links_skips_flat_file():
+    site = SyntheticSite(latency=0, flat_file_size=200 * 1024 * 1024)
+    with serve(site) as root_url:
+        t0 = time.time()
+        assert get_all_links(root_url + '/export/0?format=csv') == []
+        assert time.time() - t0 < 5
+
+
+def test_get_all_links_max_bytes():
+    with serve(SyntheticSite(latency=0, n_external=2)) as root_url:
+        links = get_all_links(root_url, max_bytes=100)
+    assert links == ['/site/page/1']
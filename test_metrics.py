@@ -0,0 +1,90 @@
+from base64 import b64encode
+from app import app, db
+from app.link_check import LinkChecker
+from app.async_link_check import AsyncLinkChecker
+from app.metrics import Histogram, ScanMetrics, prometheus_text
+from app.models import Owner, User
+from benchmarks.fixture_server import SyntheticSite, serve
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(0.1, 1))
+    for seconds in (0.05, 0.1, 0.5, 2):
+        histogram.observe(seconds)
+    assert list(histogram.cumulative_counts()) == [('0.1', 2), ('1', 3), ('+Inf', 4)]
+    merged = Histogram(buckets=(0.1, 1))
+    merged.merge(histogram.to_json())
+    merged.merge(histogram.to_json())
+    assert merged.count == 8
+    assert merged.counts == [4, 2, 2]
+
+
+def test_scan_metrics_drain():
+    metrics = ScanMetrics()
+    with metrics.timer('fetch'):
+        pass
+    metrics.count('links_checked', 3)
+    totals = ScanMetrics()
+    totals.load(metrics.drain())
+    totals.load(metrics.drain())
+    assert totals.phases['fetch'].count == 1
+    assert totals.counters['links_checked'] == 3
+    assert metrics.to_json() == dict(phases={}, counters={})
+
+
+def test_scan_phases():
+    owner = Owner.query.first()
+    site = SyntheticSite(n_pages=6, n_external=2, latency=0.005)
+    with serve(site) as root_url:
+        for engine in (LinkChecker, AsyncLinkChecker):
+            checker = engine(root_url, owner.user, owner, use_link_cache=False)
+            checker.check_all_links_and_follow()
+            phases = checker.job.phase_metrics['phases']
+            assert phases['fetch']['count'] == 6
+            assert phases['parse']['count'] == 6
+            assert phases['group_links']['count'] == 6
+            # 5 child pages and 12 external resources
+            assert phases['check_network']['count'] == 17
+            assert phases['check_persist']['count'] == 17
+            assert phases['commit']['count'] >= 1
+            assert phases['fetch']['sum'] > phases['parse']['sum']
+            assert checker.job.phase_metrics['counters']['links_checked'] == 17
+
+
+def test_prometheus_text():
+    metrics = ScanMetrics()
+    metrics.observe('fetch', 0.02)
+    metrics.observe('fetch', 0.2)
+    metrics.count('links_checked', 5)
+    text = prometheus_text(
+        [(1, 'completed', metrics.to_json()), (2, 'in progress', metrics.to_json())], 24)
+    lines = text.splitlines()
+    assert 'linkcheck_window_phase_runs_le{phase="fetch",le="0.025"} 2' in lines
+    assert 'linkcheck_window_phase_runs_le{phase="fetch",le="+Inf"} 4' in lines
+    assert 'linkcheck_window_phase_runs{phase="fetch"} 4' in lines
+    assert 'linkcheck_window_phase_seconds{phase="fetch"} 0.44' in lines
+    assert 'linkcheck_scan_events{event="links_checked"} 10' in lines
+    assert 'linkcheck_job_phase_seconds{job_id="2",phase="fetch"} 0.22' in lines
+    assert not any(line.startswith('linkcheck_job_phase_seconds{job_id="1"') for line in lines)
+    # windowed totals may decrease, so no metric claims to be a histogram or counter
+    types = [line.split()[-1] for line in lines if line.startswith('# TYPE')]
+    assert set(types) == {'gauge'}
+
+
+def test_metrics_endpoint():
+    admin = User.query.filter(User.username == 'metrics-admin').first()
+    if admin is None:
+        admin = User(username='metrics-admin', admin=True)
+        admin.hash_password('secret')
+        db.session.add(admin)
+        db.session.commit()
+    owner = Owner.query.first()
+    with serve(SyntheticSite(n_pages=2, n_external=1, latency=0)) as root_url:
+        LinkChecker(root_url, owner.user, owner).check_all_links_and_follow()
+    client = app.test_client()
+    auth = b64encode(b'metrics-admin:secret').decode('ascii')
+    r = client.get('/metrics', headers={'Authorization': 'Basic ' + auth})
+    assert r.status_code == 200
+    assert r.content_type.startswith('text/plain')
+    assert 'linkcheck_window_phase_runs{phase="fetch"}' in r.get_data(as_text=True)
+    assert client.get('/metrics').status_code == 401
@@ -1,6 +1,13 @@
 import time
+import json
 from app.link_check import *
 from app.models import Owner
+from app.link_extract import extract_links
+from benchmarks.fixture_server import SyntheticSite, lognormal_latency
+from benchmarks.engines import compare_engines
+from benchmarks.politeness import compare_schedulers
+from benchmarks.memory import compare_modes
+from benchmarks.suite import Scenario, run_scenario
 
 
 def test_performance_comparatory():
@@ -19,3 +26,52 @@ def test_performance_eightportions():
     test_checker.check_all_links_and_follow()
     print('{:.1f} seconds elapsed'.format(time.time() - t0))
     assert(time.time() - t0 < 150)
+
+
+def test_performance_async_engine_fixture():
+    site = SyntheticSite(n_pages=30, fan_out=3, n_external=3, latency=0.05)
+    elapsed_recursive, elapsed_async = compare_engines(site, concurrency=20)
+    print('{:.1f}x speedup'.format(elapsed_recursive / elapsed_async))
+    assert(elapsed_async < elapsed_recursive / 2)
+
+
+def test_performance_politeness_fixture():
+    unlimited, limited = compare_schedulers(
+        n_pages=20, n_external=6, slow_latency=0.5, concurrency=20)
+    print(unlimited, limited)
+    # links to fast hosts are no longer stuck behind links to the slow host
+    assert(limited['http://127.0.0.3'] < unlimited['http://127.0.0.3'])
+    assert(limited['http://127.0.0.3'] < limited['http://127.0.0.2'] / 2)
+
+
+def test_performance_bounded_memory_fixture():
+    (_, (default, _, _)), (_, (bounded, _, _)), (_, (bloom, _, pages)) = \
+        compare_modes(n_pages=2000, error_rate=0.001)
+    print('{:,} / {:,} / {:,} bytes'.format(default, bounded, bloom))
+    assert(pages == 2000)
+    assert(bounded < default * 0.75)
+    assert(bloom < default * 0.75)
+
+
+def test_fixture_site_options():
+    latency = lognormal_latency(0.02, 1.0)
+    assert(latency('/site/page/1') == latency('/site/page/1'))
+    assert(latency('/site/page/1') != latency('/site/page/2'))
+    site = SyntheticSite(n_pages=100, fan_out=2, depth=2, template='va.html')
+    assert('/site/page/3"' in site.page_html(1))
+    assert('/site/page/' not in site.page_html(3))
+    # only the links of the synthetic site are left in the template
+    assert(len(extract_links([site.page_html(0).encode('utf-8')])) == 2 + site.n_external)
+
+
+def test_performance_suite_fixture():
+    scenario = Scenario('test', 'Pages rendered from a sample with a dead host',
+                        n_pages=20, fan_out=3, n_external=2, latency=0.005, dead_hosts=1,
+                        template='stokes.html')
+    result = run_scenario(scenario, Owner.query.first())
+    print(json.dumps(result))
+    assert(result['pages'] == 20)
+    assert(result['links'] == 19 + 20 * 2)
+    assert(result['rows_written'] == 2 * result['links'] + result['pages'])
+    assert(result['latency_p50'] <= result['latency_p99'])
+    assert(result['peak_rss_kb'] > 0)
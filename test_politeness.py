@@ -0,0 +1,80 @@
+import time
+from app.link_check import LinkChecker
+from app.async_link_check import AsyncLinkChecker
+from app.http_session import HTTPSession
+from app.models import Owner, LinkCheck
+from app.politeness import HostScheduler, RobotsCache, parse_retry_after
+from benchmarks.fixture_server import SyntheticSite, serve
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('120') == 120
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+
+
+def test_in_flight_cap():
+    scheduler = HostScheduler(max_in_flight=2, max_rate=None)
+    assert scheduler.delay('http://a.com') == 0
+    scheduler.start('http://a.com')
+    scheduler.start('http://a.com')
+    assert scheduler.delay('http://a.com') is None
+    assert scheduler.delay('http://b.com') == 0
+    scheduler.finish('http://a.com', 'http://a.com/1', dict(response=200))
+    assert scheduler.delay('http://a.com') == 0
+
+
+def test_rate_cap():
+    scheduler = HostScheduler(max_in_flight=None, max_rate=10)
+    scheduler.start('http://a.com')
+    scheduler.finish('http://a.com', 'http://a.com/1', dict(response=200))
+    assert 0 < scheduler.delay('http://a.com') <= 0.1
+
+
+def test_retry_after():
+    scheduler = HostScheduler(max_in_flight=None, max_rate=None)
+    outcome = dict(response=429, retry_after=5)
+    scheduler.start('http://a.com')
+    assert scheduler.finish('http://a.com', 'http://a.com/1', outcome) == 5
+    assert 'retry_after' not in outcome
+    assert scheduler.delay('http://a.com') > 4
+    for _ in range(2):
+        scheduler.start('http://a.com')
+        scheduler.finish('http://a.com', 'http://a.com/1', dict(response=429, retry_after=5))
+    # retries of a link are limited
+    assert scheduler.retries['http://a.com/1'] == 2
+    assert scheduler.throttled == 2
+
+
+def test_robots_crawl_delay():
+    robots = RobotsCache(max_delay=10)
+    session = HTTPSession()
+    with serve(SyntheticSite(crawl_delay=2, latency=0)) as root_url:
+        assert robots.claim('http://127.0.0.1')
+        assert not robots.claim('http://127.0.0.1')
+        robots.load('http://127.0.0.1', root_url, session)
+    session.close()
+    assert robots.crawl_delay('http://127.0.0.1') == 2
+
+
+def test_robots_read_for_hosts_requested_again():
+    scheduler = HostScheduler()
+    assert not scheduler.needs_robots('http://a.com')
+    scheduler.start('http://a.com')
+    assert scheduler.needs_robots('http://a.com')
+    assert not scheduler.needs_robots('http://a.com')
+
+
+def test_throttled_links_retried():
+    owner = Owner.query.first()
+    site = SyntheticSite(n_pages=3, n_external=2, broken_share=0, latency=0, retry_after=0)
+    with serve(site) as root_url:
+        for engine in (LinkChecker, AsyncLinkChecker):
+            site.throttled.clear()
+            checker = engine(root_url, owner.user, owner, use_link_cache=False)
+            checker.check_all_links_and_follow()
+            assert checker.scheduler.throttled == 6
+            responses = checker.job.link_checks.with_entities(LinkCheck.response).all()
+            assert len(responses) == 8
+            assert {response for response, in responses} == {200}
@@ -0,0 +1,74 @@
+from app.http_session import HTTPSession
+from app.probe import LinkProber, timing_fields
+from benchmarks.fixture_server import SyntheticSite, serve
+
+
+def test_head_first():
+    prober = LinkProber(HTTPSession())
+    with serve(SyntheticSite(latency=0)) as root_url:
+        outcome = prober.request(root_url)
+    assert outcome['response'] == 200
+    assert outcome['method'] == 'HEAD'
+    assert prober.method_counts['HEAD'] == 1
+    assert prober.method_counts['GET'] == 0
+    assert not prober.host_methods
+
+
+def test_head_not_found_trusted():
+    prober = LinkProber(HTTPSession())
+    with serve(SyntheticSite(latency=0)) as root_url:
+        assert prober.request(root_url.replace('/site', '/missing/1'))['response'] == 404
+    assert prober.method_counts['HEAD'] == 1
+    assert prober.method_counts['RANGE'] == 0
+
+
+def test_fallback_learned_per_host():
+    prober = LinkProber(HTTPSession())
+    with serve(SyntheticSite(latency=0, allow_head=False)) as root_url:
+        outcome = prober.request(root_url)
+        assert outcome['response'] == 200
+        assert outcome['method'] == 'RANGE'
+        assert prober.method_counts['HEAD'] == 1
+        assert prober.method_counts['RANGE'] == 1
+        assert prober.request(root_url + '/page/1')['response'] == 200
+        assert prober.method_counts['HEAD'] == 1
+        assert prober.method_counts['RANGE'] == 2
+    assert list(prober.host_methods.values()) == [1]
+
+
+def test_full_fallback_learned_per_host():
+    # a host answering every method with a fallback status, like a genuine 403
+    prober = LinkProber(HTTPSession(), fallback_statuses=(404,))
+    with serve(SyntheticSite(latency=0)) as root_url:
+        assert prober.request(root_url.replace('/site', '/missing/1'))['method'] == 'GET'
+        assert prober.method_counts == dict(HEAD=1, RANGE=1, GET=1)
+        outcome = prober.request(root_url.replace('/site', '/missing/2'))
+        assert outcome['response'] == 404
+        assert outcome['method'] == 'GET'
+        assert prober.method_counts == dict(HEAD=1, RANGE=1, GET=2)
+    assert list(prober.host_methods.values()) == [2]
+
+
+def test_exception_not_retried():
+    prober = LinkProber(HTTPSession())
+    outcome = prober.request('http://')
+    assert outcome['exception'] == 'InvalidURL'
+    assert prober.method_counts['HEAD'] == 1
+    assert prober.method_counts['RANGE'] == 0
+
+
+def test_timing():
+    prober = LinkProber(HTTPSession())
+    site = SyntheticSite(latency=0.05, allow_head=False)
+    with serve(site) as root_url:
+        first = prober.request(root_url)
+        # a 405 to HEAD, then a ranged GET
+        assert first['elapsed'] >= 0.1
+        assert first['connect_time'] > 0
+        assert 0.05 <= first['ttfb'] < first['elapsed']
+        assert first['bytes_read'] == 0
+        assert first['redirects'] == 0
+        assert set(timing_fields) <= set(first)
+    outcome = prober.request('http://')
+    assert outcome['elapsed'] >= 0
+    assert outcome['method'] == 'HEAD'
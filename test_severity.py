@@ -0,0 +1,110 @@
+import json
+import importlib.util
+from base64 import b64encode
+import sqlalchemy as sa
+from app import app, db
+from app.link_check import LinkChecker
+from app.models import Owner, LinkCheck, assess_severity
+from app.write_buffer import insert_rows
+from benchmarks.fixture_server import SyntheticSite, serve
+from test_distributed_frontier import create_job
+from test_timing import get_user
+
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location(
+        'severity_migration', 'migrations/versions/9b4e2f6a1c83_.py')
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    return migration
+
+
+def test_assess_severity():
+    assert assess_severity('http://example.com/a', 404, None) == 3
+    assert assess_severity('http://example.com/a', None, 'ConnectionError') == 3
+    assert assess_severity('http://example.com/a', 403, None) == 2
+    assert assess_severity('http://example.com/a', None, 'SSLError') == 2
+    assert assess_severity('https://www.linkedin.com/in/a', 999, None) == 0
+    assert assess_severity('javascript:void(0)', None, 'InvalidSchema') == 0
+    assert assess_severity('javascript:void(0)', None, None) == 0
+    assert assess_severity('http://example.com/a', 500, None) == 1
+    assert assess_severity('http://example.com/a', None, 'ReadTimeout') == 1
+    assert assess_severity('http://example.com/a', 200, None) == 0
+
+
+def test_severity_default():
+    job = create_job('severity.com')
+    rows = [
+        dict(url='http://example.com/gone', response=404, job_id=job.id),
+        dict(url='javascript:void(0)', exception='InvalidSchema', job_id=job.id),
+    ]
+    insert_rows(LinkCheck.__table__, rows)
+    check = LinkCheck(url='http://example.com/down', exception='ConnectionError', job_id=job.id)
+    db.session.add(check)
+    db.session.commit()
+    assert check.severity == 3
+    severities = LinkCheck.query.\
+        filter(LinkCheck.url.in_([row['url'] for row in rows])).\
+        filter(LinkCheck.job_id == job.id).\
+        with_entities(LinkCheck.url, LinkCheck.severity).all()
+    assert dict(severities) == {'http://example.com/gone': 3, 'javascript:void(0)': 0}
+
+
+def test_backfill_severity():
+    engine = sa.create_engine('sqlite://')
+    migration = load_migration()
+    migration.BACKFILL_BATCH_SIZE = 2
+    sa.Table(
+        'link_check', sa.MetaData(),
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('url', sa.Text),
+        sa.Column('response', sa.Integer),
+        sa.Column('exception', sa.String(20)),
+        sa.Column('severity', sa.SmallInteger),
+    ).create(engine)
+    rows = [
+        dict(url='http://example.com/gone', response=404, exception=None),
+        dict(url='http://example.com/ok', response=200, exception=None),
+        dict(url='javascript:void(0)', response=None, exception='InvalidSchema'),
+        dict(url='http://example.com/forbidden', response=403, exception=None),
+        dict(url='http://example.com/error', response=500, exception=None),
+    ]
+    with engine.begin() as connection:
+        connection.execute(migration.link_check.insert(), rows)
+        migration.backfill_severity(connection)
+        severities = connection.execute(
+            sa.select([migration.link_check.c.url, migration.link_check.c.severity])).fetchall()
+    assert dict(severities) == {
+        row['url']: assess_severity(row['url'], row['response'], row['exception'])
+        for row in rows}
+
+
+def test_historical_results_by_severity():
+    user = get_user('severity-user')
+    owner = Owner.query.filter(Owner.email == 'severity-user').first()
+    site = SyntheticSite(n_pages=4, n_external=3, latency=0)
+    with serve(site) as root_url:
+        checker = LinkChecker(root_url, user, owner, use_link_cache=False)
+        checker.check_all_links_and_follow()
+    checks = LinkCheck.query.filter(LinkCheck.job_id == checker.job.id).all()
+    assert all(
+        check.severity == assess_severity(check.url, check.response, check.exception)
+        for check in checks)
+
+    client = app.test_client()
+    auth = b64encode(b'severity-user:secret').decode('ascii')
+    headers = {'Authorization': 'Basic ' + auth}
+    r = client.get(
+        '/results/historical', json=dict(url=root_url, limit=100), headers=headers)
+    assert r.status_code == 200
+    errors = json.loads(r.get_data(as_text=True))['results']
+    assert errors
+    assert all(result['severity'] > 0 for result in errors)
+    assert [(-result['severity'], result['id']) for result in errors] == \
+        sorted((-result['severity'], result['id']) for result in errors)
+    r = client.get(
+        '/results/historical', json=dict(url=root_url, limit=100, filter_exceptions=False),
+        headers=headers)
+    valid = json.loads(r.get_data(as_text=True))['results']
+    assert all(result['severity'] == 0 for result in valid)
+    assert len(errors) + len(valid) == len(checks)
@@ -0,0 +1,88 @@
+import gzip
+from app.link_check import LinkChecker
+from app.async_link_check import AsyncLinkChecker
+from app.distributed_link_check import DistributedLinkChecker
+from app.models import Owner
+from app.http_session import HTTPSession
+from app.sitemap import gunzip_chunks, parse_sitemap, sitemap_urls
+from benchmarks.fixture_server import SyntheticSite, serve
+
+
+def test_parse_sitemap():
+    xml = b'''<?xml version="1.0" encoding="UTF-8"?>
+    <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+    <url><loc> http://a.com/1 </loc><lastmod>2026-10-01</lastmod></url>
+    <url><loc>http://a.com/2</loc></url>
+    </urlset>'''
+    chunks = [xml[i:i + 7] for i in range(0, len(xml), 7)]
+    assert list(parse_sitemap(chunks)) == [('url', 'http://a.com/1'), ('url', 'http://a.com/2')]
+
+
+def test_parse_sitemap_index():
+    xml = b'''<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+    <sitemap><loc>http://a.com/sitemap-1.xml.gz</loc></sitemap>
+    </sitemapindex>'''
+    assert list(parse_sitemap([xml])) == [('sitemap', 'http://a.com/sitemap-1.xml.gz')]
+
+
+def test_parse_sitemap_entities_not_expanded(tmpdir):
+    secret = tmpdir.join('secret.txt')
+    secret.write('http://secret.com/')
+    template = '''<?xml version="1.0"?>
+    <!DOCTYPE urlset [<!ENTITY loc {}>]>
+    <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+    <url><loc>&loc;</loc></url>
+    <url><loc>http://a.com/1</loc></url>
+    </urlset>'''
+    for entity in ('"http://a.com/expanded"', 'SYSTEM "file://{}"'.format(secret)):
+        xml = template.format(entity).encode('utf-8')
+        assert list(parse_sitemap([xml])) == [('url', 'http://a.com/1')]
+
+
+def test_gunzip_chunks():
+    compressed = gzip.compress(b'<urlset></urlset>')
+    chunks = [compressed[i:i + 5] for i in range(0, len(compressed), 5)]
+    assert b''.join(gunzip_chunks(iter(chunks))) == b'<urlset></urlset>'
+    assert b''.join(gunzip_chunks(iter([b'<urlset>', b'</urlset>']))) == b'<urlset></urlset>'
+
+
+def test_sitemap_urls():
+    for sitemap in ('plain', 'index'):
+        with serve(SyntheticSite(n_pages=6, latency=0, sitemap=sitemap)) as root_url:
+            urls = list(sitemap_urls(root_url, HTTPSession()))
+        assert len(urls) == (7 if sitemap == 'plain' else 6)
+
+
+def test_orphan_pages_seeded():
+    owner = Owner.query.first()
+    # pages are only linked to from the sitemaps
+    site = SyntheticSite(n_pages=8, fan_out=0, n_external=1, latency=0, sitemap='index')
+    with serve(site) as root_url:
+        for engine in (LinkChecker, AsyncLinkChecker):
+            checker = engine(root_url, owner.user, owner, use_sitemaps=True)
+            checker.check_all_links_and_follow()
+            assert len(checker.links_checked_and_followed) == 8
+        checker = LinkChecker(root_url, owner.user, owner)
+        checker.check_all_links_and_follow()
+        assert len(checker.links_checked_and_followed) == 1
+
+
+class SeedCountingLinkChecker(DistributedLinkChecker):
+    seeds = 0
+
+    def seed_from_sitemaps(self):
+        SeedCountingLinkChecker.seeds += 1
+        super().seed_from_sitemaps()
+
+
+def test_distributed_seeded_once():
+    owner = Owner.query.first()
+    site = SyntheticSite(n_pages=8, fan_out=0, n_external=1, latency=0, sitemap='index')
+    with serve(site) as root_url:
+        first = SeedCountingLinkChecker(root_url, owner.user, owner, use_sitemaps=True)
+        second = SeedCountingLinkChecker(
+            root_url, owner.user, owner, job=first.job, use_sitemaps=True)
+        first.check_all_links_and_follow()
+        second.check_all_links_and_follow()
+    assert SeedCountingLinkChecker.seeds == 1
+    assert len(first.links_checked_and_followed) == 8
@@ -0,0 +1,70 @@
+from base64 import b64encode
+from app import app, db
+from app.link_check import LinkChecker
+from app.models import Owner, User, LinkCheck, PageTiming
+from benchmarks.fixture_server import SyntheticSite, serve
+
+
+def slow_resource(path):
+    return 0.2 if path == '/missing/1' else 0.
+
+
+def get_user(username):
+    user = User.query.filter(User.username == username).first()
+    if user is None:
+        user = User(username=username, admin=False)
+        user.hash_password('secret')
+        db.session.add(user)
+        db.session.add(Owner(email=username, user=user))
+        db.session.commit()
+    return user
+
+
+def test_scan_timing():
+    owner = Owner.query.first()
+    site = SyntheticSite(n_pages=3, n_external=2, latency=slow_resource)
+    with serve(site) as root_url:
+        checker = LinkChecker(root_url, owner.user, owner)
+        checker.check_all_links_and_follow()
+        job_id = checker.job.id
+        slowest = LinkCheck.query.\
+            filter(LinkCheck.job_id == job_id).\
+            order_by(LinkCheck.elapsed.desc()).first()
+        assert slowest.url.endswith('/missing/1')
+        assert slowest.elapsed >= 0.2
+        assert slowest.method == 'HEAD'
+        pages = PageTiming.query.filter(PageTiming.job_id == job_id).all()
+        assert len(pages) == 3
+        assert all(page.bytes_read > 0 and page.response == 200 for page in pages)
+
+        # cached outcomes carry no timing
+        cached = LinkChecker(root_url, owner.user, owner)
+        cached.check_all_links_and_follow()
+        rows = LinkCheck.query.\
+            filter(LinkCheck.job_id == cached.job.id).\
+            filter(LinkCheck.cached == True).all()
+        assert rows
+        assert all(row.elapsed is None and row.method is None for row in rows)
+
+
+def test_slow_results_endpoint():
+    user = get_user('timing-user')
+    owner = Owner.query.filter(Owner.email == 'timing-user').first()
+    site = SyntheticSite(n_pages=3, n_external=2, latency=slow_resource)
+    with serve(site) as root_url:
+        LinkChecker(root_url, user, owner, use_link_cache=False).check_all_links_and_follow()
+    client = app.test_client()
+    auth = b64encode(b'timing-user:secret').decode('ascii')
+    r = client.get(
+        '/results/slow', query_string=dict(url=root_url, limit=2),
+        headers={'Authorization': 'Basic ' + auth})
+    assert r.status_code == 200
+    slow = r.get_json()
+    assert len(slow['links']) == 2
+    assert slow['links'][0]['url'].endswith('/missing/1')
+    assert slow['links'][0]['elapsed'] >= slow['links'][1]['elapsed']
+    assert len(slow['pages']) == 2
+    r = client.get(
+        '/results/slow', query_string=dict(url='http://nowhere.test'),
+        headers={'Authorization': 'Basic ' + auth})
+    assert r.status_code == 404
@@ -0,0 +1,74 @@
+from app.link_check import LinkChecker
+from app.async_link_check import AsyncLinkChecker
+from app.models import Owner
+from app.globals import SIMHASH_MIN_PAGES
+from app.traps import path_template, TrapDetector, Simhash, NearDuplicates
+from benchmarks.fixture_server import SyntheticSite, serve
+
+
+def fingerprint(words):
+    fingerprint = Simhash()
+    for word in words:
+        fingerprint.add(word)
+    return fingerprint
+
+
+def test_path_template():
+    assert path_template('http://a.com/calendar/2026/10/18') == 'a.com/calendar/{n}/{n}/{n}'
+    assert path_template('http://a.com/cart;jsessionid=0AB12') == 'a.com/cart'
+    assert path_template('http://a.com/s/4f9c2e7d1b3a5c6e8f0a/page') == 'a.com/s/{id}/page'
+    assert path_template('http://a.com/blog/hello-world') == 'a.com/blog/hello-world'
+
+
+def test_traps():
+    traps = TrapDetector(max_depth=4, max_repeats=2, template_cap=3)
+    assert traps.trap('http://a.com/a/b/c/d') is None
+    assert traps.trap('http://a.com/a/b/c/d/e') == 'path depth'
+    assert traps.trap('http://a.com/a/b/a/b') is None
+    assert traps.trap('http://a.com/a/b/a/a') == 'repeated segments'
+    assert all(traps.admit('http://a.com/day/{}'.format(day)) for day in range(3))
+    assert traps.admit('http://a.com/day/0')
+    assert not traps.admit('http://a.com/day/3')
+    assert traps.admit('http://a.com/about')
+    assert len(traps) == 1
+    assert traps.suppressed == {'path template cap': 1}
+
+
+def test_near_duplicates():
+    words = ['word{}'.format(i) for i in range(400)]
+    near = NearDuplicates(max_distance=6, min_pages=0)
+    assert not near.seen(fingerprint(words))
+    assert near.seen(fingerprint(words[:-1] + ['other']))
+    assert not near.seen(fingerprint(['other{}'.format(i) for i in range(400)]))
+    assert near.duplicates == 1
+    assert fingerprint(words[:5]).digest() is None
+
+
+def test_boilerplate_down_weighted():
+    # pages sharing their navigation and footer, with little content of their own
+    boilerplate = ['nav{}'.format(i) for i in range(300)]
+    near = NearDuplicates(max_distance=6)
+    for page in range(200):
+        assert not near.seen(fingerprint(
+            boilerplate + ['page{}word{}'.format(page, i) for i in range(20)]))
+    assert near.seen(fingerprint(boilerplate + ['page199word{}'.format(i) for i in range(20)]))
+
+
+def test_calendar_trap_not_expanded():
+    owner = Owner.query.first()
+    site = SyntheticSite(n_pages=4, n_external=1, latency=0, calendar=True)
+    with serve(site) as root_url:
+        for engine in (LinkChecker, AsyncLinkChecker):
+            checker = engine(root_url, owner.user, owner)
+            checker.check_all_links_and_follow()
+            calendar = [url for url in checker.links_checked_and_followed if '/calendar/' in url]
+            # once enough pages were seen to tell boilerplate apart, a day is
+            # a near-duplicate of the day before
+            assert len(calendar) < SIMHASH_MIN_PAGES
+            assert checker.near_duplicates.duplicates == 1
+            assert len(checker.links_checked_and_followed) == 4 + len(calendar)
+        checker = LinkChecker(root_url, owner.user, owner, suppress_near_duplicates=False)
+        checker.traps.template_cap = 20
+        checker.check_all_links_and_follow()
+        calendar = [url for url in checker.links_checked_and_followed if '/calendar/' in url]
+        assert len(calendar) == 20
@@ -278,4 +278,24 @@ def test_remove_web_extensions():
     assert remove_web_extensions('https://test.htm') == 'https://test'
     assert remove_web_extensions('https://test.asp') == 'https://test'
     assert remove_web_extensions('https://test.aspx') == 'https://test'
-    assert remove_web_extensions('https://test.com') == 'https://test.com'
\ No newline at end of file
+    assert remove_web_extensions('https://test.com') == 'https://test.com'
+
+def test_normalize_link():
+    assert normalize_link('./PTSD.asp', 'https://www.va.gov/directory/guide/home.asp') == \
+        (True, 'http://www.va.gov/directory/guide/PTSD.asp')
+    assert normalize_link('"//twitter.com/va"', 'https://www.va.gov/directory/guide/home.asp') == \
+        (False, 'http://twitter.com/va')
+
+
+def test_normalize_link_memoized_across_pages():
+    for cached in (is_internal_href, standardize_url, ensure_protocol):
+        cached.cache_clear()
+    links = ['/a', '/b', 'https://github.com']
+    for page in ('https://eightportions.com/1', 'https://eightportions.com/2'):
+        group_links_internal_external(links, page)
+    # hrefs repeated on another page are classified and standardized once
+    assert is_internal_href.cache_info().misses == 3
+    assert is_internal_href.cache_info().hits == 3
+    assert ensure_protocol.cache_info().hits == 1
+    # each page URL, and each joined link once
+    assert standardize_url.cache_info().misses == 2 + 2
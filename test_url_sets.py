@@ -0,0 +1,56 @@
+from app.link_check import LinkChecker
+from app.async_link_check import AsyncLinkChecker
+from app.models import Owner, LinkCheck
+from app.url_sets import HashedUrlSet, ScalableBloomFilter, make_url_set, dump_url_set, \
+    load_url_set
+from benchmarks.fixture_server import SyntheticSite, serve
+
+
+def urls(n, prefix='http://a.com/'):
+    return ['{}{}'.format(prefix, i) for i in range(n)]
+
+
+def test_hashed_url_set():
+    hashed = HashedUrlSet(merge_size=100)
+    hashed.update(urls(1000))
+    hashed.add('http://a.com/0')
+    assert len(hashed) == 1000
+    assert len(hashed.recent) < 100
+    assert all(url in hashed for url in urls(1000))
+    assert not any(url in hashed for url in urls(1000, 'http://b.com/'))
+
+
+def test_bloom_filter_error_rate():
+    bloom = ScalableBloomFilter(0.01, initial_capacity=1000)
+    bloom.update(urls(5000))
+    assert len(bloom.filters) == 3
+    assert all(url in bloom for url in urls(5000))
+    false_positives = sum(url in bloom for url in urls(10000, 'http://b.com/'))
+    assert false_positives < 10000 * 0.01
+
+
+def test_dump_and_load():
+    for bounded_memory, error_rate in ((False, None), (True, None), (True, 0.01)):
+        url_set = make_url_set(bounded_memory, error_rate)
+        url_set.update(urls(100))
+        restored = make_url_set(bounded_memory, error_rate)
+        load_url_set(restored, dump_url_set(url_set))
+        assert len(restored) == 100
+        assert all(url in restored for url in urls(100))
+
+
+def test_bounded_memory_scan():
+    owner = Owner.query.first()
+    with serve(SyntheticSite(n_pages=20, n_external=2, latency=0)) as root_url:
+        results = []
+        for engine, kwargs in (
+                (LinkChecker, {}),
+                (LinkChecker, dict(bounded_memory=True)),
+                (AsyncLinkChecker, dict(bounded_memory=True, bloom_error_rate=0.001))):
+            checker = engine(root_url, owner.user, owner, use_link_cache=False, **kwargs)
+            checker.frontier.max_queued = 2
+            checker.check_all_links_and_follow()
+            assert len(checker.links_checked_and_followed) == 20
+            results.append(set(checker.job.link_checks.with_entities(
+                LinkCheck.url, LinkCheck.response)))
+    assert results[0] == results[1] == results[2]
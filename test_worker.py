@@ -0,0 +1,162 @@
+import datetime
+import threading
+import app.link_check
+from app import db
+from app.api import scan
+from app.link_check import LinkChecker
+from app.models import Owner, ScanJob, LeaderLease, LinkCheck
+from app.worker import LeaderElection, claim_scan_job, find_distributed_job, work, \
+    reap_stale_jobs, heartbeat
+from benchmarks.fixture_server import SyntheticSite, serve
+
+
+def queue_scan(url, **options):
+    owner = Owner.query.first()
+    job_id = scan(url, owner.user.id, owner.id, **options)
+    return ScanJob.query.get(job_id)
+
+
+def test_scan_queues_job():
+    job = queue_scan('https://dummy.com/blog/', engine='async', max_depth=2)
+    assert job.status == 'queued'
+    assert job.root_url == 'dummy.com/blog/'
+    assert job.options == dict(url='https://dummy.com/blog/', engine='async', max_depth=2)
+    assert job.link_checks.count() == 0
+
+
+def test_scan_job_claimed_once():
+    ScanJob.query.filter(ScanJob.status == 'queued').update(dict(status='cancelled'))
+    db.session.commit()
+    job = queue_scan('https://dummy.com')
+    assert claim_scan_job('first').id == job.id
+    assert claim_scan_job('second') is None
+    db.session.refresh(job)
+    assert (job.status, job.worker_id) == ('in progress', 'first')
+
+
+def test_distributed_jobs_joined():
+    job = queue_scan('https://dummy.com', engine='distributed')
+    job.status = 'in progress'
+    db.session.commit()
+    assert find_distributed_job(set()).id == job.id
+    assert find_distributed_job({job.id}) is None
+
+
+def test_leader_election():
+    LeaderLease.query.delete()
+    db.session.commit()
+    first = LeaderElection('first', lease_seconds=60)
+    second = LeaderElection('second', lease_seconds=60)
+    assert first.campaign()
+    assert not second.campaign()
+    assert first.campaign()
+    first.resign()
+    assert second.campaign()
+    assert not first.campaign()
+
+
+def test_leader_lease_expires():
+    LeaderLease.query.delete()
+    db.session.commit()
+    crashed = LeaderElection('crashed', lease_seconds=-1)
+    assert crashed.campaign()
+    assert LeaderElection('other').campaign()
+
+
+def test_worker_runs_queued_scan():
+    ScanJob.query.filter(ScanJob.status == 'queued').update(dict(status='cancelled'))
+    db.session.commit()
+    with serve(SyntheticSite(n_pages=5, n_external=2, latency=0)) as root_url:
+        job = queue_scan(root_url, engine='async')
+        stop = threading.Event()
+        worker = threading.Thread(target=work, args=('worker', stop, 0.1))
+        worker.start()
+        for _ in range(100):
+            db.session.expire_all()
+            if ScanJob.query.get(job.id).status == 'completed':
+                break
+            stop.wait(0.1)
+        stop.set()
+        worker.join()
+    job = ScanJob.query.get(job.id)
+    assert job.status == 'completed'
+    assert job.worker_id == 'worker'
+    assert job.link_checks.count() == 4 + 5 * 2
+
+
+class CrashingLinkChecker(LinkChecker):
+    """Link checker crashing when about to follow its `crash_at`th page"""
+    crash_at = 3
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.followed = 0
+        self.persisted = []
+
+    def check_all_links(self, url):
+        self.followed += 1
+        if self.followed == self.crash_at:
+            raise RuntimeError('Crashed')
+        return super().check_all_links(url)
+
+    def persist_link_check(self, link, outcome, cached=False):
+        self.persisted.append(link)
+        return super().persist_link_check(link, outcome, cached)
+
+
+def test_scan_resumed_from_checkpoint(monkeypatch):
+    monkeypatch.setattr(app.link_check, 'CHECKPOINT_SECONDS', 0)
+    owner = Owner.query.first()
+    with serve(SyntheticSite(n_pages=5, n_external=2, latency=0)) as root_url:
+        crashed = CrashingLinkChecker(root_url, owner.user, owner, use_link_cache=False)
+        try:
+            crashed.check_all_links_and_follow()
+            assert False
+        except RuntimeError:
+            pass
+        job_id = crashed.job.id
+        job = ScanJob.query.get(job_id)
+        assert len(job.checkpoint['followed']) == 2
+        assert job.heartbeat is not None
+
+        resumed = CrashingLinkChecker(root_url, owner.user, owner, job=job, use_link_cache=False)
+        resumed.crash_at = None
+        resumed.check_all_links_and_follow()
+    urls = [url for url, in job.link_checks.with_entities(LinkCheck.url).all()]
+    assert len(urls) == len(set(urls)) == 4 + 5 * 2
+    assert set(resumed.persisted).isdisjoint(crashed.persisted)
+    assert resumed.followed == 3
+    assert ScanJob.query.get(job_id).checkpoint is None
+
+
+def test_stale_jobs_reaped():
+    stale = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+    job_ids = [queue_scan('https://dummy.com').id for _ in range(3)]
+    resumable, exhausted, live = [ScanJob.query.get(job_id) for job_id in job_ids]
+    for job in (resumable, exhausted, live):
+        job.status = 'in progress'
+        job.heartbeat = stale
+    exhausted.resumes = 3
+    live.heartbeat = datetime.datetime.utcnow()
+    db.session.commit()
+    reap_stale_jobs()
+    jobs = [ScanJob.query.get(job_id) for job_id in job_ids]
+    assert [(job.status, job.resumes) for job in jobs] == [
+        ('queued', 1), ('failed', 3), ('in progress', 0)]
+
+
+def test_live_slow_job_not_reaped():
+    # pages slow enough for the scan to outlast the stale delay between checkpoints
+    with serve(SyntheticSite(n_pages=4, n_external=1, latency=0.2)) as root_url:
+        job = queue_scan(root_url)
+        owner = Owner.query.first()
+        job.status = 'in progress'
+        job.heartbeat = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+        db.session.commit()
+        with heartbeat(job.id, interval=0.05):
+            checker = LinkChecker(root_url, owner.user, owner, job=job, use_link_cache=False)
+            checker.check_all_links_and_follow()
+            reap_stale_jobs(stale_seconds=0.5)
+    db.session.refresh(job)
+    assert job.status == 'in progress'
+    assert job.resumes == 0
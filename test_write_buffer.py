@@ -0,0 +1,94 @@
+import datetime
+from app import db
+from app.models import Owner, ScanJob, Link, LinkCheck
+from sqlalchemy.exc import OperationalError
+from app import write_buffer
+from app.write_buffer import WriteBuffer
+
+
+class TestWriteBuffer(object):
+    def setup(self):
+        owner = Owner.query.first()
+        self.job = ScanJob(
+            root_url='dummy.com',
+            start_time=datetime.datetime.utcnow(),
+            user=owner.user,
+            owner=owner,
+            status='in progress')
+        db.session.add(self.job)
+        db.session.commit()
+
+    def test_flush_on_batch_size(self):
+        writes = WriteBuffer(batch_size=3, batch_seconds=60)
+        writes.add_link(url='http://a.com', source_url='http://dummy.com', job_id=self.job.id)
+        writes.add_link_check(url='http://a.com', url_raw='http://a.com', response=200, job_id=self.job.id)
+        assert len(writes) == 2
+        assert self.job.links.count() == 0
+        writes.add_link_check(url='http://b.com', url_raw='http://b.com', response=404, job_id=self.job.id)
+        assert len(writes) == 0
+        assert self.job.links.count() == 1
+        assert self.job.link_checks.count() == 2
+        assert writes.rows_written == 3
+
+    def test_flush_on_batch_seconds(self):
+        writes = WriteBuffer(batch_size=100, batch_seconds=0)
+        writes.add_link(url='http://a.com', source_url='http://dummy.com', job_id=self.job.id)
+        assert len(writes) == 0
+        assert self.job.links.count() == 1
+
+    def test_final_flush(self):
+        writes = WriteBuffer(batch_size=100, batch_seconds=60)
+        writes.add_link_check(url='http://a.com', url_raw='http://a.com', exception='SSLError', job_id=self.job.id)
+        writes.flush()
+        link_check = self.job.link_checks.one()
+        assert link_check.exception == 'SSLError'
+        assert link_check.response is None
+
+    def test_flush_mixed_columns(self):
+        writes = WriteBuffer(batch_size=100, batch_seconds=60)
+        writes.add_link_check(url='http://a.com', url_raw='http://a.com', response=200, job_id=self.job.id)
+        writes.add_link_check(url='http://b.com', url_raw='http://b.com', note='Timeout', exception='ReadTimeout', job_id=self.job.id)
+        writes.flush()
+        results = {link_check.url: link_check for link_check in self.job.link_checks}
+        assert results['http://a.com'].response == 200
+        assert results['http://b.com'].exception == 'ReadTimeout'
+        assert results['http://b.com'].note == 'Timeout'
+
+    def test_failed_flush_keeps_rows(self, monkeypatch):
+        def fail(table, rows):
+            raise OperationalError('INSERT', {}, 'connection lost')
+        writes = WriteBuffer(batch_size=100, batch_seconds=60)
+        writes.add_link(url='http://a.com', source_url='http://dummy.com', job_id=self.job.id)
+        monkeypatch.setattr(write_buffer, 'insert_rows', fail)
+        try:
+            writes.flush()
+            assert False
+        except OperationalError:
+            pass
+        assert len(writes) == 1
+        monkeypatch.undo()
+        writes.flush()
+        assert self.job.links.count() == 1
+
+    def test_rejected_rows_dropped(self):
+        writes = WriteBuffer(batch_size=100, batch_seconds=60)
+        writes.add_link(url='http://a.com', source_url='http://dummy.com', job_id=None)
+        writes.add_link(url='http://b.com', source_url='http://dummy.com', job_id=self.job.id)
+        writes.add_link_check(url='http://b.com', url_raw='http://b.com', response=200, job_id=self.job.id)
+        writes.flush()
+        assert len(writes) == 0
+        assert writes.rows_dropped == 1
+        assert writes.rows_written == 2
+        assert [link.url for link in self.job.links] == ['http://b.com']
+        # later flushes are not held back by the dropped row
+        writes.add_link(url='http://c.com', source_url='http://dummy.com', job_id=self.job.id)
+        writes.flush()
+        assert self.job.links.count() == 2
+
+    def test_long_strings_truncated(self):
+        writes = WriteBuffer(batch_size=100, batch_seconds=60)
+        exception = 'requests.exceptions.' + 'E' * 200
+        writes.add_link_check(url='http://a.com', url_raw='http://a.com', exception=exception, job_id=self.job.id)
+        writes.flush()
+        assert self.job.link_checks.one().exception == exception[:LinkCheck.exception.type.length]
+        assert writes.link_checks == []